@@ -2,6 +2,9 @@
 ASGI config for budget_app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn budget_app.asgi:application``) for the
+/api/events/ live updates stream, which needs long-lived async responses, and set
+API_ASYNC_VIEWS=True to serve the summary APIs with their async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
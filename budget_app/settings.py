@@ -62,6 +62,11 @@ AUTH_USER_MODEL = 'finance.User'
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'finance.middleware.MetricsMiddleware',  # Latency histograms for /metrics
+    'finance.middleware.QueryInstrumentationMiddleware',  # Per-view query counts and Server-Timing
+    'finance.middleware.ProfilingMiddleware',  # Opt-in and slow-request profiles (Admin > Profiles)
+    'finance.middleware.ExportConcurrencyMiddleware',  # Keeps Excel exports from taking every worker thread
+    'finance.middleware.JSONCompressionMiddleware',  # Gzip JSON responses above API_GZIP_MIN_BYTES
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -165,7 +170,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'finance.renderers.FastJSONRenderer',  # orjson when installed, else DRF's JSONRenderer
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
@@ -177,3 +182,102 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# Budget reconciliation: mark a budget paid as soon as its month's transactions reach the budgeted amount
+RECONCILIATION_AUTO_MARK_PAID = os.environ.get('RECONCILIATION_AUTO_MARK_PAID', 'False') == 'True'
+# Cache for reconciliation month totals. Invalidations must reach every worker, so a local
+# memory cache is not used and totals are computed per request; set REDIS_URL to cache them.
+RECONCILIATION_CACHE = os.environ.get('RECONCILIATION_CACHE', 'default')
+
+# SQL query instrumentation (see finance/middleware.py and Admin > Query Stats)
+QUERY_INSTRUMENTATION_ENABLED = os.environ.get('QUERY_INSTRUMENTATION_ENABLED', 'True') == 'True'
+# Requests issuing more queries than their view's budget are logged and counted as over budget.
+# Keys are URL names (DRF router views use e.g. 'transaction-list'); None means no limit.
+QUERY_BUDGET_DEFAULT = int(os.environ['QUERY_BUDGET_DEFAULT']) if os.environ.get('QUERY_BUDGET_DEFAULT') else 50
+QUERY_BUDGETS = {
+    'api_dashboard': 30,
+    'api_outstanding_payments': 15,
+    'api_outstanding_payments_month': 15,
+    'api_reconciliation': 10,
+    'transaction_list': 10,
+    'transaction-list': 10,
+}
+
+# Metrics exposed at /metrics (see finance/metrics.py).
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR to a directory shared by the workers so any worker
+# reports the totals of all of them. METRICS_TOKEN, when set, must be sent as a Bearer token;
+# without it only superusers (or anyone, in DEBUG) can read the endpoint.
+METRICS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1.0'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Request profiling (see finance/profiling.py and Admin > Profiles).
+# Superusers can profile any request with a token from the Profiles page. With
+# PROFILING_SLOW_REQUEST_MS set, every request is stack-sampled and slower ones are saved.
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles'))
+PROFILING_SLOW_REQUEST_MS = int(os.environ['PROFILING_SLOW_REQUEST_MS']) if os.environ.get('PROFILING_SLOW_REQUEST_MS') else None
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get('PROFILING_SAMPLE_INTERVAL', '0.005'))
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', '200'))
+
+# Caches. "fragments" holds rendered template fragments (dashboard cards, yearly grid rows), keyed
+# by the household data version or the row contents, so stale entries are never served; they just
+# age out. Local memory is per worker process; with REDIS_URL (requires the redis package) the
+# default cache is shared by all workers and servers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', '20000'))},
+    },
+}
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', '3600'))
+
+# Separators of amounts formatted by the |currency filter (e.g. ' ' and ',' for "1 234,50")
+CURRENCY_THOUSAND_SEPARATOR = os.environ.get('CURRENCY_THOUSAND_SEPARATOR', ',')
+CURRENCY_DECIMAL_SEPARATOR = os.environ.get('CURRENCY_DECIMAL_SEPARATOR', '.')
+
+# Admin dashboard statistics (see finance/statistics.py). Counts are cached for
+# STATISTICS_CACHE_TTL seconds, then refreshed in the background; a snapshot for the growth
+# figures is stored at most every STATISTICS_SNAPSHOT_INTERVAL seconds.
+STATISTICS_CACHE_TTL = int(os.environ.get('STATISTICS_CACHE_TTL', '300'))
+STATISTICS_SNAPSHOT_INTERVAL = int(os.environ.get('STATISTICS_SNAPSHOT_INTERVAL', str(24 * 60 * 60)))
+
+# Category, budget and transaction list endpoints serialize values() rows directly instead of
+# model instances (same JSON, see ValuesSerializer in finance/serializers.py)
+API_VALUES_SERIALIZERS = os.environ.get('API_VALUES_SERIALIZERS', 'True') == 'True'
+
+# JSON responses of at least this many bytes are gzipped for clients that accept it
+API_GZIP_MIN_BYTES = int(os.environ.get('API_GZIP_MIN_BYTES', '1024'))
+
+# Delta sync (see finance/sync.py): rows per /api/sync/ page (clients may ask for up to
+# SYNC_MAX_PAGE_SIZE), how far each window reaches back to catch late commits, and how long
+# tombstones of deleted rows (and therefore sync cursors) stay valid
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', '500'))
+SYNC_MAX_PAGE_SIZE = int(os.environ.get('SYNC_MAX_PAGE_SIZE', '5000'))
+SYNC_CURSOR_OVERLAP = int(os.environ.get('SYNC_CURSOR_OVERLAP', '30'))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', '90'))
+
+# Live events (see finance/events.py) for /api/events/: 'local' delivers within one process,
+# 'postgres' through LISTEN/NOTIFY to every worker (use it with more than one), '' disables
+# them. Idle streams get a keep-alive comment every LIVE_EVENTS_HEARTBEAT seconds.
+LIVE_EVENTS_BUS = os.environ.get('LIVE_EVENTS_BUS', 'local')
+LIVE_EVENTS_HEARTBEAT = int(os.environ.get('LIVE_EVENTS_HEARTBEAT', '25'))
+
+# Serve the dashboard, yearly budget and outstanding payments APIs with the async views in
+# finance/async_api_views.py (set under an ASGI server). Their independent parts then run in
+# parallel on separate database connections unless API_ASYNC_PARALLEL_QUERIES is False.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', 'False') == 'True'
+API_ASYNC_PARALLEL_QUERIES = os.environ.get('API_ASYNC_PARALLEL_QUERIES', 'True') == 'True'
+
+# Excel exports running at once per worker process; later ones wait EXPORT_QUEUE_TIMEOUT
+# seconds for a slot, then get a 503. gunicorn.conf.py sets the limit to half of each
+# threaded worker's threads; 0 means no limit (a dedicated export pool, runserver).
+EXPORT_PATH_PREFIXES = ('/export/', '/api/export/')
+EXPORT_MAX_CONCURRENCY = int(os.environ.get('EXPORT_MAX_CONCURRENCY', '0'))
+EXPORT_QUEUE_TIMEOUT = float(os.environ.get('EXPORT_QUEUE_TIMEOUT', '10'))
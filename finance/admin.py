@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Category, Transaction, Budget, Household, CategoryNote, BudgetTemplate, TemplateCategory, User
+from .models import Category, Transaction, Budget, Household, CategoryNote, BudgetTemplate, TemplateCategory, User, CategorizationRule, StatisticsSnapshot, Tombstone
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -55,6 +55,12 @@ class TransactionAdmin(admin.ModelAdmin):
     list_filter = ('type', 'date', 'household')
     search_fields = ('description',)
 
+@admin.register(CategorizationRule)
+class CategorizationRuleAdmin(admin.ModelAdmin):
+    list_display = ('pattern', 'match_type', 'category', 'priority', 'min_amount', 'max_amount', 'is_active', 'household')
+    list_filter = ('match_type', 'is_active', 'household')
+    search_fields = ('pattern', 'category__name')
+
 @admin.register(Budget)
 class BudgetAdmin(admin.ModelAdmin):
     list_display = ('category', 'amount', 'start_date', 'is_paid', 'get_household')
@@ -110,3 +116,16 @@ class TemplateCategoryAdmin(admin.ModelAdmin):
     search_fields = ('name', 'template__name')
     ordering = ('template', 'display_order', 'name')
 
+
+@admin.register(StatisticsSnapshot)
+class StatisticsSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('recorded_at', 'users', 'households', 'categories', 'budgets', 'transactions', 'estimated')
+    list_filter = ('estimated',)
+    date_hierarchy = 'recorded_at'
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('model', 'object_id', 'household', 'deleted_at')
+    list_filter = ('model',)
+    date_hierarchy = 'deleted_at'
@@ -1,26 +1,34 @@
 """
 API URL Configuration for Finance Flow
 """
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
-from . import api_views
+from . import api_views, async_api_views
+
+# Async versions of the budget summary endpoints, for ASGI deployments
+summary_views = async_api_views if settings.API_ASYNC_VIEWS else api_views
 
 router = DefaultRouter()
 router.register(r'households', api_views.HouseholdViewSet, basename='household')
 router.register(r'categories', api_views.CategoryViewSet, basename='category')
 router.register(r'budgets', api_views.BudgetViewSet, basename='budget')
 router.register(r'transactions', api_views.TransactionViewSet, basename='transaction')
+router.register(r'categorization-rules', api_views.CategorizationRuleViewSet, basename='categorization-rule')
 router.register(r'category-notes', api_views.CategoryNoteViewSet, basename='category-note')
 router.register(r'templates', api_views.BudgetTemplateViewSet, basename='template')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/token/', obtain_auth_token, name='api_token_auth'),
-    path('dashboard/', api_views.dashboard_data, name='api_dashboard'),
-    path('yearly-budget/<int:year>/', api_views.yearly_budget_data, name='api_yearly_budget'),
-    path('outstanding-payments/', api_views.outstanding_payments_data, name='api_outstanding_payments'),
-    path('outstanding-payments/<int:year>/<int:month>/', api_views.outstanding_payments_data, name='api_outstanding_payments_month'),
+    path('dashboard/', summary_views.dashboard_data, name='api_dashboard'),
+    path('yearly-budget/<int:year>/', summary_views.yearly_budget_data, name='api_yearly_budget'),
+    path('outstanding-payments/', summary_views.outstanding_payments_data, name='api_outstanding_payments'),
+    path('outstanding-payments/<int:year>/<int:month>/', summary_views.outstanding_payments_data, name='api_outstanding_payments_month'),
+    path('sync/', api_views.sync_changes, name='api_sync'),
+    path('events/', api_views.live_events, name='api_live_events'),
+    path('reconciliation/<int:year>/<int:month>/', api_views.reconciliation_data, name='api_reconciliation'),
     # Excel export endpoints
     path('export/yearly/<int:year>/', api_views.export_yearly_budget_excel_api, name='api_export_yearly_budget'),
     path('export/monthly/<int:year>/<int:month>/', api_views.export_monthly_detail_excel_api, name='api_export_monthly_detail'),
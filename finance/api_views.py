@@ -2,33 +2,98 @@
 API Views for Finance Flow
 Provides REST API endpoints while maintaining all existing functionality
 """
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
-from django.db.models import Sum, Q
+from rest_framework.parsers import MultiPartParser
+from django.db.models import Sum, Q, Count, Max, Prefetch
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from datetime import datetime, date, timedelta
+from decimal import Decimal
 import calendar
 
 from .models import (
     Household, Category, Budget, Transaction,
-    CategoryNote, BudgetTemplate, TemplateCategory
+    CategoryNote, BudgetTemplate, TemplateCategory, CategorizationRule
 )
 from .serializers import (
     HouseholdSerializer, CategorySerializer, CategoryListSerializer,
     BudgetSerializer, TransactionSerializer, CategoryNoteSerializer,
-    BudgetTemplateSerializer, TemplateCategorySerializer
+    BudgetTemplateSerializer, TemplateCategorySerializer, CategorizationRuleSerializer,
+    values_serializer
+)
+from .utils import open_budget_month, count_subquery
+from .categorization import recategorize_household
+from .reconciliation import reconcile_month
+from .transaction_filters import filter_transactions, TransactionFilterError
+from .importers import (
+    import_transactions, iter_statement_lines, detect_format, decode_upload, StatementParseError
 )
-from .utils import open_budget_month
 from .templates import create_base_starter_template, apply_barebones_template
 from .excel_reports import export_yearly_budget, export_monthly_detail, export_category_summary, export_transactions
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from django.utils.decorators import method_decorator
 from .views import get_user_household  # Import session-aware function
+from .conditional import conditional_get, household_validators
+from .fieldsets import parse_fieldset, readable_fields, restrict_serializer, narrow_queryset
+from . import events, summaries, sync
+
+
+class SparseFieldsetMixin:
+    """
+    `fields=` / `exclude=` query parameters on list and retrieve (see finance/fieldsets.py):
+    the serializer drops the other fields and the queryset loads only what the rest need
+    """
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        if self.request.method not in ('GET', 'HEAD') or self.action not in self.fieldset_actions:
+            return None
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = parse_fieldset(self.request, readable_fields(self.get_serializer_class()))
+        return self._fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            restrict_serializer(serializer, fieldset)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            queryset = narrow_queryset(queryset, self.get_serializer_class(), fieldset)
+        return queryset
+
+
+class ValuesListMixin(SparseFieldsetMixin):
+    """
+    Serve the list action through the serializer's ValuesSerializer: rows are read with
+    values_list() and turned straight into dicts, which is several times faster than building
+    model instances and serializer fields for thousands of rows. The JSON is the same.
+    Disabled with API_VALUES_SERIALIZERS = False.
+    """
 
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'API_VALUES_SERIALIZERS', True):
+            return super().list(request, *args, **kwargs)
+        fast = values_serializer(self.get_serializer_class(), self.get_fieldset())
+        rows = fast.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.to_representation(page))
+        return Response(fast.to_representation(rows))
 
-class HouseholdViewSet(viewsets.ModelViewSet):
+
+class HouseholdViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for Household management"""
     serializer_class = HouseholdSerializer
     permission_classes = [IsAuthenticated]
@@ -36,7 +101,7 @@ class HouseholdViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Users can only see households they belong to"""
-        return Household.objects.filter(members=self.request.user)
+        return Household.objects.filter(members=self.request.user).prefetch_related('members')
     
     def perform_create(self, serializer):
         """Add current user as member when creating household"""
@@ -44,7 +109,7 @@ class HouseholdViewSet(viewsets.ModelViewSet):
         household.members.add(self.request.user)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """ViewSet for Category management"""
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
@@ -55,7 +120,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
         household = get_user_household(self.request.user, self.request)
         if not household:
             return Category.objects.none()
-        return Category.objects.filter(household=household).select_related('parent', 'household').prefetch_related('children', 'notes')
+        return Category.objects.filter(household=household).select_related('parent', 'household').annotate(
+            children_count=count_subquery(Category.objects.all(), 'parent_id'),
+            notes_count=count_subquery(CategoryNote.objects.all(), 'category_id'),
+        )
     
     def get_serializer_class(self):
         """Use list serializer for list view"""
@@ -120,7 +188,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
             })
 
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """ViewSet for Budget management"""
     serializer_class = BudgetSerializer
     permission_classes = [IsAuthenticated]
@@ -211,8 +279,8 @@ class BudgetViewSet(viewsets.ModelViewSet):
             return Response({'success': False, 'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            open_budget_month(household, int(year), int(month))
-            return Response({'success': True, 'message': f'Budget month {year}-{month:02d} opened successfully'})
+            open_budget_month(int(year), int(month), household)
+            return Response({'success': True, 'message': f'Budget month {year}-{int(month):02d} opened successfully'})
         except Exception as e:
             return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
@@ -236,21 +304,173 @@ class BudgetViewSet(viewsets.ModelViewSet):
             return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """ViewSet for Transaction management"""
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [SessionAuthentication]
     
+    # Columns each aggregate grouping is GROUP BY'd on
+    AGGREGATE_GROUPINGS = {
+        'category': ('category_id', 'category__name'),
+        'month': ('month',),
+        'type': ('type',),
+    }
+    
     def get_queryset(self):
-        """Filter transactions by user's household"""
+        """Filter transactions by user's household and optional query params"""
         household = get_user_household(self.request.user, self.request)
         if not household:
             return Transaction.objects.none()
-        return Transaction.objects.filter(household=household).select_related('category', 'household')
+        queryset = Transaction.objects.filter(household=household).select_related('category', 'household')
+        return self.filter_queryset_by_params(queryset).order_by('-date', '-id')
+    
+    def filter_queryset_by_params(self, queryset):
+        """
+        Apply server-side filters from query params:
+        - start_date / end_date: inclusive ISO date range
+        - type: INCOME or EXPENSE
+        - category: category id; with include_children=true also matches its sub-categories
+        - min_amount / max_amount: inclusive amount range
+        - q: full-text search on description
+        """
+        try:
+            return filter_transactions(queryset, self.request.query_params)
+        except TransactionFilterError as e:
+            raise serializers.ValidationError({e.field: str(e)})
+    
+    @action(detail=False, methods=['get'])
+    def aggregate(self, request):
+        """
+        Sum filtered transactions in a single grouped query.
+        Query params: group_by=category|month|type (default category), plus all list filters.
+        """
+        group_by = request.query_params.get('group_by', 'category')
+        if group_by not in self.AGGREGATE_GROUPINGS:
+            return Response(
+                {'success': False, 'error': f'group_by must be one of: {", ".join(self.AGGREGATE_GROUPINGS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        household = get_user_household(request.user, request)
+        if not household:
+            return Response({'success': False, 'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset_by_params(Transaction.objects.filter(household=household))
+        if group_by == 'month':
+            queryset = queryset.annotate(month=TruncMonth('date'))
+        group_fields = self.AGGREGATE_GROUPINGS[group_by]
+        
+        rows = queryset.values(*group_fields).annotate(
+            income=Sum('amount', filter=Q(type='INCOME')),
+            expenses=Sum('amount', filter=Q(type='EXPENSE')),
+            count=Count('id'),
+        ).order_by(*group_fields)
+        
+        results = []
+        for row in rows:
+            income = row['income'] or 0
+            expenses = row['expenses'] or 0
+            if group_by == 'category':
+                key = row['category_id']
+                label = row['category__name'] or 'Uncategorized'
+            elif group_by == 'month':
+                key = row['month'].strftime('%Y-%m') if row['month'] else None
+                label = key
+            else:
+                key = row['type']
+                label = dict(Transaction.TYPE_CHOICES).get(row['type'], row['type'])
+            results.append({
+                'key': key,
+                'label': label,
+                'income': float(income),
+                'expenses': float(expenses),
+                'net': float(income - expenses),
+                'count': row['count'],
+            })
+        
+        return Response({'success': True, 'group_by': group_by, 'results': results})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_statement(self, request):
+        """
+        Bulk-import an uploaded bank statement (multipart field `file`).
+        Optional form fields: format=csv|ofx (guessed from the file name), date_format.
+        """
+        household = get_user_household(request.user, request)
+        if not household:
+            return Response({'success': False, 'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        uploaded_file = request.FILES.get('file')
+        if not uploaded_file:
+            return Response({'success': False, 'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        statement_format = request.data.get('format') or detect_format(uploaded_file.name)
+        try:
+            lines = iter_statement_lines(
+                decode_upload(uploaded_file),
+                statement_format,
+                date_format=request.data.get('date_format') or None,
+            )
+            # Not wrapped in a transaction: each batch commits on its own, so the household row
+            # lock each batch takes is released between batches instead of held for the whole file
+            result = import_transactions(household, lines)
+        except StatementParseError as e:
+            return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'created': result.created,
+            'duplicates': result.duplicates,
+            'skipped': result.skipped,
+            'categorized': result.categorized,
+            'errors': result.errors,
+        })
+    
+    @action(detail=False, methods=['post'])
+    def recategorize(self, request):
+        """
+        Re-run the household's categorization rules over stored transactions.
+        Body: {"all": true} to also re-evaluate transactions that already have a category.
+        """
+        household = get_user_household(request.user, request)
+        if not household:
+            return Response({'success': False, 'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        only_uncategorized = str(request.data.get('all', '')).lower() not in ('1', 'true', 'yes')
+        updated = recategorize_household(household, only_uncategorized=only_uncategorized)
+        return Response({'success': True, 'updated': updated})
 
 
-class CategoryNoteViewSet(viewsets.ModelViewSet):
+class CategorizationRuleViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """ViewSet for CategorizationRule management"""
+    serializer_class = CategorizationRuleSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [SessionAuthentication]
+    
+    def get_queryset(self):
+        """Filter rules by user's household"""
+        household = get_user_household(self.request.user, self.request)
+        if not household:
+            return CategorizationRule.objects.none()
+        return CategorizationRule.objects.filter(household=household).select_related('category')
+    
+    def perform_create(self, serializer):
+        """Set household and ensure the category belongs to it"""
+        household = get_user_household(self.request.user, self.request)
+        if serializer.validated_data['category'].household != household:
+            raise serializers.ValidationError("Category does not belong to your household")
+        serializer.save(household=household)
+    
+    def perform_update(self, serializer):
+        """Ensure a changed category still belongs to the rule's household"""
+        category = serializer.validated_data.get('category')
+        if category and category.household_id != serializer.instance.household_id:
+            raise serializers.ValidationError("Category does not belong to your household")
+        serializer.save()
+
+
+class CategoryNoteViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for CategoryNote management"""
     serializer_class = CategoryNoteSerializer
     permission_classes = [IsAuthenticated]
@@ -274,7 +494,20 @@ class CategoryNoteViewSet(viewsets.ModelViewSet):
         return Response({'success': True})
 
 
-class BudgetTemplateViewSet(viewsets.ReadOnlyModelViewSet):
+def template_list_validators(request, *args, **kwargs):
+    """Templates are shared by all households; editing one or its categories touches its updated_at"""
+    state = BudgetTemplate.objects.filter(is_active=True).aggregate(
+        templates=Count('id', distinct=True),
+        categories=Count('categories'),
+        changed_at=Max('updated_at'),
+    )
+    etag = f"templates-{state['templates']}-{state['categories']}-{request.GET.urlencode()}"
+    if state['changed_at']:
+        etag += f"-{state['changed_at'].timestamp()}"
+    return etag, state['changed_at']
+
+
+class BudgetTemplateViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for BudgetTemplate (read-only for regular users)"""
     serializer_class = BudgetTemplateSerializer
     permission_classes = [IsAuthenticated]
@@ -282,205 +515,92 @@ class BudgetTemplateViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Show active templates"""
-        return BudgetTemplate.objects.filter(is_active=True).prefetch_related('categories')
+        return BudgetTemplate.objects.filter(is_active=True).select_related('created_by').annotate(
+            category_count=count_subquery(TemplateCategory.objects.all(), 'template_id'),
+        ).prefetch_related(
+            Prefetch('categories', queryset=TemplateCategory.objects.select_related('parent'))
+        )
 
+    @method_decorator(conditional_get(template_list_validators))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def dashboard_data(request):
-    """Get dashboard data (maintains existing functionality)"""
-    household = get_user_household(request.user, request)
-    if not household:
-        return Response({'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Get active month from query params or session
+
+def _dashboard_active_date(request):
+    """Active month from query params or session"""
     year = request.GET.get('year')
     month = request.GET.get('month')
     
     if year and month:
         try:
-            active_date = date(int(year), int(month), 1)
+            return date(int(year), int(month), 1)
         except ValueError:
-            active_date = date.today()
-    else:
-        active_date_str = request.session.get('active_date')
-        if active_date_str:
-            active_date = date.fromisoformat(active_date_str)
-        else:
-            active_date = date.today()
-    
-    year, month = active_date.year, active_date.month
-    start_date = active_date.replace(day=1)
-    _, last_day = calendar.monthrange(year, month)
-    end_date = active_date.replace(day=last_day)
-    
-    # Get categories
-    income_categories = Category.objects.filter(household=household, type='INCOME', parent__isnull=True).prefetch_related('children')
-    expense_categories = Category.objects.filter(household=household, type='EXPENSE', parent__isnull=True).prefetch_related('children')
-    savings_categories = Category.objects.filter(household=household, type='SAVINGS', parent__isnull=True).prefetch_related('children')
-    
-    # Calculate totals
-    income_budgets = Budget.objects.filter(
-        category__household=household,
-        category__type='INCOME',
-        start_date=start_date
-    )
-    expense_budgets = Budget.objects.filter(
-        category__household=household,
-        category__type='EXPENSE',
-        start_date=start_date
-    )
-    savings_budgets = Budget.objects.filter(
-        category__household=household,
-        category__type='SAVINGS',
-        start_date=start_date
-    )
-    
-    total_income = income_budgets.aggregate(Sum('amount'))['amount__sum'] or 0
-    total_expenses = expense_budgets.aggregate(Sum('amount'))['amount__sum'] or 0
-    total_savings = savings_budgets.aggregate(Sum('amount'))['amount__sum'] or 0
-    balance = total_income - total_expenses - total_savings
-    
-    # Count unpaid items
-    unpaid_count = Budget.objects.filter(
-        category__household=household,
-        category__type='EXPENSE',
-        category__payment_type='MANUAL',
-        start_date=start_date,
-        is_paid=False,
-        amount__gt=0
-    ).count()
-    
-    # Build budget lists
-    income_budget_list = []
-    for category in income_categories:
-        children = list(category.children.all())
-        if children:
-            total = sum(
-                Budget.objects.filter(category=child, start_date=start_date).first().amount 
-                if Budget.objects.filter(category=child, start_date=start_date).first() else 0
-                for child in children
-            )
-        else:
-            budget = Budget.objects.filter(category=category, start_date=start_date).first()
-            total = budget.amount if budget else 0
-        income_budget_list.append({
-            'category': CategoryListSerializer(category).data,
-            'amount': float(total)
-        })
-    
-    expense_budget_list = []
-    for category in expense_categories:
-        children = list(category.children.all())
-        if children:
-            total = sum(
-                Budget.objects.filter(category=child, start_date=start_date).first().amount 
-                if Budget.objects.filter(category=child, start_date=start_date).first() else 0
-                for child in children
-            )
-        else:
-            budget = Budget.objects.filter(category=category, start_date=start_date).first()
-            total = budget.amount if budget else 0
-        expense_budget_list.append({
-            'category': CategoryListSerializer(category).data,
-            'amount': float(total)
-        })
-    
-    savings_budget_list = []
-    for category in savings_categories:
-        children = list(category.children.all())
-        if children:
-            total = sum(
-                Budget.objects.filter(category=child, start_date=start_date).first().amount 
-                if Budget.objects.filter(category=child, start_date=start_date).first() else 0
-                for child in children
-            )
-        else:
-            budget = Budget.objects.filter(category=category, start_date=start_date).first()
-            total = budget.amount if budget else 0
-        savings_budget_list.append({
-            'category': CategoryListSerializer(category).data,
-            'amount': float(total)
-        })
-    
-    return Response({
-        'active_date': active_date.isoformat(),
-        'year': year,
-        'month': month,
-        'total_income': float(total_income),
-        'total_expenses': float(total_expenses),
-        'total_savings': float(total_savings),
-        'balance': float(balance),
-        'unpaid_count': unpaid_count,
-        'income_budgets': income_budget_list,
-        'expense_budgets': expense_budget_list,
-        'savings_budgets': savings_budget_list,
-    })
+            return date.today()
+    active_date_str = request.session.get('active_date')
+    if active_date_str:
+        return date.fromisoformat(active_date_str)
+    return date.today()
+
+
+DASHBOARD_FIELDS = (
+    'active_date', 'year', 'month', 'total_income', 'total_expenses', 'total_savings', 'balance',
+    'unpaid_count', 'income_budgets', 'expense_budgets', 'savings_budgets',
+)
+YEARLY_BUDGET_FIELDS = (
+    'year', 'active_month', 'months', 'month_names',
+    'income_budget_data', 'expense_budget_data', 'savings_budget_data',
+)
+
+dashboard_validators = household_validators(
+    lambda request: ('dashboard', _dashboard_active_date(request).isoformat())
+)
+yearly_budget_validators = household_validators(
+    lambda request, year: ('yearly', year, request.GET.get('month', date.today().month)),
+    use_session=False
+)
+outstanding_payments_validators = household_validators(
+    lambda request, year=None, month=None: ('outstanding', year or date.today().year, month or date.today().month),
+    use_session=False
+)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_get(dashboard_validators)
+def dashboard_data(request):
+    """Get dashboard data (maintains existing functionality); supports fields/exclude"""
+    household = get_user_household(request.user, request)
+    if not household:
+        return Response({'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
+    fieldset = parse_fieldset(request, DASHBOARD_FIELDS) or DASHBOARD_FIELDS
+    active_date = _dashboard_active_date(request)
+
+    # Only what the fields/exclude parameters select is computed
+    results = summaries.run_parts(summaries.dashboard_parts(household, active_date, fieldset))
+    return Response(summaries.assemble_dashboard(active_date, fieldset, results))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(yearly_budget_validators)
 def yearly_budget_data(request, year):
-    """Get yearly budget data (maintains existing functionality)"""
+    """Get yearly budget data (maintains existing functionality); supports fields/exclude"""
     household = get_user_household(request.user)
     if not household:
         return Response({'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
+    fieldset = parse_fieldset(request, YEARLY_BUDGET_FIELDS) or YEARLY_BUDGET_FIELDS
     
     # Get active month from query params
     active_month = int(request.GET.get('month', date.today().month))
-    
-    # Get all months
-    months = list(range(1, 13))
-    month_names = [calendar.month_abbr[i] for i in months]
-    
-    # Get all categories
-    income_categories = Category.objects.filter(household=household, type='INCOME').order_by('name')
-    expense_categories = Category.objects.filter(household=household, type='EXPENSE').order_by('name')
-    savings_categories = Category.objects.filter(household=household, type='SAVINGS').order_by('name')
-    
-    # Build budget data structure
-    def build_budget_data(categories):
-        result = []
-        for category in categories:
-            months_data = {}
-            for month in months:
-                month_date = date(int(year), month, 1)
-                budget = Budget.objects.filter(
-                    category=category,
-                    start_date__year=year,
-                    start_date__month=month
-                ).first()
-                months_data[month] = {
-                    'amount': float(budget.amount) if budget else 0.0,
-                    'budget_id': budget.id if budget else None,
-                    'is_paid': budget.is_paid if budget else False
-                }
-            
-            result.append({
-                'category': CategoryListSerializer(category).data,
-                'months': months_data,
-                'is_parent': category.parent is None,
-                'has_children': category.children.exists()
-            })
-        return result
-    
-    income_budget_data = build_budget_data(income_categories)
-    expense_budget_data = build_budget_data(expense_categories)
-    savings_budget_data = build_budget_data(savings_categories)
-    
-    return Response({
-        'year': year,
-        'active_month': active_month,
-        'months': months,
-        'month_names': month_names,
-        'income_budget_data': income_budget_data,
-        'expense_budget_data': expense_budget_data,
-        'savings_budget_data': savings_budget_data,
-    })
+
+    # Only the selected sections are built
+    results = summaries.run_parts(summaries.yearly_parts(household, year, fieldset))
+    return Response(summaries.assemble_yearly(year, active_month, fieldset, results))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(outstanding_payments_validators)
 def outstanding_payments_data(request, year=None, month=None):
     """Get outstanding payments data (maintains existing functionality)"""
     household = get_user_household(request.user)
@@ -491,55 +611,73 @@ def outstanding_payments_data(request, year=None, month=None):
         today = date.today()
         year = year or today.year
         month = month or today.month
+
+    results = summaries.run_parts(summaries.outstanding_parts(household, year, month))
+    return Response(summaries.assemble_outstanding(year, month, results))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Changes to the active household since a sync cursor (see finance/sync.py).
+    Without `since` every row is returned; keep requesting with the returned cursor while
+    has_more is true, then store it for the next sync.
+    """
+    household = get_user_household(request.user, request)
+    if not household:
+        return Response({'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        changes = sync.changes_since(household, request.query_params.get('since'), request.query_params.get('limit'))
+    except sync.InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except sync.CursorExpired as e:
+        return Response({'error': str(e), 'reset': True}, status=status.HTTP_410_GONE)
+    return Response(changes)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def reconciliation_data(request, year, month):
+    """
+    Budget vs actual transaction totals per category for a month.
+    POST with {"mark_paid": true} also marks budgets paid whose actuals have reached the budgeted amount.
+    """
+    household = get_user_household(request.user, request)
+    if not household:
+        return Response({'error': 'No household found'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= month <= 12:
+        return Response({'error': 'Invalid month'}, status=status.HTTP_400_BAD_REQUEST)
     
-    month_date = date(int(year), int(month), 1)
-    month_name = calendar.month_name[int(month)]
-    
-    # Get parent categories with manual payment tracking
-    parent_categories = Category.objects.filter(
-        household=household,
-        type='EXPENSE',
-        payment_type='MANUAL',
-        parent__isnull=True
-    ).prefetch_related('children')
-    
-    grouped_budgets = []
-    total = 0
-    
-    for parent in parent_categories:
-        items = []
-        subtotal = 0
-        
-        for child in parent.children.all():
-            budget = Budget.objects.filter(
-                category=child,
-                start_date__year=year,
-                start_date__month=month
-            ).first()
-            
-            if budget and budget.amount > 0 and not budget.is_paid:
-                items.append({
-                    'id': budget.id,
-                    'category': CategoryListSerializer(child).data,
-                    'amount': float(budget.amount),
-                    'is_paid': budget.is_paid
-                })
-                subtotal += float(budget.amount)
-        
-        if items:
-            grouped_budgets.append({
-                'parent': CategoryListSerializer(parent).data,
-                'items': items,
-                'subtotal': float(subtotal)
-            })
-            total += subtotal
+    mark_paid = request.method == 'POST' and str(request.data.get('mark_paid', '')).lower() in ('1', 'true', 'yes')
+    result = reconcile_month(household, year, month, mark_paid=mark_paid)
     
     return Response({
-        'year': year,
-        'month': month,
-        'month_name': month_name,
-        'grouped_budgets': grouped_budgets,
-        'total': float(total)
+        'year': result['year'],
+        'month': result['month'],
+        'month_name': calendar.month_name[month],
+        'marked_paid': result['marked_paid'],
+        'categories': [
+            {
+                'category_id': row['category_id'],
+                'category_name': row['category_name'],
+                'type': row['type'],
+                'parent_id': row['parent_id'],
+                'has_children': row['has_children'],
+                'budget_id': row['budget_id'],
+                'budgeted': float(row['budgeted']),
+                'actual': float(row['actual']),
+                'remaining': float(row['remaining']),
+                'reached': row['reached'],
+                'is_paid': row['is_paid'],
+            }
+            for row in result['rows']
+        ],
+        'summary': {
+            category_type: {'budgeted': float(totals['budgeted']), 'actual': float(totals['actual'])}
+            for category_type, totals in result['summary'].items()
+        },
     })
 
 
@@ -682,3 +820,36 @@ def export_transactions_excel_api(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+async def live_events(request):
+    """
+    Server-Sent Events stream of the active household's budget, payment and category changes
+    (see finance/events.py). Starts with a 'ready' event carrying the household's data
+    version, so a reconnecting client can tell whether it missed anything. A plain async
+    Django view: streaming needs the ASGI server, since a WSGI worker would be tied up for
+    as long as the page stays open.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live updates need the ASGI server'}, status=501)
+    bus = events.get_bus()
+    if bus is None:
+        return JsonResponse({'error': 'Live updates are disabled'}, status=404)
+    household = await sync_to_async(get_user_household)(user, request)
+    if not household:
+        return JsonResponse({'error': 'No household found'}, status=400)
+
+    # Subscribe before reading the version, so no change falls between the two
+    subscription = bus.subscribe(household.id)
+    try:
+        data_version = await Household.objects.filter(pk=household.pk).values_list('data_version', flat=True).aget()
+    except BaseException:
+        subscription.close()
+        raise
+    ready = {'type': 'ready', 'household': household.id, 'data_version': data_version}
+    response = StreamingHttpResponse(events.stream(subscription, ready), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx would otherwise buffer the stream
+    return response
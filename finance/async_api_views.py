@@ -0,0 +1,146 @@
+"""
+Async API Views for Finance Flow
+ASGI versions of the dashboard, yearly budget and outstanding payments endpoints
+
+Same URLs, parameters, validators and JSON as the DRF views in api_views.py (both build their
+responses from finance/summaries.py), but the independent parts of a response, such as the income,
+expense and savings sections, the totals and the unpaid count, are computed concurrently, and
+no worker thread is held while they wait on the database. api_urls.py routes to these views
+when API_ASYNC_VIEWS is set, which pays off under an ASGI server (see budget_app/asgi.py).
+
+Django's async ORM runs all queries of a request one at a time on the request's own thread.
+With API_ASYNC_PARALLEL_QUERIES each part instead runs in the thread pool on that thread's
+own database connection, so the parts' queries really overlap. The cost is a persistent
+connection per pool thread.
+"""
+import asyncio
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework import serializers
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from . import summaries
+from .api_views import (
+    DASHBOARD_FIELDS, YEARLY_BUDGET_FIELDS, _dashboard_active_date,
+    dashboard_validators, yearly_budget_validators, outstanding_payments_validators,
+)
+from .conditional import async_conditional_get
+from .fieldsets import parse_fieldset
+from .renderers import FastJSONRenderer
+from .views import get_user_household
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+async def _authenticate(request):
+    """The user from the session or, as DRF's TokenAuthentication does, an Authorization: Token header"""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    try:
+        result = await sync_to_async(TokenAuthentication().authenticate)(Request(request))
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def authenticated(view):
+    """Refuse anonymous requests like DRF's IsAuthenticated does (403 with a detail message)"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await _authenticate(request)
+        if user is None:
+            return json_response({'detail': 'Authentication credentials were not provided.'}, status=403)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _on_own_connection(function):
+    """`function` wrapped like a request: stale connections are closed before and after"""
+    @wraps(function)
+    def run(*args):
+        close_old_connections()
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+    return run
+
+
+async def run_parts(parts):
+    """Compute `parts` (see summaries.py) concurrently; returns {name: result}"""
+    if getattr(settings, 'API_ASYNC_PARALLEL_QUERIES', True):
+        calls = [sync_to_async(_on_own_connection(function), thread_sensitive=False)(*args)
+                 for function, args in parts.values()]
+    else:
+        calls = [sync_to_async(function)(*args) for function, args in parts.values()]
+    return dict(zip(parts, await asyncio.gather(*calls)))
+
+
+def _fieldset(request, available):
+    try:
+        return parse_fieldset(request, available) or available, None
+    except serializers.ValidationError as e:
+        return None, json_response(e.detail, status=400)
+
+
+@require_safe
+@authenticated
+@async_conditional_get(dashboard_validators)
+async def dashboard_data(request):
+    """Dashboard data, as api_views.dashboard_data; supports fields/exclude"""
+    household = await sync_to_async(get_user_household)(request.user, request)
+    if not household:
+        return json_response({'error': 'No household found'}, status=400)
+    fieldset, error = _fieldset(request, DASHBOARD_FIELDS)
+    if error:
+        return error
+    active_date = await sync_to_async(_dashboard_active_date)(request)
+
+    results = await run_parts(summaries.dashboard_parts(household, active_date, fieldset))
+    return json_response(summaries.assemble_dashboard(active_date, fieldset, results))
+
+
+@require_safe
+@authenticated
+@async_conditional_get(yearly_budget_validators)
+async def yearly_budget_data(request, year):
+    """Yearly budget grid, as api_views.yearly_budget_data; supports fields/exclude"""
+    household = await sync_to_async(get_user_household)(request.user)
+    if not household:
+        return json_response({'error': 'No household found'}, status=400)
+    fieldset, error = _fieldset(request, YEARLY_BUDGET_FIELDS)
+    if error:
+        return error
+    active_month = int(request.GET.get('month', date.today().month))
+
+    results = await run_parts(summaries.yearly_parts(household, year, fieldset))
+    return json_response(summaries.assemble_yearly(year, active_month, fieldset, results))
+
+
+@require_safe
+@authenticated
+@async_conditional_get(outstanding_payments_validators)
+async def outstanding_payments_data(request, year=None, month=None):
+    """Unpaid manual expenses of a month, as api_views.outstanding_payments_data"""
+    household = await sync_to_async(get_user_household)(request.user)
+    if not household:
+        return json_response({'error': 'No household found'}, status=400)
+    if not year or not month:
+        today = date.today()
+        year = year or today.year
+        month = month or today.month
+
+    results = await run_parts(summaries.outstanding_parts(household, year, month))
+    return json_response(summaries.assemble_outstanding(year, month, results))
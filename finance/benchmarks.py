@@ -0,0 +1,258 @@
+"""
+Performance benchmarks for Finance Flow
+Measures query count, wall time and peak memory of views, API endpoints, Excel exporters,
+list serializers (model vs values() fast path) and JSON renderers against synthetic households
+of several sizes, plus the yearly budget API's payload size with and without gzip. Run with `python manage.py run_benchmarks`.
+
+Timings and memory vary from run to run and machine to machine, so results files are not
+committed. `baseline()` keeps only what a run reproduces exactly, the dataset shapes and
+query counts. It is committed as benchmarks/baseline.json, so a change that adds queries
+shows up in its diff.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from datetime import date
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from . import excel_reports
+from .renderers import FastJSONRenderer
+from .models import Category, Budget, Transaction
+from .serializers import CategoryListSerializer, BudgetSerializer, TransactionSerializer, values_serializer
+from .synthetic import seed_household
+
+# name -> (categories, years of budgets, transactions)
+SIZES = {
+    'small': (10, 1, 1_000),
+    'medium': (100, 5, 100_000),
+    'large': (500, 20, 1_000_000),
+}
+DEFAULT_SIZES = ('small', 'medium')
+# Rows serialized per run by the serializer:* targets
+SERIALIZER_ROWS = 5_000
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that counts queries.
+    Unlike connection.queries it works without DEBUG and isn't cleared by request_started.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, repeat=3):
+    """
+    Run `func` once to warm up, once while counting queries and tracing allocations for peak
+    memory, then `repeat` more times untraced for wall time (tracing would distort timings).
+    The warm-up keeps one-time work, such as the first request storing the session's active
+    month or filling the fragment cache, out of the counted run.
+    """
+    func()
+    gc.collect()
+    counter = QueryCounter()
+    tracemalloc.start()
+    with connection.execute_wrapper(counter):
+        func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'queries': counter.count,
+        'time_ms_median': round(statistics.median(timings), 2),
+        'time_ms_min': round(min(timings), 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def logged_in_client(household, user):
+    client = Client()
+    client.force_login(user)
+    session = client.session
+    session['active_household_id'] = household.id
+    session.save()
+    return client
+
+
+def yearly_budget_payload(household, user):
+    """Bytes on the wire for the yearly budget API, as plain JSON and gzipped"""
+    client = logged_in_client(household, user)
+    url = reverse('api_yearly_budget', args=[date.today().year])
+    plain = client.get(url)
+    compressed = client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+    return {
+        'json_bytes': len(plain.content),
+        'response_bytes_gzip': len(compressed.content),
+        'content_encoding': compressed.get('Content-Encoding'),
+    }
+
+
+def get_targets(household, user):
+    """
+    The views, endpoints and exporters to benchmark, as name -> zero-arg callable.
+    HTTP targets go through the full middleware stack with a logged-in client.
+    """
+    client = logged_in_client(household, user)
+
+    year = date.today().year
+    month = date.today().month
+    first_leaf = household.categories.filter(parent__isnull=False).first() or household.categories.first()
+
+    def get(url, **headers):
+        def run():
+            response = client.get(url, **headers)
+            assert response.status_code == 200, f'{url} returned {response.status_code}'
+        return run
+
+    def uncached(run):
+        # Render every template fragment again, as on the first visit after a change
+        def run_uncached():
+            caches['fragments'].clear()
+            run()
+        return run_uncached
+
+    def serialize(serializer_class, queryset, fast):
+        # A list endpoint's serialization work for SERIALIZER_ROWS rows, query included
+        def run():
+            if fast:
+                serializer = values_serializer(serializer_class)
+                serializer.to_representation(serializer.rows(queryset)[:SERIALIZER_ROWS])
+            else:
+                serializer_class(queryset[:SERIALIZER_ROWS], many=True).data
+        return run
+
+    yearly_data = client.get(reverse('api_yearly_budget', args=[year])).data
+
+    def render(renderer_class):
+        # JSON rendering alone, on the yearly budget API's response data
+        return lambda: renderer_class().render(yearly_data)
+
+    serialized = {
+        'categories': (CategoryListSerializer, Category.objects.filter(household=household).select_related('parent')),
+        'budgets': (BudgetSerializer, Budget.objects.filter(category__household=household).select_related('category')),
+        'transactions': (
+            TransactionSerializer,
+            Transaction.objects.filter(household=household).select_related('category', 'household').order_by('-date', '-id'),
+        ),
+    }
+
+    targets = {
+        'view:dashboard': get(reverse('dashboard')),
+        'view:dashboard_uncached': uncached(get(reverse('dashboard'))),
+        'view:yearly_budget': get(reverse('yearly_budget_year', args=[year])),
+        'view:yearly_budget_uncached': uncached(get(reverse('yearly_budget_year', args=[year]))),
+        'view:outstanding_payments': get(reverse('outstanding_payments')),
+        'view:category_list': get(reverse('category_list')),
+        'view:transaction_list': get(reverse('transaction_list')),
+        'api:households': get('/api/households/'),
+        'api:categories': get('/api/categories/'),
+        'api:category_detail': get(f'/api/categories/{first_leaf.id}/'),
+        'api:budgets': get(f'/api/budgets/?year={year}'),
+        'api:transactions': get('/api/transactions/'),
+        'api:transactions_aggregate_category': get('/api/transactions/aggregate/?group_by=category'),
+        'api:transactions_aggregate_month': get('/api/transactions/aggregate/?group_by=month'),
+        'api:categorization_rules': get('/api/categorization-rules/'),
+        'api:category_notes': get('/api/category-notes/'),
+        'api:templates': get('/api/templates/'),
+        'api:dashboard': get(reverse('api_dashboard')),
+        'api:yearly_budget': get(reverse('api_yearly_budget', args=[year])),
+        'api:yearly_budget_gzip': get(reverse('api_yearly_budget', args=[year]), HTTP_ACCEPT_ENCODING='gzip'),
+        'render:yearly_budget_json': render(JSONRenderer),
+        'render:yearly_budget_fast': render(FastJSONRenderer),
+        'api:outstanding_payments': get(reverse('api_outstanding_payments_month', args=[year, month])),
+        'api:reconciliation': get(reverse('api_reconciliation', args=[year, month])),
+        'export:yearly_budget': lambda: excel_reports.export_yearly_budget(household, year),
+        'export:monthly_detail': lambda: excel_reports.export_monthly_detail(household, year, month),
+        'export:category_summary': lambda: excel_reports.export_category_summary(household, year),
+        'export:transactions': lambda: excel_reports.export_transactions(household, date(year, 1, 1), date(year, 12, 31)),
+        'export:category_setup': lambda: excel_reports.export_category_setup(household),
+    }
+    for name, (serializer_class, queryset) in serialized.items():
+        targets[f'serializer:{name}_model'] = serialize(serializer_class, queryset, fast=False)
+        targets[f'serializer:{name}_values'] = serialize(serializer_class, queryset, fast=True)
+    return targets
+
+
+def speedups(results):
+    """How many times faster each serializer:*_values target ran than its *_model counterpart"""
+    ratios = {}
+    for name, metrics in results.items():
+        if name.startswith('serializer:') and name.endswith('_model'):
+            fast = results.get(name[:-len('_model')] + '_values')
+            if fast and fast['time_ms_median']:
+                ratios[name[len('serializer:'):-len('_model')]] = round(
+                    metrics['time_ms_median'] / fast['time_ms_median'], 1
+                )
+    return ratios
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, only=None, log=None):
+    """
+    Seed one household per size and measure every target against it.
+    `only` optionally restricts targets to names containing any of the given substrings.
+    Returns {size: {'dataset': {...}, 'results': {target: metrics}}}.
+    """
+    report = {}
+    for size in sizes:
+        categories, years, transactions = SIZES[size]
+        if log:
+            log(f'Seeding {size}: {categories} categories, {years} years, {transactions} transactions')
+        started = time.perf_counter()
+        household, user = seed_household(
+            f'Benchmark {size}', categories=categories, years=years, transactions=transactions
+        )
+        seed_seconds = time.perf_counter() - started
+
+        results = {}
+        for name, func in get_targets(household, user).items():
+            if only and not any(fragment in name for fragment in only):
+                continue
+            results[name] = measure(func, repeat=repeat)
+            if log:
+                log(f'  {name}: {results[name]}')
+
+        report[size] = {
+            'dataset': {
+                'categories': categories,
+                'years': years,
+                'transactions': transactions,
+                'seed_seconds': round(seed_seconds, 1),
+            },
+            'results': results,
+            'serializer_speedups': speedups(results),
+            'yearly_budget_payload': yearly_budget_payload(household, user),
+        }
+        if log and report[size]['serializer_speedups']:
+            log(f"  values() serializer speedup: {report[size]['serializer_speedups']}")
+    return report
+
+
+BASELINE_PATH = 'benchmarks/baseline.json'
+
+
+def baseline(report):
+    """The reproducible part of a run_benchmarks() report: {size: {'dataset': {...}, 'queries': {target: count}}}"""
+    return {
+        size: {
+            'dataset': {key: value for key, value in entry['dataset'].items() if key != 'seed_seconds'},
+            'queries': {name: metrics['queries'] for name, metrics in entry['results'].items()},
+        }
+        for size, entry in report.items()
+    }
@@ -0,0 +1,203 @@
+"""
+Transaction Auto-Categorization for Finance Flow
+Compiles a household's CategorizationRules into a single matcher and applies it to batches
+"""
+import re
+import threading
+from collections import OrderedDict, defaultdict, deque
+
+from django.db.models import Count, Max
+
+from .models import CategorizationRule, Transaction
+from .reconciliation import invalidate_household
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher.
+    Finds every pattern occurring in a text in one pass over the text,
+    however many patterns there are.
+    """
+
+    def __init__(self, patterns):
+        # patterns: iterable of (pattern_text, value)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for text, value in patterns:
+            self._add(text, value)
+        self._build_failure_links()
+
+    def _add(self, text, value):
+        node = 0
+        for char in text:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = next_node
+        self.output[node].append(value)
+
+    def _build_failure_links(self):
+        # Depth-1 nodes fail back to the root (their default of 0)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find_all(self, text):
+        """Return the set of values whose pattern occurs anywhere in `text`"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class CompiledRuleSet:
+    """
+    A household's active rules compiled for fast matching.
+    Substring rules share one Aho-Corasick automaton; regex rules are prefiltered
+    by a single combined regex so descriptions matching none of them cost one search.
+    """
+
+    def __init__(self, rules):
+        rules = list(rules)
+        # Rank = position in (priority, id) order; lowest matching rank wins
+        self.category_ids = [rule.category_id for rule in rules]
+        self.constraints = [
+            (rule.min_amount, rule.max_amount, rule.transaction_type or None)
+            for rule in rules
+        ]
+
+        substring_rules = []
+        self.regex_rules = []
+        self.amount_only_ranks = []
+        for rank, rule in enumerate(rules):
+            if rule.match_type == 'CONTAINS':
+                substring_rules.append((rule.pattern.lower(), rank))
+            elif rule.match_type == 'REGEX':
+                # Rules saved before patterns were validated never run
+                if rule.regex_error() is None:
+                    self.regex_rules.append((rank, re.compile(rule.pattern, re.IGNORECASE)))
+            else:
+                self.amount_only_ranks.append(rank)
+
+        self.automaton = AhoCorasick(substring_rules) if substring_rules else None
+        self.regex_prefilter = None
+        if self.regex_rules:
+            combined = '|'.join(f'(?:{compiled.pattern})' for _, compiled in self.regex_rules)
+            try:
+                self.regex_prefilter = re.compile(combined, re.IGNORECASE)
+            except re.error:
+                # e.g. more groups than one pattern may hold; fall back to testing every regex rule
+                pass
+
+    def __len__(self):
+        return len(self.category_ids)
+
+    def match(self, description, amount, transaction_type=None):
+        """Return the category id of the highest-priority matching rule, or None"""
+        candidates = set(self.amount_only_ranks)
+        text = (description or '').lower()
+        if self.automaton:
+            candidates |= self.automaton.find_all(text)
+        if self.regex_rules and (self.regex_prefilter is None or self.regex_prefilter.search(text)):
+            candidates.update(rank for rank, compiled in self.regex_rules if compiled.search(text))
+
+        for rank in sorted(candidates):
+            min_amount, max_amount, rule_type = self.constraints[rank]
+            if rule_type and transaction_type and rule_type != transaction_type:
+                continue
+            if min_amount is not None and amount < min_amount:
+                continue
+            if max_amount is not None and amount > max_amount:
+                continue
+            return self.category_ids[rank]
+        return None
+
+
+# Compiled rule sets of the most recently used households, per worker process
+RULESET_CACHE_SIZE = 256
+_ruleset_cache = OrderedDict()
+_ruleset_cache_lock = threading.Lock()
+
+
+def get_ruleset(household):
+    """
+    Return the compiled rules for `household`, recompiling only when its rules changed.
+    Staleness is checked with one aggregate query, so edits made by other workers are picked up.
+    """
+    rules = CategorizationRule.objects.filter(household=household, is_active=True)
+    signature = tuple(rules.aggregate(count=Count('id'), last_change=Max('updated_at')).values())
+
+    with _ruleset_cache_lock:
+        cached = _ruleset_cache.get(household.id)
+        if cached and cached[0] == signature:
+            _ruleset_cache.move_to_end(household.id)
+            return cached[1]
+
+    ruleset = CompiledRuleSet(rules.order_by('priority', 'id'))
+    with _ruleset_cache_lock:
+        _ruleset_cache[household.id] = (signature, ruleset)
+        _ruleset_cache.move_to_end(household.id)
+        while len(_ruleset_cache) > RULESET_CACHE_SIZE:
+            _ruleset_cache.popitem(last=False)
+    return ruleset
+
+
+def recategorize_household(household, only_uncategorized=True, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Re-run the household's rules over its stored transactions.
+    Reads id/description/amount/type in keyset-paginated batches and issues
+    one UPDATE per matched category per batch. Returns the number of rows updated.
+    """
+    ruleset = get_ruleset(household)
+    if not len(ruleset):
+        return 0
+
+    queryset = Transaction.objects.filter(household=household)
+    if only_uncategorized:
+        queryset = queryset.filter(category__isnull=True)
+
+    updated = 0
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'description', 'amount', 'type', 'category_id')[:batch_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        assignments = defaultdict(list)
+        for transaction_id, description, amount, transaction_type, current_category_id in rows:
+            category_id = ruleset.match(description, amount, transaction_type)
+            if category_id and category_id != current_category_id:
+                assignments[category_id].append(transaction_id)
+
+        for category_id, transaction_ids in assignments.items():
+            updated += Transaction.objects.filter(id__in=transaction_ids).update(category_id=category_id)
+
+    if updated:
+        # Queryset updates skip the signals that keep reconciliation totals current
+        invalidate_household(household.id)
+    return updated
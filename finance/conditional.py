@@ -0,0 +1,91 @@
+"""
+HTTP Conditional Requests for Finance Flow
+ETag/Last-Modified validators, 304 responses and private caching headers for read-only APIs
+
+Validators must be cheap: they read the household's data version or a max(updated_at)
+aggregate, never the data the view would serialize. A polling client that sends back the
+ETag (If-None-Match) or Last-Modified (If-Modified-Since) it was given gets an empty
+304 response until something changes.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .fieldsets import fieldset_etag_part
+from .versioning import household_etag
+from .views import get_user_household
+
+
+def _precondition(request, etag, last_modified):
+    """Quoted ETag, timestamp and, when the client's copy is current, the 304 response"""
+    etag = quote_etag(str(etag)) if etag is not None else None
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def _add_validators(response, etag, timestamp):
+    if response.status_code in (200, 304):
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if timestamp is not None:
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+        patch_cache_control(response, private=True, max_age=0)
+    return response
+
+
+def conditional_get(validators):
+    """
+    Decorator for GET views. `validators(request, *args, **kwargs)` returns an
+    (etag, last_modified) pair, either of which may be None. Matching requests are answered
+    with 304 without calling the view; successful responses carry the validators and
+    `Cache-Control: private, max-age=0` so browsers keep them but always revalidate.
+    Place it below `@api_view` so authentication and permissions run first.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            etag, timestamp, response = _precondition(request, *validators(request, *args, **kwargs))
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _add_validators(response, etag, timestamp)
+        return wrapper
+    return decorator
+
+
+def async_conditional_get(validators):
+    """conditional_get for async views; the (sync) validators run in a thread"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            state = await sync_to_async(validators)(request, *args, **kwargs)
+            etag, timestamp, response = _precondition(request, *state)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _add_validators(response, etag, timestamp)
+        return wrapper
+    return decorator
+
+
+def household_validators(parts, use_session=True):
+    """
+    Validators for a view built only from the user's household data: the ETag combines the
+    household, its data version, `parts(request, *args, **kwargs)` (view name, month, ...) and
+    any fields/exclude selection; Last-Modified is the household's data_changed_at
+    """
+    def validators(request, *args, **kwargs):
+        household = get_user_household(request.user, request if use_session else None)
+        if not household:
+            return None, None
+        etag_parts = parts(request, *args, **kwargs)
+        fieldset = fieldset_etag_part(request)
+        if fieldset:
+            etag_parts = (*etag_parts, fieldset)
+        return household_etag(household, *etag_parts), household.data_changed_at
+    return validators
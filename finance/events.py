@@ -0,0 +1,268 @@
+"""
+Live Events for Finance Flow
+Budget, payment and category changes pushed to every open page of a household
+
+Saves publish small events ('budget' for a cell's amount, 'payment' for a paid toggle,
+'category' for a category saved or deleted, 'reload' for bulk changes that are not worth
+describing row by row) once their transaction commits. The /api/events/ Server-Sent
+Events stream relays them to the household's members, so the yearly grid can patch a
+cell in place instead of being rebuilt.
+
+Events travel over a bus chosen by LIVE_EVENTS_BUS: 'local' keeps them in this process
+(enough for one worker, and what the tests use), 'postgres' sends them through
+LISTEN/NOTIFY so every worker and server sees every event, and '' turns them off. Delivery
+is best effort: a client that reconnects, or falls too far behind, gets a 'reload' and
+re-fetches what it shows.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Events waiting per connection before the client is told to reload instead
+QUEUE_SIZE = 256
+
+
+class Subscription:
+    """One stream's queue of events; filled from any thread, read on the stream's event loop"""
+
+    def __init__(self, bus, household_id):
+        self.bus = bus
+        self.household_id = household_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """The next event, or None after `timeout` seconds without one"""
+        if self.overflowed:
+            # Events were dropped: replace whatever is queued with a single reload
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {'type': 'reload'}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class LocalMemoryBus:
+    """Delivers events to the subscribers in this process"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, household_id):
+        """A Subscription to `household_id`'s events; call from the stream's event loop"""
+        subscription = Subscription(self, household_id)
+        with self._lock:
+            self._subscribers[household_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.household_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.household_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, household_id, event):
+        self.deliver(household_id, event)
+
+    def deliver(self, household_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(household_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+class PostgresNotifyBus(LocalMemoryBus):
+    """
+    Publishes with NOTIFY on the default database; a listener thread per process LISTENs
+    (on its own psycopg2 connection) and delivers to the local subscribers. Payloads must stay under PostgreSQL's 8000 bytes,
+    which the small events here do.
+    """
+
+    channel = 'finance_events'
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, household_id, event):
+        payload = json.dumps({'household': household_id, 'event': event}, cls=DjangoJSONEncoder)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def subscribe(self, household_id):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='finance-events', daemon=True)
+                self._listener.start()
+        return super().subscribe(household_id)
+
+    def _listen(self):
+        wrapper = connections['default']
+        while True:
+            try:
+                listener = wrapper.get_new_connection(wrapper.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([listener], [], [], 30) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        message = json.loads(listener.notifies.pop(0).payload)
+                        self.deliver(message['household'], message['event'])
+            except Exception:
+                logger.exception('Listening for live events failed; reconnecting')
+                # Whatever was sent meanwhile is lost: have every open stream re-fetch
+                with self._lock:
+                    household_ids = list(self._subscribers)
+                for household_id in household_ids:
+                    self.deliver(household_id, {'type': 'reload'})
+                time.sleep(5)
+
+
+BUSES = {
+    'local': LocalMemoryBus,
+    'postgres': PostgresNotifyBus,
+}
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def check_bus_setting():
+    """Fail at startup on an unknown LIVE_EVENTS_BUS, rather than on every write that publishes"""
+    name = getattr(settings, 'LIVE_EVENTS_BUS', 'local')
+    if name and name not in BUSES:
+        raise ImproperlyConfigured(
+            f'Unknown LIVE_EVENTS_BUS {name!r}; choose from {", ".join(BUSES)}, or leave it empty to disable live events'
+        )
+
+
+def get_bus():
+    """The process-wide bus configured by LIVE_EVENTS_BUS, or None when live events are off"""
+    global _bus
+    name = getattr(settings, 'LIVE_EVENTS_BUS', 'local')
+    if not name:
+        return None
+    with _bus_lock:
+        if type(_bus) is not BUSES[name]:
+            _bus = BUSES[name]()
+        return _bus
+
+
+def heartbeat_interval():
+    return getattr(settings, 'LIVE_EVENTS_HEARTBEAT', 25)
+
+
+def publish(household_id, event):
+    """Send `event` to `household_id`'s streams once the current transaction commits"""
+    bus = get_bus()
+    if bus is None or household_id is None:
+        return
+    transaction.on_commit(partial(_publish, bus, household_id, event))
+
+
+def _publish(bus, household_id, event):
+    try:
+        bus.publish(household_id, event)
+    except Exception:
+        # Never fail the write that produced the event
+        logger.exception('Publishing live event failed')
+
+
+def publish_bulk_change(model, household_ids=(), category_ids=()):
+    """A 'reload' for the households whose categories or budgets changed through a queryset"""
+    if get_bus() is None or model._meta.model_name not in ('category', 'budget'):
+        return
+    household_ids = set(household_ids)
+    if category_ids:
+        household_ids.update(apps.get_model('finance', 'Category').objects.filter(
+            id__in=category_ids).values_list('household_id', flat=True))
+    for household_id in household_ids:
+        publish(household_id, {'type': 'reload'})
+
+
+def budget_event(budget, paid_only=False):
+    """The 'budget' (or, when only is_paid changed, 'payment') event of a saved budget"""
+    event = {
+        'type': 'payment' if paid_only else 'budget',
+        'budget': budget.pk,
+        'category': budget.category_id,
+        'year': budget.start_date.year,
+        'month': budget.start_date.month,
+        'is_paid': budget.is_paid,
+    }
+    if not paid_only:
+        event['amount'] = str(budget.amount)
+    return event
+
+
+def category_event(category, deleted=False):
+    if deleted:
+        return {'type': 'category', 'action': 'deleted', 'category': category.pk}
+    return {
+        'type': 'category',
+        'action': 'saved',
+        'category': category.pk,
+        'name': category.name,
+        'category_type': category.type,
+        'parent': category.parent_id,
+        'payment_type': category.payment_type,
+        'is_persistent': category.is_persistent,
+        'is_essential': category.is_essential,
+    }
+
+
+def format_event(event):
+    """`event` as a Server-Sent Events message"""
+    data = json.dumps(event, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def stream(subscription, first_event):
+    """Server-Sent Events for `subscription`, starting with `first_event`, until the client leaves"""
+    try:
+        yield f'retry: 3000\n{format_event(first_event)}'
+        while True:
+            event = await subscription.get(timeout=heartbeat_interval())
+            # A comment line keeps proxies from closing an idle connection
+            yield format_event(event) if event is not None else ': keep-alive\n\n'
+    finally:
+        subscription.close()
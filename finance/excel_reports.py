@@ -8,6 +8,7 @@ from openpyxl.utils import get_column_letter
 from django.http import HttpResponse
 from django.db.models import Sum, Q
 from .models import Budget, Category, Transaction, Household
+from .metrics import EXPORT_DURATION
 from datetime import datetime, date
 import calendar
 
@@ -49,6 +50,7 @@ def format_currency(value):
     return float(value)
 
 
+@EXPORT_DURATION.time(exporter='yearly_budget')
 def export_yearly_budget(household, year):
     """Export yearly budget overview to Excel"""
     wb = Workbook()
@@ -166,6 +168,7 @@ def export_yearly_budget(household, year):
     return wb
 
 
+@EXPORT_DURATION.time(exporter='monthly_detail')
 def export_monthly_detail(household, year, month):
     """Export detailed monthly budget to Excel"""
     wb = Workbook()
@@ -335,6 +338,7 @@ def export_monthly_detail(household, year, month):
     return wb
 
 
+@EXPORT_DURATION.time(exporter='category_summary')
 def export_category_summary(household, year):
     """Export category summary with yearly totals"""
     wb = Workbook()
@@ -411,6 +415,7 @@ def export_category_summary(household, year):
     return wb
 
 
+@EXPORT_DURATION.time(exporter='transactions')
 def export_transactions(household, start_date=None, end_date=None):
     """Export transaction history to Excel"""
     wb = Workbook()
@@ -523,6 +528,7 @@ def export_transactions(household, start_date=None, end_date=None):
     return wb
 
 
+@EXPORT_DURATION.time(exporter='category_setup')
 def export_category_setup(household):
     """Export category setup information with pivot structure by main category"""
     wb = Workbook()
@@ -0,0 +1,325 @@
+"""
+Bank Statement Import for Finance Flow
+Stream-parses CSV and OFX statements and bulk-inserts them as transactions
+"""
+import codecs
+import csv
+import hashlib
+import itertools
+import re
+from collections import namedtuple
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import Household, Transaction
+from .categorization import get_ruleset
+from .reconciliation import invalidate_household
+
+
+# A single normalized statement line. `amount` is signed: negative = money out.
+# `reference` is the bank's own transaction id when the format has one (OFX FITID).
+StatementLine = namedtuple('StatementLine', ['date', 'amount', 'description', 'reference'])
+
+ImportResult = namedtuple('ImportResult', ['created', 'duplicates', 'skipped', 'categorized', 'errors'])
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+# Header names (lower-cased) recognised for each CSV column
+CSV_DATE_COLUMNS = ('date', 'transaction date', 'posting date', 'posted date', 'value date', 'trans date')
+CSV_DESCRIPTION_COLUMNS = ('description', 'details', 'narrative', 'memo', 'payee', 'reference', 'transaction description')
+CSV_AMOUNT_COLUMNS = ('amount', 'transaction amount', 'value')
+CSV_DEBIT_COLUMNS = ('debit', 'debit amount', 'withdrawal', 'money out', 'paid out')
+CSV_CREDIT_COLUMNS = ('credit', 'credit amount', 'deposit', 'money in', 'paid in')
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y', '%d.%m.%Y', '%m/%d/%Y', '%d %b %Y', '%d %B %Y', '%Y%m%d')
+
+AMOUNT_CLEAN_RE = re.compile(r'[^\d.\-]')
+OFX_TAG_RE = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)', re.IGNORECASE)
+
+
+class StatementParseError(ValueError):
+    """Raised when a statement line cannot be normalized"""
+
+
+def parse_amount(value):
+    """
+    Normalize a bank amount string to a signed Decimal.
+    Handles currency symbols, thousand separators, '(12.00)' and trailing '-', 'CR' or 'DR'.
+    """
+    if value is None:
+        raise StatementParseError('Missing amount')
+    text = str(value).strip().upper()
+    if not text:
+        raise StatementParseError('Missing amount')
+
+    negative = False
+    if text.startswith('(') and text.endswith(')'):
+        negative = True
+        text = text[1:-1]
+    if text.endswith('DR'):
+        negative = True
+        text = text[:-2]
+    elif text.endswith('CR'):
+        text = text[:-2]
+    text = text.strip()
+    if text.endswith('-'):
+        negative = True
+        text = text[:-1]
+
+    # A lone comma followed by one or two trailing digits is a decimal comma (e.g. "1.234,56", "12,5");
+    # "1,234" keeps the comma as a thousand separator
+    if text.count(',') == 1 and re.search(r',\d{1,2}$', text):
+        text = text.replace('.', '').replace(',', '.')
+
+    cleaned = AMOUNT_CLEAN_RE.sub('', text)
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise StatementParseError(f'Invalid amount "{value}"')
+    return -abs(amount) if negative else amount
+
+
+def parse_date(value, date_format=None):
+    """Parse a statement date, trying `date_format` first and then the common bank formats"""
+    text = (value or '').strip()
+    if not text:
+        raise StatementParseError('Missing date')
+    if not date_format:
+        # Fast path for ISO dates, by far the most common export format
+        try:
+            return date.fromisoformat(text)
+        except ValueError:
+            pass
+    formats = (date_format,) + DATE_FORMATS if date_format else DATE_FORMATS
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise StatementParseError(f'Unrecognised date "{value}"')
+
+
+def _find_column(fieldnames, candidates):
+    """Return the first header in `fieldnames` matching one of `candidates` (case-insensitive)"""
+    lookup = {name.strip().lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in lookup:
+            return lookup[candidate]
+    return None
+
+
+def parse_csv(lines, date_format=None):
+    """
+    Lazily parse a bank CSV export into StatementLines.
+    `lines` is any iterable of text lines (an open file or decoded upload); nothing is read ahead.
+    Yields StatementParseError instances in place of rows that can't be read or normalized.
+    """
+    reader = csv.DictReader(lines)
+    try:
+        fieldnames = reader.fieldnames or []
+    except csv.Error as e:
+        raise StatementParseError(f'Unreadable CSV header: {e}')
+
+    date_col = _find_column(fieldnames, CSV_DATE_COLUMNS)
+    description_col = _find_column(fieldnames, CSV_DESCRIPTION_COLUMNS)
+    amount_col = _find_column(fieldnames, CSV_AMOUNT_COLUMNS)
+    debit_col = _find_column(fieldnames, CSV_DEBIT_COLUMNS)
+    credit_col = _find_column(fieldnames, CSV_CREDIT_COLUMNS)
+
+    if not date_col:
+        raise StatementParseError('CSV has no recognisable date column')
+    if not amount_col and not (debit_col or credit_col):
+        raise StatementParseError('CSV has no amount or debit/credit columns')
+
+    for line_number in itertools.count(2):
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # e.g. a field over the csv module's size limit; the reader resumes at the next line
+            yield StatementParseError(f'Line {line_number}: {e}')
+            continue
+        try:
+            if amount_col:
+                amount = parse_amount(row.get(amount_col))
+            else:
+                # Some banks fill the unused column with 0.00 rather than leaving it blank
+                debit = (row.get(debit_col) or '').strip() if debit_col else ''
+                credit = (row.get(credit_col) or '').strip() if credit_col else ''
+                debit_amount = parse_amount(debit) if debit else Decimal('0')
+                amount = -abs(debit_amount) if debit_amount else abs(parse_amount(credit))
+            yield StatementLine(
+                date=parse_date(row.get(date_col), date_format),
+                amount=amount,
+                description=(row.get(description_col) or '').strip() if description_col else '',
+                reference='',
+            )
+        except StatementParseError as e:
+            yield StatementParseError(f'Line {line_number}: {e}')
+
+
+def parse_ofx(lines):
+    """
+    Lazily parse an OFX (SGML or XML flavour) statement into StatementLines.
+    Only <STMTTRN> blocks are read; everything else in the file is ignored.
+    """
+    current = None
+    for raw_line in lines:
+        for closing, tag, value in OFX_TAG_RE.findall(raw_line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    current = {}
+                elif current is not None:
+                    yield _ofx_statement_line(current)
+                    current = None
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+
+def _ofx_statement_line(fields):
+    """Build a StatementLine from the collected tags of one <STMTTRN> block"""
+    try:
+        description = fields.get('NAME', '')
+        memo = fields.get('MEMO', '')
+        if memo and memo != description:
+            description = f'{description} {memo}'.strip()
+        return StatementLine(
+            # DTPOSTED is YYYYMMDD optionally followed by time and timezone
+            date=parse_date(fields.get('DTPOSTED', '')[:8], '%Y%m%d'),
+            amount=parse_amount(fields.get('TRNAMT')),
+            description=description,
+            reference=fields.get('FITID', ''),
+        )
+    except StatementParseError as e:
+        return StatementParseError(f'Transaction {fields.get("FITID", "?")}: {e}')
+
+
+def detect_format(filename):
+    """Guess the statement format from a file name"""
+    lowered = (filename or '').lower()
+    if lowered.endswith(('.ofx', '.qfx')):
+        return 'ofx'
+    return 'csv'
+
+
+def iter_statement_lines(lines, statement_format='csv', date_format=None):
+    """Dispatch to the parser for `statement_format`"""
+    if statement_format == 'ofx':
+        return parse_ofx(lines)
+    if statement_format == 'csv':
+        return parse_csv(lines, date_format=date_format)
+    raise StatementParseError(f'Unsupported statement format "{statement_format}"')
+
+
+def decode_upload(uploaded_file, encoding='utf-8-sig'):
+    """Stream an uploaded file as decoded text lines without loading it into memory"""
+    return codecs.iterdecode(uploaded_file, encoding, errors='replace')
+
+
+def compute_import_hash(line, occurrence=0):
+    """
+    Stable identity of a statement line, used to skip rows that were already imported.
+    Bank references are used when present; otherwise date, amount and description,
+    plus the occurrence number so genuinely repeated lines in one statement are kept.
+    """
+    if line.reference:
+        key = f'ref|{line.reference}'
+    else:
+        description = ' '.join(line.description.lower().split())
+        key = f'{line.date.isoformat()}|{line.amount:.2f}|{description}|{occurrence}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def import_transactions(household, statement_lines, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, categorize=True, on_batch=None):
+    """
+    Insert statement lines as transactions for `household` in batches.
+    Memory use is bounded by `batch_size` plus a short digest per distinct line seen.
+    Each batch locks the household row, then costs one indexed hash lookup, one bulk INSERT and one count.
+    Batches commit one by one; inside an outer transaction the lock would be held until it ends.
+    New rows are run through the household's categorization rules when `categorize` is set.
+    `on_batch(result_so_far)` is called after every flushed batch, for progress reporting.
+    """
+    created = duplicates = skipped = categorized = 0
+    ruleset = get_ruleset(household) if categorize else None
+    if ruleset is not None and not len(ruleset):
+        ruleset = None
+    errors = []
+    occurrences = {}
+    batch = []
+
+    def flush():
+        nonlocal created, duplicates, categorized
+        if not batch:
+            return
+        with transaction.atomic():
+            if not dry_run:
+                # Imports into one household take turns, so rows missing from the lookup are still missing at the INSERT
+                list(Household.objects.select_for_update().filter(pk=household.pk).values_list('pk'))
+            hashes = [h for _, h in batch]
+            existing = set(
+                Transaction.objects.filter(household=household, import_hash__in=hashes)
+                .values_list('import_hash', flat=True)
+            )
+            # Only build model instances for rows that will actually be inserted
+            seen = set(existing)
+            new_objects = []
+            for line, import_hash in batch:
+                if import_hash in seen:
+                    continue  # already imported, or a bank reference repeated within the statement
+                seen.add(import_hash)
+                new_objects.append(Transaction(
+                    household=household,
+                    date=line.date,
+                    amount=abs(line.amount),
+                    type='INCOME' if line.amount > 0 else 'EXPENSE',
+                    description=line.description,
+                    import_hash=import_hash,
+                ))
+            if ruleset:
+                for obj in new_objects:
+                    obj.category_id = ruleset.match(obj.description, obj.amount, obj.type)
+                    categorized += obj.category_id is not None
+            inserted = len(new_objects)
+            if new_objects and not dry_run:
+                Transaction.objects.bulk_create(new_objects, batch_size=batch_size, ignore_conflicts=True)
+                # ignore_conflicts silently skips conflicting rows: count what was actually inserted
+                inserted = Transaction.objects.filter(
+                    household=household, import_hash__in=hashes
+                ).count() - len(existing)
+            created += inserted
+            duplicates += len(batch) - inserted
+        batch.clear()
+        if on_batch:
+            on_batch(ImportResult(created, duplicates, skipped, categorized, errors))
+
+    for line in statement_lines:
+        if isinstance(line, StatementParseError):
+            skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(str(line))
+            continue
+
+        if line.amount == 0:
+            skipped += 1
+            continue
+
+        occurrence_key = hashlib.md5(
+            f'{line.date}|{line.amount}|{line.description}|{line.reference}'.encode('utf-8')
+        ).digest()
+        occurrence = occurrences.get(occurrence_key, 0)
+        occurrences[occurrence_key] = occurrence + 1
+
+        batch.append((line, compute_import_hash(line, occurrence)))
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    if created and not dry_run:
+        # bulk_create skips the signals that keep reconciliation totals current
+        invalidate_household(household.id)
+    return ImportResult(created, duplicates, skipped, categorized, errors)
@@ -0,0 +1,125 @@
+"""
+SQL Query Instrumentation for Finance Flow
+Per-request query recording and per-view aggregates, fed by QueryInstrumentationMiddleware
+
+Aggregates are kept in process memory, so with several workers each one reports its own traffic.
+"""
+import heapq
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('finance.queries')
+
+SLOWEST_PER_VIEW = 5
+MAX_SQL_LENGTH = 1000
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that times every statement of one request.
+    Install with `connection.execute_wrapper(recorder)`.
+    With `log_limit`, the first `log_limit` statements are also kept in order in `log`.
+    """
+
+    def __init__(self, log_limit=0):
+        self.count = 0
+        self.duration = 0.0  # seconds
+        self.slowest = []  # min-heap of (duration, sql), at most SLOWEST_PER_VIEW long
+        self.log_limit = log_limit
+        self.log = []  # (duration, sql); parameters are left out so no user data is kept
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            entry = (elapsed, sql[:MAX_SQL_LENGTH])
+            if len(self.log) < self.log_limit:
+                self.log.append((elapsed, sql))
+            if len(self.slowest) < SLOWEST_PER_VIEW:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+
+
+def get_query_budget(view_name):
+    """The maximum number of queries `view_name` may issue, or None for no limit"""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+class ViewStats:
+    __slots__ = ('requests', 'queries', 'db_time', 'total_time', 'max_queries', 'over_budget', 'slowest')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.total_time = 0.0
+        self.max_queries = 0
+        self.over_budget = 0
+        self.slowest = []
+
+
+class QueryStatsRegistry:
+    """Thread-safe per-view aggregates of recorded requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.since = time.time()
+
+    def record(self, view_name, recorder, total_time, over_budget):
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = ViewStats()
+            stats.requests += 1
+            stats.queries += recorder.count
+            stats.db_time += recorder.duration
+            stats.total_time += total_time
+            stats.max_queries = max(stats.max_queries, recorder.count)
+            stats.over_budget += over_budget
+            for entry in recorder.slowest:
+                if len(stats.slowest) < SLOWEST_PER_VIEW:
+                    heapq.heappush(stats.slowest, entry)
+                elif entry > stats.slowest[0]:
+                    heapq.heapreplace(stats.slowest, entry)
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+            self.since = time.time()
+
+    def snapshot(self):
+        """Per-view rows (times in milliseconds), heaviest total database time first"""
+        with self._lock:
+            items = [(name, stats, list(stats.slowest)) for name, stats in self._views.items()]
+        rows = []
+        for view_name, stats, slowest in items:
+            rows.append({
+                'view_name': view_name,
+                'requests': stats.requests,
+                'avg_queries': stats.queries / stats.requests,
+                'max_queries': stats.max_queries,
+                'budget': get_query_budget(view_name),
+                'over_budget': stats.over_budget,
+                'db_time_ms': stats.db_time * 1000,
+                'avg_db_time_ms': stats.db_time * 1000 / stats.requests,
+                'avg_time_ms': stats.total_time * 1000 / stats.requests,
+                'slowest': [
+                    {'duration_ms': duration * 1000, 'sql': sql}
+                    for duration, sql in sorted(slowest, reverse=True)
+                ],
+            })
+        rows.sort(key=lambda row: row['db_time_ms'], reverse=True)
+        return rows
+
+
+query_stats = QueryStatsRegistry()
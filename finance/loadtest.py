@@ -0,0 +1,200 @@
+"""
+Load Testing for Finance Flow
+Throughput and tail latency of the app under concurrent mixed load, per gunicorn profile
+
+Each profile of gunicorn.conf.py in SERVERS is started as a real server process on a local
+port, against a seeded copy of the database. Interactive client threads then request the
+dashboard, yearly budget and outstanding payments APIs round-robin for a fixed time, while
+a few export clients download Excel exports back to back. Every profile gets the same number
+of worker processes, so the results show how each worker model (sync, threaded, uvicorn)
+keeps interactive latency down while exports run. Run with `python manage.py run_load_test`.
+"""
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+from urllib.parse import quote
+
+from django.conf import settings
+
+from .benchmarks import SIZES, logged_in_client
+from .synthetic import seed_household
+
+# Profiles of gunicorn.conf.py (GUNICORN_PROFILE) to compare
+SERVERS = ('sync', 'gthread', 'asgi')
+DEFAULT_SERVERS = SERVERS
+
+
+def database_url(settings_dict):
+    """DATABASE_URL for the database described by `settings_dict` (SQLite files or PostgreSQL)"""
+    if settings_dict['ENGINE'].endswith('sqlite3'):
+        return f"sqlite:///{os.path.abspath(settings_dict['NAME'])}"
+    credentials = quote(settings_dict['USER'] or '')
+    if settings_dict['PASSWORD']:
+        credentials += ':' + quote(settings_dict['PASSWORD'])
+    host = settings_dict['HOST'] or 'localhost'
+    port = f":{settings_dict['PORT']}" if settings_dict['PORT'] else ''
+    return f"postgres://{credentials}@{host}{port}/{settings_dict['NAME']}"
+
+
+def endpoints():
+    today = date.today()
+    return [
+        f'/api/dashboard/?year={today.year}&month={today.month}',
+        f'/api/yearly-budget/{today.year}/?month={today.month}',
+        f'/api/outstanding-payments/{today.year}/{today.month}/',
+    ]
+
+
+def export_endpoints():
+    today = date.today()
+    return [
+        f'/api/export/yearly/{today.year}/',
+        f'/api/export/transactions/?start_date={today.year}-01-01&end_date={today.isoformat()}',
+    ]
+
+
+def start_server(name, workers, port, db_url, timeout=30):
+    """Start gunicorn with the `name` profile and wait until it answers"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+         '--workers', str(workers), '--bind', f'127.0.0.1:{port}'],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'GUNICORN_PROFILE': name, 'DATABASE_URL': db_url, 'DEBUG': 'False'},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{name} server exited: {process.stderr.read().decode()[-2000:]}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/login/')
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'{name} server did not start within {timeout}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def generate_load(port, clients, cookie, duration):
+    """
+    One thread per entry of `clients` (a list of paths) requests its paths in turn (one
+    connection per request, as browsers behind most proxies do) until `duration` seconds
+    have passed. Returns [(path, status or None on connection errors, latency ms)].
+    """
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(paths, offset):
+        local = []
+        index = offset
+        while time.monotonic() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                connection.request('GET', path, headers={'Cookie': cookie, 'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                connection.close()
+            except OSError:
+                status = None
+            local.append((path, status, (time.perf_counter() - started) * 1000))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(paths, offset)) for offset, paths in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(samples, duration):
+    latencies = [latency for _, status, latency in samples if status == 200]
+    summary = {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status != 200),
+        'requests_per_second': round(len(latencies) / duration, 1),
+    }
+    if latencies:
+        summary.update({
+            'latency_ms_median': round(statistics.median(latencies), 1),
+            'latency_ms_p95': round(percentile(latencies, 0.95), 1),
+            'latency_ms_p99': round(percentile(latencies, 0.99), 1),
+        })
+    return summary
+
+
+def run_load_test(db_url, servers=DEFAULT_SERVERS, size='small', workers=2, concurrency=16, export_clients=2,
+                  duration=10, port=8765, log=None):
+    """
+    Seed a household of `size` (see benchmarks.SIZES), then load each gunicorn profile in turn
+    with `concurrency` interactive clients and `export_clients` export clients.
+    The current database must be the one `db_url` points the servers at.
+    Returns {'dataset': {...}, 'servers': {name: {'interactive': {...}, 'export': {...}, 'endpoints': {path: {...}}}}}.
+    """
+    categories, years, transactions = SIZES[size]
+    if log:
+        log(f'Seeding {size}: {categories} categories, {years} years, {transactions} transactions')
+    household, user = seed_household(f'Load test {size}', categories=categories, years=years, transactions=transactions)
+    client = logged_in_client(household, user)
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    paths, exports = endpoints(), export_endpoints()
+    clients = [paths] * concurrency + [exports] * export_clients
+
+    results = {}
+    for name in servers:
+        if log:
+            log(f'{name}: {workers} workers, {concurrency} interactive and {export_clients} export clients, {duration}s')
+        process = start_server(name, workers, port, db_url)
+        try:
+            generate_load(port, clients, cookie, min(duration, 2))  # warm up
+            samples = generate_load(port, clients, cookie, duration)
+        finally:
+            stop_server(process)
+        results[name] = {
+            'interactive': summarize([sample for sample in samples if sample[0] in paths], duration),
+            'export': summarize([sample for sample in samples if sample[0] in exports], duration),
+            'endpoints': {
+                path: summarize([sample for sample in samples if sample[0] == path], duration)
+                for path in paths + exports
+            },
+        }
+        if log:
+            log(f"  interactive {results[name]['interactive']}")
+            log(f"  export      {results[name]['export']}")
+    return {
+        'dataset': {'size': size, 'categories': categories, 'years': years, 'transactions': transactions},
+        'workers': workers,
+        'concurrency': concurrency,
+        'export_clients': export_clients,
+        'duration_seconds': duration,
+        'servers': results,
+    }
@@ -0,0 +1,175 @@
+"""
+Shared base class for Finance Flow management commands
+Reports structured progress per phase: rows processed, rows/sec, elapsed time and query count
+
+Subclasses implement `run()` instead of `handle()` and wrap each unit of work in a phase:
+
+    with self.phase('transactions') as phase:
+        for batch in batches:
+            ...
+            phase.advance(len(batch))
+
+`--json` writes progress and the final summary to stdout as JSON lines (human-readable
+text moves to stderr), so runs can be monitored and compared. `--profile` runs the command
+under cProfile, saves the dump and prints the hottest functions.
+"""
+import cProfile
+import json
+import pstats
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, OutputWrapper
+from django.db import connections
+
+from finance.instrumentation import QueryRecorder
+
+PROGRESS_INTERVAL = 5.0  # seconds between progress reports within a phase
+
+
+class Phase:
+    def __init__(self, command, name):
+        self.command = command
+        self.name = name
+        self.rows = 0
+        self.recorder = QueryRecorder()
+        self.started = time.perf_counter()
+        self.finished = None
+        self._last_report = self.started
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def advance(self, rows=1):
+        """Count processed rows; reports progress at most every PROGRESS_INTERVAL seconds"""
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self.command.report('progress', self)
+
+    def as_dict(self):
+        elapsed = self.elapsed
+        return {
+            'phase': self.name,
+            'rows': self.rows,
+            'elapsed_s': round(elapsed, 3),
+            'rows_per_s': round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            'queries': self.recorder.count,
+            'db_time_s': round(self.recorder.duration, 3),
+        }
+
+
+class InstrumentedCommand(BaseCommand):
+    """BaseCommand with per-phase progress reporting and --json/--profile options"""
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Write progress and the summary to stdout as JSON lines (other output goes to stderr)'
+        )
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Run under cProfile, save the dump and print the hottest functions'
+        )
+        return parser
+
+    def run(self, *args, **options):
+        raise NotImplementedError('subclasses of InstrumentedCommand must provide a run() method')
+
+    def handle(self, *args, **options):
+        self.json_output = options['json']
+        self.phases = []
+        self.started = time.perf_counter()
+        self._json_stdout = self.stdout
+        if self.json_output:
+            # Keep stdout clean for the JSON lines
+            self.stdout = OutputWrapper(self.stderr._out)
+
+        profiler = cProfile.Profile() if options['profile'] else None
+        status = 'error'
+        try:
+            if profiler is not None:
+                profiler.enable()
+            result = self.run(*args, **options)
+            status = 'ok'
+            return result
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.report_summary(status)
+            if profiler is not None:
+                self.save_profile(profiler)
+            self.stdout = self._json_stdout
+
+    @contextmanager
+    def phase(self, name):
+        """Time a unit of work and count its queries; yields a Phase to `advance()`"""
+        phase = Phase(self, name)
+        self.phases.append(phase)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(phase.recorder))
+                yield phase
+        finally:
+            phase.finished = time.perf_counter()
+            self.report('phase', phase)
+
+    def report(self, event, phase):
+        data = phase.as_dict()
+        if self.json_output:
+            self._write_json({'event': event, 'command': self.command_name(), **data})
+            return
+        rate = f', {data["rows_per_s"]:,.0f} rows/s' if data['rows_per_s'] is not None else ''
+        line = (
+            f'  [{data["phase"]}] {data["rows"]:,} rows in {data["elapsed_s"]:.1f}s{rate}, '
+            f'{data["queries"]:,} queries ({data["db_time_s"]:.1f}s db)'
+        )
+        self.stdout.write(line if event == 'phase' else self.style.HTTP_INFO(line + ' ...'))
+
+    def report_summary(self, status):
+        elapsed = time.perf_counter() - self.started
+        phases = [phase.as_dict() for phase in self.phases]
+        totals = {
+            'rows': sum(p['rows'] for p in phases),
+            'elapsed_s': round(elapsed, 3),
+            'queries': sum(p['queries'] for p in phases),
+            'db_time_s': round(sum(p['db_time_s'] for p in phases), 3),
+        }
+        if self.json_output:
+            self._write_json({
+                'event': 'summary',
+                'command': self.command_name(),
+                'status': status,
+                'finished_at': datetime.now().isoformat(timespec='seconds'),
+                'phases': phases,
+                'total': totals,
+            })
+        elif phases:
+            self.stdout.write(
+                f'\nPerformance: {totals["rows"]:,} rows, {totals["queries"]:,} queries, '
+                f'{totals["elapsed_s"]:.1f}s total ({len(phases)} phase{"s" if len(phases) != 1 else ""})'
+            )
+
+    def save_profile(self, profiler, limit=25):
+        directory = Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles')) / 'commands'
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{self.command_name()}-{datetime.now():%Y%m%d-%H%M%S}.prof'
+        profiler.dump_stats(path)
+        self.stdout.write(f'\nProfile saved to {path}')
+        stats = pstats.Stats(profiler, stream=self.stdout._out)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+
+    def command_name(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def _write_json(self, data):
+        self._json_stdout.write(json.dumps(data, default=str))
@@ -5,17 +5,19 @@ This exports all categories, budgets, transactions, and notes for a household.
 Usage:
     python manage.py export_household_data <household_id_or_name> --output household_data.json
     python manage.py export_household_data "My Household" --output my_data.json
+    python manage.py export_household_data 3 --json  # Structured progress on stdout
 """
 import json
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 from django.contrib.auth import get_user_model
+from finance.management.base import InstrumentedCommand
 from finance.models import Household, Category, Budget, Transaction, CategoryNote
 from decimal import Decimal
 
 User = get_user_model()
 
 
-class Command(BaseCommand):
+class Command(InstrumentedCommand):
     help = 'Export household data (categories, budgets, transactions, notes) to JSON file'
 
     def add_arguments(self, parser):
@@ -31,7 +33,7 @@ class Command(BaseCommand):
             help='Output JSON file path (default: household_data.json)'
         )
 
-    def handle(self, *args, **options):
+    def run(self, *args, **options):
         household_id_or_name = options['household_identifier']
         output_file = options['output']
         
@@ -59,68 +61,63 @@ class Command(BaseCommand):
         }
         
         # Export categories (with parent relationships)
-        categories_map = {}  # id -> index in list
-        
-        # First pass: get all categories and build map
-        all_categories = Category.objects.filter(household=household).order_by('id')
-        for idx, cat in enumerate(all_categories):
-            categories_map[cat.id] = idx
-            export_data['categories'].append({
-                'name': cat.name,
-                'type': cat.type,
-                'is_persistent': cat.is_persistent,
-                'payment_type': cat.payment_type,
-                'is_essential': cat.is_essential,
-                'parent_id': cat.parent_id,  # Will resolve to name later
-            })
-        
-        # Second pass: resolve parent names
-        for cat_data in export_data['categories']:
-            if cat_data['parent_id']:
-                try:
-                    parent_cat = Category.objects.get(id=cat_data['parent_id'])
-                    cat_data['parent_name'] = parent_cat.name
-                except Category.DoesNotExist:
-                    cat_data['parent_name'] = None
-            else:
-                cat_data['parent_name'] = None
-            # Remove parent_id from export (we'll use parent_name for import)
-            del cat_data['parent_id']
+        with self.phase('categories') as phase:
+            all_categories = list(Category.objects.filter(household=household).order_by('id'))
+            category_names = {cat.id: cat.name for cat in all_categories}
+            for cat in all_categories:
+                export_data['categories'].append({
+                    'name': cat.name,
+                    'type': cat.type,
+                    'is_persistent': cat.is_persistent,
+                    'payment_type': cat.payment_type,
+                    'is_essential': cat.is_essential,
+                    # Resolved from the categories already loaded; import matches parents by name
+                    'parent_name': category_names.get(cat.parent_id),
+                })
+                phase.advance()
         
         # Export budgets
-        budgets = Budget.objects.filter(category__household=household).select_related('category')
-        for budget in budgets:
-            export_data['budgets'].append({
-                'category_name': budget.category.name,
-                'amount': str(budget.amount),  # Convert Decimal to string
-                'start_date': budget.start_date.isoformat(),
-                'end_date': budget.end_date.isoformat(),
-                'is_paid': budget.is_paid,
-            })
+        with self.phase('budgets') as phase:
+            budgets = Budget.objects.filter(category__household=household).select_related('category')
+            for budget in budgets.iterator(chunk_size=2000):
+                export_data['budgets'].append({
+                    'category_name': budget.category.name,
+                    'amount': str(budget.amount),  # Convert Decimal to string
+                    'start_date': budget.start_date.isoformat(),
+                    'end_date': budget.end_date.isoformat(),
+                    'is_paid': budget.is_paid,
+                })
+                phase.advance()
         
         # Export transactions
-        transactions = Transaction.objects.filter(household=household).select_related('category')
-        for trans in transactions:
-            export_data['transactions'].append({
-                'amount': str(trans.amount),
-                'date': trans.date.isoformat(),
-                'description': trans.description,
-                'category_name': trans.category.name if trans.category else None,
-                'type': trans.type,
-            })
+        with self.phase('transactions') as phase:
+            transactions = Transaction.objects.filter(household=household).select_related('category')
+            for trans in transactions.iterator(chunk_size=2000):
+                export_data['transactions'].append({
+                    'amount': str(trans.amount),
+                    'date': trans.date.isoformat(),
+                    'description': trans.description,
+                    'category_name': trans.category.name if trans.category else None,
+                    'type': trans.type,
+                })
+                phase.advance()
         
         # Export category notes
-        notes = CategoryNote.objects.filter(category__household=household).select_related('category', 'author')
-        for note in notes:
-            export_data['notes'].append({
-                'category_name': note.category.name,
-                'note': note.note,
-                'author_email': note.author.email if note.author else None,
-            })
+        with self.phase('notes') as phase:
+            notes = CategoryNote.objects.filter(category__household=household).select_related('category', 'author')
+            for note in notes:
+                export_data['notes'].append({
+                    'category_name': note.category.name,
+                    'note': note.note,
+                    'author_email': note.author.email if note.author else None,
+                })
+                phase.advance()
         
         # Write to JSON file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+        with self.phase('write') as phase:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(export_data, f, indent=2, ensure_ascii=False)
+            phase.advance(sum(len(export_data[key]) for key in ('categories', 'budgets', 'transactions', 'notes')))
         
         # Summary
         self.stdout.write(self.style.SUCCESS(f'\n✓ Export complete!'))
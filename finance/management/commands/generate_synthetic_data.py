@@ -0,0 +1,134 @@
+"""
+Management command to generate synthetic households for load testing.
+Category trees are copied from the active BudgetTemplates (run populate_default_template first),
+with multi-year rollover budgets, transactions and category notes.
+
+Usage:
+    python manage.py generate_synthetic_data --households 10
+    python manage.py generate_synthetic_data --households 100 --years 5 --transactions 100000 --workers 4
+    python manage.py generate_synthetic_data --households 5 --template "Basic Starter" --seed 42
+    python manage.py generate_synthetic_data --households 20 --json
+"""
+from django.core.management.base import CommandError
+from django.db import connection
+from finance.management.base import InstrumentedCommand
+from finance.models import BudgetTemplate
+from finance.synthetic import DEFAULT_BATCH_SIZE, generate_households_parallel
+
+
+class Command(InstrumentedCommand):
+    help = 'Generate synthetic households with categories, budgets, transactions and notes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--households',
+            type=int,
+            default=1,
+            help='Number of households to create (default: 1)'
+        )
+        parser.add_argument(
+            '--categories',
+            type=int,
+            default=0,
+            help='Minimum categories per household; templates are padded with extra sub-categories (default: template size)'
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=2,
+            help='Years of monthly budgets per household, ending this year (default: 2)'
+        )
+        parser.add_argument(
+            '--transactions',
+            type=int,
+            default=1000,
+            help='Transactions per household (default: 1000)'
+        )
+        parser.add_argument(
+            '--notes',
+            type=int,
+            default=10,
+            help='Category notes per household (default: 10)'
+        )
+        parser.add_argument(
+            '--template',
+            type=str,
+            action='append',
+            help='Template ID or name to use (repeatable; default: all active templates in turn)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed; the same seed produces the same data (default: 0)'
+        )
+        parser.add_argument(
+            '--prefix',
+            type=str,
+            default='Synthetic',
+            help='Household name and user email prefix (default: Synthetic)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk insert (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parallel worker processes (PostgreSQL only; default: 1)'
+        )
+
+    def run(self, *args, **options):
+        if options['households'] < 1:
+            raise CommandError('--households must be at least 1.')
+
+        templates = self.get_templates(options['template'])
+        if templates:
+            self.stdout.write(f'Using templates: {", ".join(t.name for t in templates)}')
+        else:
+            self.stdout.write(self.style.WARNING('⚠ No active budget templates; generating category trees instead'))
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('⚠ SQLite allows one writer at a time; running with 1 worker'))
+            workers = 1
+
+        self.stdout.write(f'Generating {options["households"]} household(s) with {workers} worker(s)...')
+
+        # Queries issued by worker processes aren't counted; with --workers 1 they all are
+        with self.phase('households') as phase:
+            created = generate_households_parallel(
+                options['households'],
+                workers,
+                seed=options['seed'],
+                prefix=options['prefix'],
+                templates=templates,
+                categories=options['categories'] or 10,
+                years=options['years'],
+                transactions=options['transactions'],
+                notes=options['notes'],
+                batch_size=options['batch_size'],
+            )
+            phase.advance(created)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Created {created} household(s) in {phase.elapsed:.1f}s'
+        ))
+        self.stdout.write(f'  Members log in as {options["prefix"].lower()}-{options["seed"]}-<n>@example.com / password')
+
+    def get_templates(self, identifiers):
+        if not identifiers:
+            return list(BudgetTemplate.objects.filter(is_active=True).order_by('id'))
+        templates = []
+        for identifier in identifiers:
+            try:
+                if identifier.isdigit():
+                    templates.append(BudgetTemplate.objects.get(id=int(identifier)))
+                else:
+                    templates.append(BudgetTemplate.objects.get(name=identifier))
+            except BudgetTemplate.DoesNotExist:
+                raise CommandError(f'Template "{identifier}" not found.')
+        return templates
@@ -5,10 +5,12 @@ This imports categories, budgets, transactions, and notes into a target househol
 Usage:
     python manage.py import_household_data household_data.json gertdj@outlook.com
     python manage.py import_household_data household_data.json gertdj@outlook.com --household-name "My Budget"
+    python manage.py import_household_data household_data.json gertdj@outlook.com --json --profile
 """
 import json
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 from django.contrib.auth import get_user_model
+from finance.management.base import InstrumentedCommand
 from finance.models import Household, Category, Budget, Transaction, CategoryNote
 from decimal import Decimal
 from datetime import datetime
@@ -16,7 +18,7 @@ from datetime import datetime
 User = get_user_model()
 
 
-class Command(BaseCommand):
+class Command(InstrumentedCommand):
     help = 'Import household data (categories, budgets, transactions, notes) from JSON file'
 
     def add_arguments(self, parser):
@@ -41,7 +43,7 @@ class Command(BaseCommand):
             help='Clear existing categories/budgets/transactions in the target household before importing'
         )
 
-    def handle(self, *args, **options):
+    def run(self, *args, **options):
         json_file = options['json_file']
         user_email = options['user_email']
         household_name = options.get('household_name')
@@ -75,113 +77,124 @@ class Command(BaseCommand):
         # Clear existing data if requested
         if clear_existing:
             self.stdout.write('Clearing existing data...')
-            Category.objects.filter(household=household).delete()
-            Transaction.objects.filter(household=household).delete()
+            with self.phase('clear') as phase:
+                deleted, _ = Category.objects.filter(household=household).delete()
+                phase.advance(deleted)
+                deleted, _ = Transaction.objects.filter(household=household).delete()
+                phase.advance(deleted)
             self.stdout.write('  ✓ Cleared existing categories and transactions')
         
         # Import categories (with parent relationships)
         self.stdout.write('\nImporting categories...')
         categories_map = {}  # name -> Category object
-        
-        # First pass: create all categories without parents
-        for cat_data in data.get('categories', []):
-            if cat_data.get('parent_name'):  # Skip sub-categories for now
-                continue
+        with self.phase('categories') as phase:
+            # First pass: create all categories without parents
+            for cat_data in data.get('categories', []):
+                if cat_data.get('parent_name'):  # Skip sub-categories for now
+                    continue
             
-            category = Category.objects.create(
-                household=household,
-                name=cat_data['name'],
-                type=cat_data['type'],
-                is_persistent=cat_data.get('is_persistent', False),
-                payment_type=cat_data.get('payment_type', 'AUTOMATIC'),
-                is_essential=cat_data.get('is_essential', True),
-                parent=None
-            )
-            categories_map[cat_data['name']] = category
-        
-        # Second pass: create sub-categories with parents
-        for cat_data in data.get('categories', []):
-            if not cat_data.get('parent_name'):  # Already created
-                continue
+                category = Category.objects.create(
+                    household=household,
+                    name=cat_data['name'],
+                    type=cat_data['type'],
+                    is_persistent=cat_data.get('is_persistent', False),
+                    payment_type=cat_data.get('payment_type', 'AUTOMATIC'),
+                    is_essential=cat_data.get('is_essential', True),
+                    parent=None
+                )
+                categories_map[cat_data['name']] = category
+                phase.advance()
+        
+            # Second pass: create sub-categories with parents
+            for cat_data in data.get('categories', []):
+                if not cat_data.get('parent_name'):  # Already created
+                    continue
             
-            parent = categories_map.get(cat_data['parent_name'])
-            if not parent:
-                self.stdout.write(self.style.WARNING(f'  ⚠ Parent "{cat_data["parent_name"]}" not found for "{cat_data["name"]}", creating as main category'))
-                parent = None
+                parent = categories_map.get(cat_data['parent_name'])
+                if not parent:
+                    self.stdout.write(self.style.WARNING(f'  ⚠ Parent "{cat_data["parent_name"]}" not found for "{cat_data["name"]}", creating as main category'))
+                    parent = None
             
-            category = Category.objects.create(
-                household=household,
-                name=cat_data['name'],
-                type=cat_data['type'],
-                is_persistent=cat_data.get('is_persistent', False),
-                payment_type=cat_data.get('payment_type', 'AUTOMATIC'),
-                is_essential=cat_data.get('is_essential', True),
-                parent=parent
-            )
-            categories_map[cat_data['name']] = category
+                category = Category.objects.create(
+                    household=household,
+                    name=cat_data['name'],
+                    type=cat_data['type'],
+                    is_persistent=cat_data.get('is_persistent', False),
+                    payment_type=cat_data.get('payment_type', 'AUTOMATIC'),
+                    is_essential=cat_data.get('is_essential', True),
+                    parent=parent
+                )
+                categories_map[cat_data['name']] = category
+                phase.advance()
         
         self.stdout.write(self.style.SUCCESS(f'  ✓ Imported {len(categories_map)} categories'))
         
         # Import budgets
         self.stdout.write('\nImporting budgets...')
         budget_count = 0
-        for budget_data in data.get('budgets', []):
-            category = categories_map.get(budget_data['category_name'])
-            if not category:
-                self.stdout.write(self.style.WARNING(f'  ⚠ Category "{budget_data["category_name"]}" not found, skipping budget'))
-                continue
+        with self.phase('budgets') as phase:
+            for budget_data in data.get('budgets', []):
+                category = categories_map.get(budget_data['category_name'])
+                if not category:
+                    self.stdout.write(self.style.WARNING(f'  ⚠ Category "{budget_data["category_name"]}" not found, skipping budget'))
+                    continue
             
-            Budget.objects.create(
-                category=category,
-                amount=Decimal(budget_data['amount']),
-                start_date=datetime.fromisoformat(budget_data['start_date']).date(),
-                end_date=datetime.fromisoformat(budget_data['end_date']).date(),
-                is_paid=budget_data.get('is_paid', False)
-            )
-            budget_count += 1
+                Budget.objects.create(
+                    category=category,
+                    amount=Decimal(budget_data['amount']),
+                    start_date=datetime.fromisoformat(budget_data['start_date']).date(),
+                    end_date=datetime.fromisoformat(budget_data['end_date']).date(),
+                    is_paid=budget_data.get('is_paid', False)
+                )
+                budget_count += 1
+                phase.advance()
         
         self.stdout.write(self.style.SUCCESS(f'  ✓ Imported {budget_count} budgets'))
         
         # Import transactions
         self.stdout.write('\nImporting transactions...')
         transaction_count = 0
-        for trans_data in data.get('transactions', []):
-            category = categories_map.get(trans_data.get('category_name')) if trans_data.get('category_name') else None
+        with self.phase('transactions') as phase:
+            for trans_data in data.get('transactions', []):
+                category = categories_map.get(trans_data.get('category_name')) if trans_data.get('category_name') else None
             
-            Transaction.objects.create(
-                household=household,
-                amount=Decimal(trans_data['amount']),
-                date=datetime.fromisoformat(trans_data['date']).date(),
-                description=trans_data.get('description', ''),
-                category=category,
-                type=trans_data.get('type', 'EXPENSE')
-            )
-            transaction_count += 1
+                Transaction.objects.create(
+                    household=household,
+                    amount=Decimal(trans_data['amount']),
+                    date=datetime.fromisoformat(trans_data['date']).date(),
+                    description=trans_data.get('description', ''),
+                    category=category,
+                    type=trans_data.get('type', 'EXPENSE')
+                )
+                transaction_count += 1
+                phase.advance()
         
         self.stdout.write(self.style.SUCCESS(f'  ✓ Imported {transaction_count} transactions'))
         
         # Import notes
         self.stdout.write('\nImporting notes...')
         note_count = 0
-        for note_data in data.get('notes', []):
-            category = categories_map.get(note_data['category_name'])
-            if not category:
-                self.stdout.write(self.style.WARNING(f'  ⚠ Category "{note_data["category_name"]}" not found, skipping note'))
-                continue
+        with self.phase('notes') as phase:
+            for note_data in data.get('notes', []):
+                category = categories_map.get(note_data['category_name'])
+                if not category:
+                    self.stdout.write(self.style.WARNING(f'  ⚠ Category "{note_data["category_name"]}" not found, skipping note'))
+                    continue
             
-            author = None
-            if note_data.get('author_email'):
-                try:
-                    author = User.objects.get(email=note_data['author_email'])
-                except User.DoesNotExist:
-                    pass  # Note will be created without author
+                author = None
+                if note_data.get('author_email'):
+                    try:
+                        author = User.objects.get(email=note_data['author_email'])
+                    except User.DoesNotExist:
+                        pass  # Note will be created without author
             
-            CategoryNote.objects.create(
-                category=category,
-                note=note_data['note'],
-                author=author
-            )
-            note_count += 1
+                CategoryNote.objects.create(
+                    category=category,
+                    note=note_data['note'],
+                    author=author
+                )
+                note_count += 1
+                phase.advance()
         
         self.stdout.write(self.style.SUCCESS(f'  ✓ Imported {note_count} notes'))
         
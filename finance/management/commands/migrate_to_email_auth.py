@@ -13,17 +13,19 @@ Then run this command to migrate existing user data.
 Usage: 
     python manage.py migrate_to_email_auth
     python manage.py migrate_to_email_auth --dry-run  # Preview changes
+    python manage.py migrate_to_email_auth --json  # Structured progress on stdout
 """
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from finance.management.base import InstrumentedCommand
 
 User = get_user_model()
 
 
-class Command(BaseCommand):
+class Command(InstrumentedCommand):
     help = 'Migrates existing users to use email as username. Creates email from username if needed.'
 
     def add_arguments(self, parser):
@@ -38,7 +40,7 @@ class Command(BaseCommand):
             help='Force update even if email already exists (use with caution)',
         )
 
-    def handle(self, *args, **options):
+    def run(self, *args, **options):
         dry_run = options['dry_run']
         force = options['force']
         
@@ -60,73 +62,75 @@ class Command(BaseCommand):
         users_with_errors = 0
         errors = []
         
-        for user in User.objects.all():
-            try:
-                current_email = user.email or ''
-                current_username = user.username or ''
+        with self.phase('users') as phase:
+            for user in User.objects.all():
+                phase.advance()
+                try:
+                    current_email = user.email or ''
+                    current_username = user.username or ''
                 
-                # Check if user already has a valid email
-                if current_email and current_email != '':
-                    try:
-                        validate_email(current_email)
-                        # User has valid email
-                        if not force:
-                            users_skipped += 1
-                            if not dry_run:
-                                self.stdout.write(f'✓ User ID {user.id}: Already has valid email ({current_email})')
-                            continue
-                    except ValidationError:
-                        # Email exists but is invalid
-                        self.stdout.write(self.style.WARNING(f'⚠ User ID {user.id}: Has invalid email ({current_email}), will fix'))
+                    # Check if user already has a valid email
+                    if current_email and current_email != '':
+                        try:
+                            validate_email(current_email)
+                            # User has valid email
+                            if not force:
+                                users_skipped += 1
+                                if not dry_run:
+                                    self.stdout.write(f'✓ User ID {user.id}: Already has valid email ({current_email})')
+                                continue
+                        except ValidationError:
+                            # Email exists but is invalid
+                            self.stdout.write(self.style.WARNING(f'⚠ User ID {user.id}: Has invalid email ({current_email}), will fix'))
                 
-                # Determine new email
-                new_email = None
+                    # Determine new email
+                    new_email = None
                 
-                # Strategy 1: If username is already a valid email, use it
-                if current_username:
-                    try:
-                        validate_email(current_username)
-                        new_email = current_username
-                        self.stdout.write(f'  → Username "{current_username}" is already a valid email')
-                    except ValidationError:
-                        pass
+                    # Strategy 1: If username is already a valid email, use it
+                    if current_username:
+                        try:
+                            validate_email(current_username)
+                            new_email = current_username
+                            self.stdout.write(f'  → Username "{current_username}" is already a valid email')
+                        except ValidationError:
+                            pass
                 
-                # Strategy 2: If we have a username that's not an email, create placeholder
-                if not new_email and current_username:
-                    # Create email from username
-                    # Remove any invalid characters for email
-                    safe_username = current_username.replace(' ', '_').replace('@', '_at_')
-                    new_email = f"{safe_username}@migrated.local"
-                    self.stdout.write(f'  → Creating email from username: {new_email}')
+                    # Strategy 2: If we have a username that's not an email, create placeholder
+                    if not new_email and current_username:
+                        # Create email from username
+                        # Remove any invalid characters for email
+                        safe_username = current_username.replace(' ', '_').replace('@', '_at_')
+                        new_email = f"{safe_username}@migrated.local"
+                        self.stdout.write(f'  → Creating email from username: {new_email}')
                 
-                # Strategy 3: Last resort - generic email
-                if not new_email:
-                    new_email = f"user_{user.id}@migrated.local"
-                    self.stdout.write(f'  → Creating generic email: {new_email}')
+                    # Strategy 3: Last resort - generic email
+                    if not new_email:
+                        new_email = f"user_{user.id}@migrated.local"
+                        self.stdout.write(f'  → Creating generic email: {new_email}')
                 
-                # Check for email conflicts
-                existing_user = User.objects.filter(email=new_email).exclude(id=user.id).first()
-                if existing_user:
-                    # Conflict - make it unique
-                    new_email = f"user_{user.id}@migrated.local"
-                    self.stdout.write(self.style.WARNING(f'  ⚠ Email conflict, using: {new_email}'))
+                    # Check for email conflicts
+                    existing_user = User.objects.filter(email=new_email).exclude(id=user.id).first()
+                    if existing_user:
+                        # Conflict - make it unique
+                        new_email = f"user_{user.id}@migrated.local"
+                        self.stdout.write(self.style.WARNING(f'  ⚠ Email conflict, using: {new_email}'))
                 
-                if dry_run:
-                    self.stdout.write(self.style.WARNING(f'[DRY RUN] Would update user ID {user.id}:'))
-                    self.stdout.write(f'  Current email: {current_email or "(empty)"}')
-                    self.stdout.write(f'  New email: {new_email}')
-                else:
-                    user.email = new_email
-                    user.save()
-                    self.stdout.write(self.style.SUCCESS(f'✓ Updated user ID {user.id}: email = {new_email}'))
+                    if dry_run:
+                        self.stdout.write(self.style.WARNING(f'[DRY RUN] Would update user ID {user.id}:'))
+                        self.stdout.write(f'  Current email: {current_email or "(empty)"}')
+                        self.stdout.write(f'  New email: {new_email}')
+                    else:
+                        user.email = new_email
+                        user.save()
+                        self.stdout.write(self.style.SUCCESS(f'✓ Updated user ID {user.id}: email = {new_email}'))
                 
-                users_updated += 1
+                    users_updated += 1
                 
-            except Exception as e:
-                users_with_errors += 1
-                error_msg = f'Error updating user ID {user.id}: {str(e)}'
-                errors.append(error_msg)
-                self.stdout.write(self.style.ERROR(f'✗ {error_msg}'))
+                except Exception as e:
+                    users_with_errors += 1
+                    error_msg = f'Error updating user ID {user.id}: {str(e)}'
+                    errors.append(error_msg)
+                    self.stdout.write(self.style.ERROR(f'✗ {error_msg}'))
         
         # Summary
         self.stdout.write('')
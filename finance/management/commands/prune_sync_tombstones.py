@@ -0,0 +1,20 @@
+"""
+Management command to delete delta-sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS.
+Cursors older than that are rejected anyway, so these rows can no longer be read.
+Run it from cron, e.g. daily.
+
+Usage:
+    python manage.py prune_sync_tombstones
+"""
+from finance import sync
+from finance.management.base import InstrumentedCommand
+
+
+class Command(InstrumentedCommand):
+    help = 'Delete delta-sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def run(self, *args, **options):
+        with self.phase('prune') as phase:
+            deleted = sync.prune_tombstones()
+            phase.advance(deleted)
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted:,} tombstone(s)'))
@@ -0,0 +1,70 @@
+"""
+Management command to re-run a household's categorization rules over stored transactions.
+
+Usage:
+    python manage.py recategorize_transactions "My Household"
+    python manage.py recategorize_transactions 3 --all
+    python manage.py recategorize_transactions --all-households
+    python manage.py recategorize_transactions --all-households --json
+"""
+from django.core.management.base import CommandError
+from finance.management.base import InstrumentedCommand
+from finance.models import Household
+from finance.categorization import recategorize_household, DEFAULT_BATCH_SIZE
+
+
+class Command(InstrumentedCommand):
+    help = "Apply categorization rules to a household's transactions in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'household_identifier',
+            type=str,
+            nargs='?',
+            help='Household ID or name'
+        )
+        parser.add_argument(
+            '--all-households',
+            action='store_true',
+            help='Recategorize every household that has rules'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Also re-evaluate transactions that already have a category'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Transactions read per batch (default: {DEFAULT_BATCH_SIZE})'
+        )
+
+    def run(self, *args, **options):
+        household_id_or_name = options['household_identifier']
+        if options['all_households']:
+            households = Household.objects.filter(categorization_rules__is_active=True).distinct()
+        elif household_id_or_name:
+            try:
+                if household_id_or_name.isdigit():
+                    households = [Household.objects.get(id=int(household_id_or_name))]
+                else:
+                    households = [Household.objects.get(name=household_id_or_name)]
+            except Household.DoesNotExist:
+                raise CommandError(f'Household "{household_id_or_name}" not found.')
+        else:
+            raise CommandError('Give a household ID/name or use --all-households.')
+
+        total_updated = 0
+        for household in households:
+            with self.phase(f'household {household.id}') as phase:
+                updated = recategorize_household(
+                    household,
+                    only_uncategorized=not options['all'],
+                    batch_size=options['batch_size'],
+                )
+                phase.advance(updated)
+            total_updated += updated
+            self.stdout.write(f'  ✓ {household.name}: {updated} transactions updated in {phase.elapsed:.1f}s')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Recategorization complete: {total_updated} transactions updated'))
@@ -0,0 +1,108 @@
+"""
+Management command to benchmark views, API endpoints and Excel exports against synthetic households.
+Runs in a throwaway test database and writes query counts, timings and peak memory as JSON.
+
+Usage:
+    python manage.py run_benchmarks
+    python manage.py run_benchmarks --sizes small medium large --repeat 5
+    python manage.py run_benchmarks --only api: export: --output benchmarks/api.json
+    python manage.py run_benchmarks --baseline
+
+With --baseline the query counts are also written to benchmarks/baseline.json, which is
+committed: rerun it after changing a view and review the diff.
+"""
+import json
+import platform
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from finance.benchmarks import SIZES, DEFAULT_SIZES, BASELINE_PATH, baseline, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Measure query count, wall time and peak memory of views, API endpoints and exporters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            default=list(DEFAULT_SIZES),
+            help=f'Dataset sizes to run: {", ".join(SIZES)} (default: {" ".join(DEFAULT_SIZES)})'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed runs per target (default: 3)'
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            help='Only run targets whose name contains one of these strings (e.g. api: export:)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmarks/results.json',
+            help='Where to write the JSON results (default: benchmarks/results.json)'
+        )
+        parser.add_argument(
+            '--baseline',
+            action='store_true',
+            help=f'Also write the query counts to {BASELINE_PATH} (committed, unlike the results)'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the test database afterwards'
+        )
+
+    def handle(self, *args, **options):
+        unknown = [size for size in options['sizes'] if size not in SIZES]
+        if unknown:
+            raise CommandError(f'Unknown size(s): {", ".join(unknown)}. Choose from {", ".join(SIZES)}.')
+        if options['baseline'] and options['only']:
+            raise CommandError('--baseline needs every target; leave out --only')
+
+        # Never touch real data: seed into a fresh test database
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            report = run_benchmarks(
+                sizes=options['sizes'],
+                repeat=options['repeat'],
+                only=options['only'],
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+            },
+            'sizes': report,
+        }
+        path = Path(options['output'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(output, indent=2, sort_keys=True) + '\n')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Benchmark results written to {path}'))
+
+        if options['baseline']:
+            path = Path(BASELINE_PATH)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(baseline(report), indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'✓ Query count baseline written to {path}'))
@@ -0,0 +1,94 @@
+"""
+Management command to load test the app under each gunicorn profile (see gunicorn.conf.py).
+Seeds a throwaway test database (a file for SQLite, so the server processes can share it),
+starts each profile with the same worker count, loads it with interactive API requests mixed
+with Excel exports and writes requests per second and latency percentiles as JSON.
+
+Usage:
+    python manage.py run_load_test
+    python manage.py run_load_test --workers 4 --concurrency 64 --export-clients 4 --duration 30
+    python manage.py run_load_test --servers gthread --size medium --output benchmarks/gthread.json
+"""
+import json
+import platform
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from finance.benchmarks import SIZES
+from finance.loadtest import SERVERS, DEFAULT_SERVERS, database_url, run_load_test
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and tail latency of the gunicorn profiles under interactive and export load'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servers',
+            nargs='+',
+            default=list(DEFAULT_SERVERS),
+            help=f'gunicorn profiles to run: {", ".join(SERVERS)} (default: {" ".join(DEFAULT_SERVERS)})'
+        )
+        parser.add_argument('--size', default='small', help=f'Dataset size: {", ".join(SIZES)} (default: small)')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server (default: 2)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent interactive clients (default: 16)')
+        parser.add_argument(
+            '--export-clients', type=int, default=2, help='Concurrent clients downloading exports (default: 2)'
+        )
+        parser.add_argument('--duration', type=int, default=10, help='Seconds of load per server (default: 10)')
+        parser.add_argument('--port', type=int, default=8765, help='Local port for the servers (default: 8765)')
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmarks/load_test.json',
+            help='Where to write the JSON results (default: benchmarks/load_test.json)'
+        )
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options['servers'] if name not in SERVERS]
+        if unknown:
+            raise CommandError(f'Unknown profile(s): {", ".join(unknown)}. Choose from {", ".join(SERVERS)}.')
+        if options['size'] not in SIZES:
+            raise CommandError(f'Unknown size: {options["size"]}. Choose from {", ".join(SIZES)}.')
+
+        # Never touch real data. SQLite test databases are in-memory unless given a file name.
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = str(Path(tempfile.gettempdir()) / 'finance_load_test.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = run_load_test(
+                database_url(connection.settings_dict),
+                servers=options['servers'],
+                size=options['size'],
+                workers=options['workers'],
+                concurrency=options['concurrency'],
+                export_clients=options['export_clients'],
+                duration=options['duration'],
+                port=options['port'],
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            **report,
+        }
+        path = Path(options['output'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(output, indent=2, sort_keys=True) + '\n')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Load test results written to {path}'))
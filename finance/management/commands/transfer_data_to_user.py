@@ -1,12 +1,17 @@
 """
 Management command to transfer data from Default Household to a user's household.
 Usage: python manage.py transfer_data_to_user <username>
+       python manage.py transfer_data_to_user <username> --no-input --json
 """
-from django.core.management.base import BaseCommand, CommandError
-from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.contrib.auth import get_user_model
+from finance.management.base import InstrumentedCommand
 from finance.models import Household, Category, Budget, Transaction
+from finance.reconciliation import invalidate_household
 
-class Command(BaseCommand):
+User = get_user_model()
+
+class Command(InstrumentedCommand):
     help = 'Transfers all data from Default Household to a user\'s household'
 
     def add_arguments(self, parser):
@@ -16,8 +21,14 @@ class Command(BaseCommand):
             action='store_true',
             help='Delete the Default Household after transfer (use with caution)',
         )
+        parser.add_argument(
+            '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Transfer without asking for confirmation',
+        )
 
-    def handle(self, *args, **options):
+    def run(self, *args, **options):
         username = options['username']
         delete_default = options['delete_default']
         
@@ -58,22 +69,29 @@ class Command(BaseCommand):
         
         # Confirm transfer
         self.stdout.write(self.style.WARNING('\nThis will move all categories, budgets, and transactions.'))
-        response = input('Continue? (yes/no): ')
-        if response.lower() not in ['yes', 'y']:
-            self.stdout.write('Transfer cancelled.')
-            return
+        if options['interactive']:
+            response = input('Continue? (yes/no): ')
+            if response.lower() not in ['yes', 'y']:
+                self.stdout.write('Transfer cancelled.')
+                return
         
         # Transfer categories (this will cascade to budgets through the foreign key)
-        categories = Category.objects.filter(household=default_household)
-        transferred = 0
-        for category in categories:
-            category.household = user_household
-            category.save()
-            transferred += 1
+        with self.phase('categories') as phase:
+            categories = Category.objects.filter(household=default_household)
+            transferred = 0
+            for category in categories:
+                category.household = user_household
+                category.save()
+                transferred += 1
+                phase.advance()
         
         # Transfer transactions
-        transactions = Transaction.objects.filter(household=default_household)
-        transactions.update(household=user_household)
+        with self.phase('transactions') as phase:
+            transactions = Transaction.objects.filter(household=default_household)
+            phase.advance(transactions.update(household=user_household))
+        # Queryset updates skip the signals that keep reconciliation totals current
+        invalidate_household(default_household.id)
+        invalidate_household(user_household.id)
         
         self.stdout.write(self.style.SUCCESS(f'\n✓ Transferred {transferred} categories'))
         self.stdout.write(self.style.SUCCESS(f'✓ Transferred {transactions_count} transactions'))
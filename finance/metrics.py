@@ -0,0 +1,302 @@
+"""
+Metrics Registry for Finance Flow
+In-process counters and histograms exposed in the Prometheus text format at /metrics
+
+Under gunicorn every worker keeps its own registry. With METRICS_MULTIPROC_DIR set, each worker
+writes its values to a file in that directory at most every METRICS_FLUSH_INTERVAL seconds (a
+timer writes the last changes once the interval is over, and again at exit), and /metrics sums
+all files, so a scrape served by any worker reports the whole server. Clear the directory when the server
+(not a worker) starts, e.g. from gunicorn's on_starting hook with `clear_multiproc_dir()`.
+"""
+import atexit
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FILE_PREFIX = 'metrics_'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def _key(self, labels):
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as missing:
+            raise ValueError(f'{self.name} requires label {missing}')
+
+    def _values(self):
+        return self.registry.values.setdefault(self.name, {})
+
+
+class Counter(Metric):
+    """A value that only goes up, e.g. requests served"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self._values()
+            values[key] = values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, samples):
+        for key, value in sorted(samples.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}'
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, e.g. request latency in seconds"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self._values()
+            # [count per bucket..., count above the last bucket, sum]
+            state = values.get(key)
+            if state is None:
+                state = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def time(self, **labels):
+        """Context manager and decorator that observes the elapsed wall time in seconds"""
+        return _Timer(self, labels)
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def render(self, samples):
+        for key, state in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_number(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_number(state[-1])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.values = {}  # {metric name: {label values tuple: value}}
+        self._pid = os.getpid()
+        self._file = None
+        self._last_flush = 0.0
+        self._flush_timer = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+        atexit.register(self._flush_at_exit)
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+
+    def _reset_after_fork(self):
+        # A forked worker (e.g. of a preloaded gunicorn app) must not report values observed by
+        # its parent, nor write to its file. Runs in the child before anything is recorded there;
+        # the lock is replaced as it may have been held by another thread at the fork.
+        self.lock = threading.Lock()
+        self._pid = os.getpid()
+        self.values = {}
+        self._file = None
+        self._last_flush = 0.0
+        self._flush_timer = None  # timer threads don't survive the fork
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {key: list(value) if isinstance(value, list) else value for key, value in samples.items()}
+                for name, samples in self.values.items()
+            }
+
+    def flush(self, force=False):
+        """Write this process's values to the multi-process directory (throttled unless forced)"""
+        directory = multiproc_dir()
+        if not directory:
+            return
+        now = time.monotonic()
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+        if not force and now - self._last_flush < interval:
+            # Throttled: write these changes when the interval is over, even if no request follows
+            self._schedule_flush(interval - (now - self._last_flush))
+            return
+        self._last_flush = now
+        snapshot = self.snapshot()
+        if self._file is None:
+            os.makedirs(directory, exist_ok=True)
+            # pid plus start time, so a recycled pid never overwrites a dead worker's file
+            self._file = os.path.join(directory, f'{FILE_PREFIX}{self._pid}_{time.time_ns()}.json')
+        data = {
+            name: [[list(key), value] for key, value in samples.items()]
+            for name, samples in snapshot.items()
+        }
+        temp_path = f'{self._file}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self._file)
+
+    def _schedule_flush(self, delay):
+        with self.lock:
+            if self._flush_timer is not None:
+                return
+            self._flush_timer = threading.Timer(delay, self._timed_flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _timed_flush(self):
+        with self.lock:
+            self._flush_timer = None
+        self.flush(force=True)
+
+    def _flush_at_exit(self):
+        # Only processes that recorded something, so a server's master leaves no empty file behind
+        if self.values:
+            self.flush(force=True)
+
+    def collect(self):
+        """Values summed over every process (or just this one without a multi-process directory)"""
+        directory = multiproc_dir()
+        if not directory:
+            return self.snapshot()
+
+        self.flush(force=True)
+        totals = {}
+        for path in glob.glob(os.path.join(directory, f'{FILE_PREFIX}*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # removed or replaced mid-read
+            for name, samples in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                merged = totals.setdefault(name, {})
+                for key, value in samples:
+                    key = tuple(key)
+                    merged[key] = metric.merge(merged.get(key), value)
+        return totals
+
+    def render(self):
+        """The Prometheus text exposition (format 0.0.4)"""
+        collected = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.render(collected.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+def multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def clear_multiproc_dir(directory=None):
+    """Remove every worker's metrics file; call once when the server starts"""
+    directory = directory or multiproc_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, f'{FILE_PREFIX}*')):
+        os.remove(path)
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = Histogram(
+    'finance_http_request_duration_seconds',
+    'Request latency by URL name',
+    ['view', 'method'],
+)
+REQUESTS = Counter(
+    'finance_http_requests_total',
+    'Requests served by URL name and status code',
+    ['view', 'method', 'status'],
+)
+DB_DURATION = Histogram(
+    'finance_db_query_duration_seconds',
+    'Total database time per request by URL name',
+    ['view'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+DB_QUERIES = Counter(
+    'finance_db_queries_total',
+    'Database queries issued by URL name',
+    ['view'],
+)
+EXPORT_DURATION = Histogram(
+    'finance_export_duration_seconds',
+    'Excel report generation time by exporter',
+    ['exporter'],
+)
+OPEN_BUDGET_MONTH_DURATION = Histogram(
+    'finance_open_budget_month_duration_seconds',
+    'Time to open (create or roll over) a budget month',
+)
@@ -0,0 +1,197 @@
+"""
+Middleware for Finance Flow
+"""
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.middleware.gzip import GZipMiddleware
+
+from .instrumentation import QueryRecorder, get_query_budget, logger, query_stats
+from .metrics import REGISTRY, REQUEST_DURATION, REQUESTS, DB_DURATION, DB_QUERIES
+from . import profiling
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records query count, database time and the slowest statements of every request,
+    aggregated per view name (see the Query Stats admin page).
+    Adds a `Server-Timing` header and logs a warning on the `finance.queries` logger
+    when a view issues more queries than its budget in settings.QUERY_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_INSTRUMENTATION_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request.query_recorder = recorder
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_time = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            # 404s and requests rejected before URL resolution
+            return response
+        view_name = match.view_name or match._func_path
+
+        budget = get_query_budget(view_name)
+        over_budget = budget is not None and recorder.count > budget
+        if over_budget:
+            logger.warning(
+                '%s issued %d queries (budget %d) for %s %s',
+                view_name, recorder.count, budget, request.method, request.path,
+            )
+        query_stats.record(view_name, recorder, total_time, over_budget)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'total;dur={total_time * 1000:.1f}',
+        ])
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Feeds the /metrics registry: request latency and status per URL name, plus database
+    time and query count when QueryInstrumentationMiddleware runs inside this one.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        # Unresolved URLs share one label so scanners can't blow up the label set
+        view_name = (match.view_name or match._func_path) if match else '<unresolved>'
+        REQUEST_DURATION.observe(elapsed, view=view_name, method=request.method)
+        REQUESTS.inc(view=view_name, method=request.method, status=response.status_code)
+
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None and match is not None:
+            DB_DURATION.observe(recorder.duration, view=view_name)
+            DB_QUERIES.inc(recorder.count, view=view_name)
+
+        REGISTRY.flush()
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that carry a valid signed profiling token (under cProfile), and with
+    PROFILING_SLOW_REQUEST_MS set, samples every request's stack and keeps the samples of
+    those that turn out slow. Dumps and SQL logs are saved by `profiling.save_profile` and
+    the profile name is returned in the X-Profile-Id header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = profiling.slow_request_threshold()
+
+    def __call__(self, request):
+        token = profiling.get_request_token(request)
+        profiling_user = profiling.check_token(token) if token else None
+        if profiling_user is None and self.threshold is None:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(log_limit=profiling.SQL_LOG_LIMIT)
+        profiler = profiling.start_cprofile() if profiling_user else None
+        sampler = None
+        if profiler is None:
+            # Also the fallback when another profiler is active in this interpreter
+            sampler = profiling.get_sampler()
+            thread_id = threading.get_ident()
+            sampler.start(thread_id)
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            samples = sampler.stop(thread_id) if sampler is not None else None
+        duration = time.perf_counter() - started
+
+        if profiling_user is not None:
+            trigger = 'token'
+        elif duration >= self.threshold:
+            trigger = 'slow'
+        else:
+            return response
+
+        name = profiling.save_profile(request, response, duration, trigger, recorder, profiler, samples)
+        response['X-Profile-Id'] = name
+        return response
+
+
+class ExportConcurrencyMiddleware:
+    """
+    Caps the Excel exports (EXPORT_PATH_PREFIXES) running at once in this process at
+    EXPORT_MAX_CONCURRENCY, so under threaded workers slow exports can't take every thread
+    from interactive requests. An export waits up to EXPORT_QUEUE_TIMEOUT seconds for a
+    slot, then gets a 503 with Retry-After. 0 (the default outside gunicorn.conf.py) or a
+    dedicated export pool turns the limit off.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixes = tuple(getattr(settings, 'EXPORT_PATH_PREFIXES', ('/export/', '/api/export/')))
+        self.limit = getattr(settings, 'EXPORT_MAX_CONCURRENCY', 0)
+        self.wait = getattr(settings, 'EXPORT_QUEUE_TIMEOUT', 10)
+        self.slots = threading.BoundedSemaphore(self.limit) if self.limit > 0 else None
+
+    def __call__(self, request):
+        if self.slots is None or not request.path.startswith(self.prefixes):
+            return self.get_response(request)
+        if not self.slots.acquire(timeout=self.wait):
+            return self.busy(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
+
+    def busy(self, request):
+        message = 'Too many exports are running. Please try again in a moment.'
+        if request.path.startswith('/api/'):
+            response = JsonResponse({'detail': message}, status=503)
+        else:
+            response = HttpResponse(message, content_type='text/plain', status=503)
+        response['Retry-After'] = str(max(1, int(self.wait)))
+        return response
+
+
+class JSONCompressionMiddleware(GZipMiddleware):
+    """
+    Gzips JSON responses of at least API_GZIP_MIN_BYTES for clients that accept it. Smaller
+    bodies gain little and HTML pages are left alone; Django's GZipMiddleware takes care of
+    Accept-Encoding, Vary, weak ETags and the BREACH length padding.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_bytes = getattr(settings, 'API_GZIP_MIN_BYTES', 1024)
+
+    def process_response(self, request, response):
+        if not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return response
+        return super().process_response(request, response)
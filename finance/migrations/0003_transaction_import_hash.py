@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_transaction_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Fingerprint of the bank statement line this was imported from (blank for manual entries)', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('import_hash', ''), _negated=True), fields=('household', 'import_hash'), name='unique_household_import_hash'),
+        ),
+    ]
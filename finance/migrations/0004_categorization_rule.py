@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_transaction_import_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorizationRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_type', models.CharField(choices=[('CONTAINS', 'Description contains text'), ('REGEX', 'Description matches regular expression'), ('AMOUNT', 'Amount only')], default='CONTAINS', max_length=8)),
+                ('pattern', models.CharField(blank=True, help_text='Text or regular expression matched case-insensitively against the description', max_length=255)),
+                ('min_amount', models.DecimalField(blank=True, decimal_places=2, help_text='Only match amounts of at least this value', max_digits=10, null=True)),
+                ('max_amount', models.DecimalField(blank=True, decimal_places=2, help_text='Only match amounts of at most this value', max_digits=10, null=True)),
+                ('transaction_type', models.CharField(blank=True, choices=[('', 'Any'), ('INCOME', 'Income'), ('EXPENSE', 'Expense')], default='', help_text='Only match income or expense transactions', max_length=7)),
+                ('priority', models.IntegerField(default=100, help_text='Lower numbers win when several rules match')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(help_text='Category assigned to matching transactions', on_delete=django.db.models.deletion.CASCADE, related_name='categorization_rules', to='finance.category')),
+                ('household', models.ForeignKey(help_text='Household this rule belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='categorization_rules', to='finance.household')),
+            ],
+            options={
+                'verbose_name': 'Categorization Rule',
+                'verbose_name_plural': 'Categorization Rules',
+                'ordering': ['priority', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:30
+
+from django.db import migrations
+
+
+DESCRIPTION_SEARCH_INDEX = 'txn_description_fts_idx'
+
+
+def create_search_index(apps, schema_editor):
+    """GIN index for full-text search on descriptions (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('finance', 'Transaction')._meta.db_table)
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {DESCRIPTION_SEARCH_INDEX} ON {table} "
+        "USING GIN (to_tsvector('english', description))"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {DESCRIPTION_SEARCH_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_categorization_rule'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_transaction_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='household',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text="Goes up on every change to the household's categories, budgets, transactions and notes"),
+        ),
+    ]
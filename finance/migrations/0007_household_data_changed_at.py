@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_household_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='household',
+            name='data_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When data_version last went up', null=True),
+        ),
+    ]
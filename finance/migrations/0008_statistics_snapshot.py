@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_household_data_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('users', models.PositiveBigIntegerField()),
+                ('households', models.PositiveBigIntegerField()),
+                ('categories', models.PositiveBigIntegerField()),
+                ('budgets', models.PositiveBigIntegerField()),
+                ('transactions', models.PositiveBigIntegerField()),
+                ('estimated', models.BooleanField(default=False, help_text='Whether the counts are catalog estimates rather than exact')),
+            ],
+            options={
+                'verbose_name': 'Statistics Snapshot',
+                'verbose_name_plural': 'Statistics Snapshots',
+                'ordering': ['-recorded_at'],
+            },
+        ),
+    ]
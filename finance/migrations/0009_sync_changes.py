@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_statistics_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('categories', 'Category'), ('budgets', 'Budget'), ('transactions', 'Transaction'), ('notes', 'Category Note')], max_length=12)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['category', 'updated_at', 'id'], name='budget_category_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['household', 'updated_at', 'id'], name='category_household_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categorynote',
+            index=models.Index(fields=['category', 'updated_at', 'id'], name='note_category_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['household', 'updated_at', 'id'], name='txn_household_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='household',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='finance.household'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['household', 'deleted_at', 'id'], name='tombstone_household_sync_idx'),
+        ),
+    ]
@@ -1,6 +1,13 @@
+import re
+from re import _parser as regex_parser
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.core.validators import EmailValidator
+from django.utils import timezone
+
+from .versioning import HouseholdDataQuerySet
 
 class User(AbstractUser):
     """Custom User model with email as username"""
@@ -35,6 +42,8 @@ class Household(models.Model):
     """Represents a household/budget group that can have multiple members"""
     name = models.CharField(max_length=100, help_text="Household name (e.g., 'Smith Family')")
     members = models.ManyToManyField(User, related_name='households', help_text="Users who have access to this household's budget")
+    data_version = models.PositiveBigIntegerField(default=0, editable=False, help_text="Goes up on every change to the household's categories, budgets, transactions and notes")
+    data_changed_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="When data_version last went up")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -45,6 +54,16 @@ class Household(models.Model):
     
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        # data_version/data_changed_at are only ever changed with F() updates (see versioning.py);
+        # writing back stale in-memory values could take them backwards and revalidate outdated caches
+        if self.pk is not None and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('data_version', 'data_changed_at')
+            ]
+        super().save(*args, **kwargs)
     
     def get_primary_member(self):
         """Get the first member (typically the creator)"""
@@ -68,9 +87,16 @@ class Category(models.Model):
     payment_type = models.CharField(max_length=10, choices=PAYMENT_TYPE_CHOICES, default='MANUAL', help_text="How this category is paid/received.")
     is_essential = models.BooleanField(default=True, help_text="For Barebones template: True = essential (keep amount), False = non-essential (zero out). Default is Essential for safety.")
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HouseholdDataQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = 'Categories'
+        indexes = [
+            # Delta sync (see sync.py) reads changes in (updated_at, id) order
+            models.Index(fields=['household', 'updated_at', 'id'], name='category_household_sync_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_type_display()})"
@@ -86,9 +112,31 @@ class Transaction(models.Model):
     description = models.TextField(blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     type = models.CharField(max_length=7, choices=TYPE_CHOICES, default='EXPENSE')
+    import_hash = models.CharField(max_length=64, blank=True, default='', editable=False, help_text="Fingerprint of the bank statement line this was imported from (blank for manual entries)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = HouseholdDataQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Statement imports dedupe against this; manual entries leave it blank
+            models.UniqueConstraint(
+                fields=['household', 'import_hash'],
+                condition=~models.Q(import_hash=''),
+                name='unique_household_import_hash',
+            ),
+        ]
+        indexes = [
+            # Support the server-side date/type/category/amount filters; the first
+            # also serves keyset pagination in (date, id) order
+            models.Index(fields=['household', 'date', 'id'], name='txn_household_date_id_idx'),
+            models.Index(fields=['household', 'type', 'date'], name='txn_household_type_date_idx'),
+            models.Index(fields=['household', 'category', 'date'], name='txn_household_cat_date_idx'),
+            models.Index(fields=['household', 'amount'], name='txn_household_amount_idx'),
+            models.Index(fields=['household', 'updated_at', 'id'], name='txn_household_sync_idx'),
+        ]
+
     def __str__(self):
         return f"{self.date} - {self.description} - {self.amount}"
 
@@ -98,6 +146,16 @@ class Budget(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     is_paid = models.BooleanField(default=False, help_text="Whether this budget item has been paid/received.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HouseholdDataQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Delta sync reads a household's changes in (updated_at, id) order; budgets reach their
+            # household through the category, so that leads
+            models.Index(fields=['category', 'updated_at', 'id'], name='budget_category_sync_idx'),
+        ]
 
     def __str__(self):
         return f"{self.category.name}: {self.amount}"
@@ -109,15 +167,105 @@ class CategoryNote(models.Model):
     note = models.TextField(help_text="Note content")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HouseholdDataQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Category Note'
         verbose_name_plural = 'Category Notes'
+        indexes = [
+            # Like Budget's, scoped to the household through the category
+            models.Index(fields=['category', 'updated_at', 'id'], name='note_category_sync_idx'),
+        ]
     
     def __str__(self):
         return f"Note for {self.category.name} by {self.author.email if self.author else 'Unknown'}"
 
+def _backtracks_badly(parsed, repeated=False):
+    """
+    Whether a parsed regex repeats something that can itself match in several ways (a nested
+    quantifier or alternatives), or uses a backreference. Such patterns can take exponential
+    time on a non-matching description.
+    """
+    for op, arg in parsed:
+        if op in (regex_parser.MAX_REPEAT, regex_parser.MIN_REPEAT):
+            low, high, body = arg
+            if repeated and high > 1:
+                return True
+            if _backtracks_badly(body, repeated or high > 1):
+                return True
+        elif op is regex_parser.BRANCH:
+            if repeated or any(_backtracks_badly(branch, repeated) for branch in arg[1]):
+                return True
+        elif op is regex_parser.SUBPATTERN:
+            if _backtracks_badly(arg[3], repeated):
+                return True
+        elif op in (regex_parser.ASSERT, regex_parser.ASSERT_NOT):
+            if _backtracks_badly(arg[1], repeated):
+                return True
+        elif op in (regex_parser.GROUPREF, regex_parser.GROUPREF_EXISTS):
+            return True
+    return False
+
+class CategorizationRule(models.Model):
+    """Per-household rule that assigns a category to matching transactions (e.g. on import)"""
+    # Patterns run against every imported description, so they are kept short and linear
+    REGEX_MAX_LENGTH = 100
+    MATCH_TYPE_CHOICES = [
+        ('CONTAINS', 'Description contains text'),
+        ('REGEX', 'Description matches regular expression'),
+        ('AMOUNT', 'Amount only'),
+    ]
+    TRANSACTION_TYPE_CHOICES = [
+        ('', 'Any'),
+        ('INCOME', 'Income'),
+        ('EXPENSE', 'Expense'),
+    ]
+    household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name='categorization_rules', help_text="Household this rule belongs to")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='categorization_rules', help_text="Category assigned to matching transactions")
+    match_type = models.CharField(max_length=8, choices=MATCH_TYPE_CHOICES, default='CONTAINS')
+    pattern = models.CharField(max_length=255, blank=True, help_text="Text or regular expression matched case-insensitively against the description")
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Only match amounts of at least this value")
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Only match amounts of at most this value")
+    transaction_type = models.CharField(max_length=7, choices=TRANSACTION_TYPE_CHOICES, blank=True, default='', help_text="Only match income or expense transactions")
+    priority = models.IntegerField(default=100, help_text="Lower numbers win when several rules match")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['priority', 'id']
+        verbose_name = 'Categorization Rule'
+        verbose_name_plural = 'Categorization Rules'
+
+    def __str__(self):
+        return f"{self.get_match_type_display()}: {self.pattern or '*'} → {self.category.name}"
+
+    def regex_error(self):
+        """Why this rule's regular expression can't be used, or None when it can"""
+        if len(self.pattern) > self.REGEX_MAX_LENGTH:
+            return f'Regular expressions may be at most {self.REGEX_MAX_LENGTH} characters.'
+        try:
+            re.compile(self.pattern)
+            parsed = regex_parser.parse(self.pattern)
+        except re.error as e:
+            return f'Invalid regular expression: {e}'
+        if _backtracks_badly(parsed):
+            return ('Repeated groups may not contain quantifiers or alternatives, and backreferences '
+                    'are not supported: such patterns can take very long to match.')
+        return None
+
+    def clean(self):
+        if self.match_type != 'AMOUNT' and not self.pattern:
+            raise ValidationError({'pattern': 'A pattern is required for text and regex rules.'})
+        if self.match_type == 'REGEX':
+            error = self.regex_error()
+            if error:
+                raise ValidationError({'pattern': error})
+        if self.min_amount is not None and self.max_amount is not None and self.min_amount > self.max_amount:
+            raise ValidationError({'max_amount': 'Maximum amount must not be below the minimum amount.'})
+
 class BudgetTemplate(models.Model):
     """Template for creating default category structures for new households"""
     name = models.CharField(max_length=100, unique=True, help_text="Template name (e.g., 'Basic Starter', 'Minimal Budget')")
@@ -140,7 +288,9 @@ class BudgetTemplate(models.Model):
     def save(self, *args, **kwargs):
         # Ensure only one template is default
         if self.is_default:
-            BudgetTemplate.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
+            BudgetTemplate.objects.filter(is_default=True).exclude(pk=self.pk).update(
+                is_default=False, updated_at=timezone.now()
+            )
         super().save(*args, **kwargs)
     
     def get_category_count(self):
@@ -178,3 +328,43 @@ class TemplateCategory(models.Model):
     def __str__(self):
         parent_str = f" ({self.parent.name})" if self.parent else ""
         return f"{self.name}{parent_str} - {self.template.name}"
+
+class StatisticsSnapshot(models.Model):
+    """Row counts recorded periodically for the admin dashboard's growth figures (see statistics.py)"""
+    recorded_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    users = models.PositiveBigIntegerField()
+    households = models.PositiveBigIntegerField()
+    categories = models.PositiveBigIntegerField()
+    budgets = models.PositiveBigIntegerField()
+    transactions = models.PositiveBigIntegerField()
+    estimated = models.BooleanField(default=False, help_text="Whether the counts are catalog estimates rather than exact")
+
+    class Meta:
+        ordering = ['-recorded_at']
+        verbose_name = 'Statistics Snapshot'
+        verbose_name_plural = 'Statistics Snapshots'
+
+    def __str__(self):
+        return f"Statistics at {self.recorded_at:%Y-%m-%d %H:%M}"
+
+
+class Tombstone(models.Model):
+    """A deleted category, budget, transaction or note, kept so sync clients learn of the deletion"""
+    MODEL_CHOICES = [
+        ('categories', 'Category'),
+        ('budgets', 'Budget'),
+        ('transactions', 'Transaction'),
+        ('notes', 'Category Note'),
+    ]
+    household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name='+')
+    model = models.CharField(max_length=12, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['household', 'deleted_at', 'id'], name='tombstone_household_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_model_display()} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,257 @@
+"""
+Request Profiling for Finance Flow
+cProfile and sampling-profiler dumps of individual requests, saved with their SQL log
+
+A request is profiled when it carries a signed profiling token (see `make_token`) in the
+X-Profile header or the _profile query parameter, which runs it under cProfile; or, with
+PROFILING_SLOW_REQUEST_MS set, when it turns out slower than that threshold, in which case
+the stacks sampled while it ran are kept. Dumps are listed under Admin > Profiles.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+TOKEN_SALT = 'finance.profiling'
+TOKEN_MAX_AGE = 60 * 60
+SQL_LOG_LIMIT = 2000
+NAME_RE = re.compile(r'^[\w.-]+$')
+
+
+def get_profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def slow_request_threshold():
+    """Seconds after which a request's samples are saved, or None when automatic profiling is off"""
+    threshold_ms = getattr(settings, 'PROFILING_SLOW_REQUEST_MS', None)
+    return threshold_ms / 1000 if threshold_ms else None
+
+
+# Signed tokens
+
+def make_token(user):
+    """A token that lets requests be profiled for the next hour; only issued to superusers"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def check_token(token):
+    """The superuser a valid, unexpired token was issued to, or None"""
+    try:
+        user_id = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=user_id, is_superuser=True, is_active=True).first()
+
+
+def get_request_token(request):
+    return request.headers.get('X-Profile') or request.GET.get('_profile')
+
+
+# Sampling profiler
+
+class StackSampler:
+    """
+    One daemon thread that periodically records the Python stack of every registered thread.
+    Sampling costs the request threads nothing except the GIL time of the sampler itself.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._samples = {}  # {thread id: Counter of stacks}
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='finance-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        """Stop sampling a thread and return its Counter of {collapsed stack: samples}"""
+        with self._lock:
+            return self._samples.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._samples:
+                    # Idle: exit, start() launches a new thread when needed
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for thread_id, counter in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[collapse_stack(frame)] += 1
+
+
+def collapse_stack(frame):
+    """Root-first 'file:function:line;...' string, the format flame graph tools read"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StackSampler(getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005))
+        return _sampler
+
+
+def start_cprofile():
+    """A running cProfile.Profile, or None if another profiler already owns the interpreter"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+# Storage
+
+def save_profile(request, response, duration, trigger, recorder, profiler=None, samples=None):
+    """
+    Write the dump (.prof for cProfile, .folded collapsed stacks for samples) and a .json
+    file with the request details and SQL log. Returns the profile name.
+    """
+    directory = get_profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    match = getattr(request, 'resolver_match', None)
+    view_name = (match.view_name or match._func_path) if match else 'unresolved'
+    safe_view_name = re.sub(r'[^\w-]', '_', view_name)
+    name = f'{datetime.now():%Y%m%d-%H%M%S}-{safe_view_name}-{uuid.uuid4().hex[:6]}'
+
+    if profiler is not None:
+        profiler.dump_stats(directory / f'{name}.prof')
+        dump, mode = f'{name}.prof', 'cprofile'
+    else:
+        (directory / f'{name}.folded').write_text(
+            ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+        )
+        dump, mode = f'{name}.folded', 'sampling'
+
+    user = getattr(request, 'user', None)
+    metadata = {
+        'name': name,
+        'dump': dump,
+        'mode': mode,
+        'trigger': trigger,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': _path_without_token(request),
+        'view_name': view_name,
+        'status': response.status_code,
+        'user': user.email if user is not None and user.is_authenticated else None,
+        'duration_ms': round(duration * 1000, 1),
+        'query_count': recorder.count,
+        'db_time_ms': round(recorder.duration * 1000, 1),
+        'queries': [
+            {'duration_ms': round(elapsed * 1000, 3), 'sql': sql}
+            for elapsed, sql in recorder.log
+        ],
+    }
+    (directory / f'{name}.json').write_text(json.dumps(metadata, indent=1))
+    prune_profiles()
+    return name
+
+
+def _path_without_token(request):
+    query = request.GET.copy()
+    query.pop('_profile', None)
+    return f'{request.path}?{query.urlencode()}' if query else request.path
+
+
+def prune_profiles():
+    """Keep only the newest PROFILING_MAX_PROFILES profiles"""
+    keep = getattr(settings, 'PROFILING_MAX_PROFILES', 200)
+    for metadata in list_profiles()[keep:]:
+        delete_profile(metadata['name'])
+
+
+def list_profiles():
+    """Metadata (without the SQL log) of every saved profile, newest first"""
+    directory = get_profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in directory.glob('*.json'):
+        try:
+            metadata = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        metadata.pop('queries', None)
+        profiles.append(metadata)
+    profiles.sort(key=lambda metadata: metadata['name'], reverse=True)
+    return profiles
+
+
+def load_profile(name):
+    """Full metadata of a profile, or None if there is no such profile"""
+    if not NAME_RE.match(name):
+        return None
+    try:
+        return json.loads((get_profile_dir() / f'{name}.json').read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def profile_summary(metadata, limit=40):
+    """
+    Human-readable hot spots: pstats by cumulative time for cProfile dumps, or for sampled
+    stacks the share of samples in which each function was on the stack (its inclusive time)
+    """
+    path = get_profile_dir() / metadata['dump']
+    if metadata['mode'] == 'cprofile':
+        output = io.StringIO()
+        stats = pstats.Stats(str(path), stream=output)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    inclusive = Counter()
+    total = 0
+    for line in path.read_text().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        count = int(count)
+        total += count
+        functions = {frame.rsplit(':', 1)[0] for frame in stack.split(';')}
+        for function in functions:
+            inclusive[function] += count
+    lines = [f'{total} samples', f'{"samples":>8} {"share":>6}  function']
+    for function, count in inclusive.most_common(limit):
+        lines.append(f'{count:>8} {count / total:>6.1%}  {function}')
+    return '\n'.join(lines)
+
+
+def delete_profile(name):
+    if not NAME_RE.match(name):
+        return
+    for path in get_profile_dir().glob(f'{name}.*'):
+        path.unlink(missing_ok=True)
@@ -0,0 +1,225 @@
+"""
+Budget-vs-Actual Reconciliation for Finance Flow
+Compares Transaction totals against Budget amounts per category per month
+
+Month totals are cached under a per-household generation number. Transaction saves and
+deletes (through the signals in `finance.signals`) and bulk writes that bypass signals
+(statement imports, recategorization) call `invalidate_household`, which bumps the
+generation once the write commits, so a rolled-back write leaves the cache alone. Every
+worker has to see the bump: the cache named by RECONCILIATION_CACHE is only used when it is
+shared between processes, and with the per-process local memory backend totals are always
+computed fresh (one grouped query per month).
+"""
+import calendar
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Sum, Q
+
+from .models import Budget, Category, Transaction
+
+CACHE_TIMEOUT = 60 * 60 * 24
+ZERO = Decimal('0.00')
+
+
+def month_bounds(year, month):
+    """Return the first and last date of a month"""
+    _, last_day = calendar.monthrange(year, month)
+    return date(year, month, 1), date(year, month, last_day)
+
+
+def get_cache():
+    """The cache holding month totals, or None when it would be local to this process"""
+    backend = caches[getattr(settings, 'RECONCILIATION_CACHE', 'default')]
+    return None if isinstance(backend, LocMemCache) else backend
+
+
+def _generation_key(household_id):
+    return f'reconciliation:{household_id}:generation'
+
+
+def _month_key(cache, household_id, year, month):
+    generation = cache.get_or_set(_generation_key(household_id), 0, None)
+    return f'reconciliation:{household_id}:{generation}:{year}-{month:02d}'
+
+
+def invalidate_household(household_id):
+    """
+    Drop every cached month of a household once the current transaction commits (right away
+    outside one). Call after writes that change its transactions' amounts, dates, types or categories.
+    """
+    if get_cache() is None:
+        return
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'finance_pending_reconciliation', None)
+    if pending is None:
+        pending = connection.finance_pending_reconciliation = set()
+    pending.add(household_id)
+    # As with data versions, ids left behind by a rollback at worst cost one extra bump later
+    transaction.on_commit(lambda: _flush(connection))
+
+
+def _flush(connection):
+    household_ids = getattr(connection, 'finance_pending_reconciliation', set())
+    if not household_ids:
+        return
+    connection.finance_pending_reconciliation = set()
+    cache = get_cache()
+    for household_id in household_ids:
+        try:
+            cache.incr(_generation_key(household_id))
+        except ValueError:
+            cache.set(_generation_key(household_id), 1, None)
+
+
+def _compute_month_totals(household_id, year, month):
+    """
+    One grouped query: expense and income sums per category for the month.
+    Returns {category_id: [expenses, income]}.
+    """
+    start_date, end_date = month_bounds(year, month)
+    rows = (
+        Transaction.objects
+        .filter(household_id=household_id, date__gte=start_date, date__lte=end_date, category__isnull=False)
+        .values('category_id')
+        .annotate(
+            expenses=Sum('amount', filter=Q(type='EXPENSE')),
+            income=Sum('amount', filter=Q(type='INCOME')),
+        )
+        .order_by()
+    )
+    return {
+        row['category_id']: [row['expenses'] or ZERO, row['income'] or ZERO]
+        for row in rows
+    }
+
+
+def get_month_totals(household_id, year, month):
+    """{category_id: [expenses, income]} for a household month, cached when a shared cache is configured"""
+    cache = get_cache()
+    if cache is None:
+        return _compute_month_totals(household_id, year, month)
+    key = _month_key(cache, household_id, year, month)
+    totals = cache.get(key)
+    if totals is None:
+        totals = _compute_month_totals(household_id, year, month)
+        cache.set(key, totals, CACHE_TIMEOUT)
+    return totals
+
+
+def category_month_totals(category_id, year, month):
+    """(expenses, income) of one category's month, read from the database (including uncommitted writes)"""
+    start_date, end_date = month_bounds(year, month)
+    totals = Transaction.objects.filter(
+        category_id=category_id, date__gte=start_date, date__lte=end_date
+    ).aggregate(
+        expenses=Sum('amount', filter=Q(type='EXPENSE')),
+        income=Sum('amount', filter=Q(type='INCOME')),
+    )
+    return totals['expenses'] or ZERO, totals['income'] or ZERO
+
+
+def actual_amount(category_type, expenses, income):
+    """Net actual for a category: money in for income categories, money out otherwise"""
+    if category_type == 'INCOME':
+        return income - expenses
+    return expenses - income
+
+
+def reconcile_month(household, year, month, mark_paid=False):
+    """
+    Budget vs actual for every category of `household` in the given month.
+    Parent categories with children report the sum of their children.
+    With `mark_paid`, unpaid budgets whose actual has reached the budgeted amount are marked paid.
+    Returns a dict with per-category rows and type totals.
+    """
+    start_date, _ = month_bounds(year, month)
+    totals = get_month_totals(household.id, year, month)
+
+    categories = list(
+        Category.objects.filter(household=household)
+        .values('id', 'name', 'type', 'parent_id', 'payment_type')
+        .order_by('type', 'name')
+    )
+    budgets = {
+        row['category_id']: row
+        for row in Budget.objects.filter(category__household=household, start_date=start_date)
+        .values('id', 'category_id', 'amount', 'is_paid')
+    }
+
+    rows = {}
+    for category in categories:
+        expenses, income = totals.get(category['id'], [ZERO, ZERO])
+        budget = budgets.get(category['id'])
+        rows[category['id']] = {
+            'category_id': category['id'],
+            'category_name': category['name'],
+            'type': category['type'],
+            'parent_id': category['parent_id'],
+            'budget_id': budget['id'] if budget else None,
+            'budgeted': budget['amount'] if budget else ZERO,
+            'actual': actual_amount(category['type'], expenses, income),
+            'is_paid': budget['is_paid'] if budget else False,
+            'has_children': False,
+            'payment_type': category['payment_type'],
+        }
+
+    # Roll children up into their parents. Parents with children are budgeted through
+    # their children only, but keep any transactions booked directly against them.
+    for row in list(rows.values()):
+        parent = rows.get(row['parent_id'])
+        if parent is None:
+            continue
+        if not parent['has_children']:
+            parent['has_children'] = True
+            parent['budgeted'] = ZERO
+        parent['budgeted'] += row['budgeted']
+        parent['actual'] += row['actual']
+
+    to_mark = []
+    for row in rows.values():
+        row['remaining'] = row['budgeted'] - row['actual']
+        row['reached'] = row['budgeted'] > 0 and row['actual'] >= row['budgeted']
+        if mark_paid and row['reached'] and row['budget_id'] and not row['is_paid'] and not row['has_children']:
+            to_mark.append(row['budget_id'])
+            row['is_paid'] = True
+
+    if to_mark:
+        Budget.objects.filter(id__in=to_mark).update(is_paid=True)
+
+    summary = {}
+    for category_type, _ in Category.TYPE_CHOICES:
+        top_level_rows = [r for r in rows.values() if r['type'] == category_type and r['parent_id'] is None]
+        summary[category_type] = {
+            'budgeted': sum((r['budgeted'] for r in top_level_rows), ZERO),
+            'actual': sum((r['actual'] for r in top_level_rows), ZERO),
+        }
+
+    return {
+        'year': year,
+        'month': month,
+        'rows': list(rows.values()),
+        'summary': summary,
+        'marked_paid': len(to_mark),
+    }
+
+
+def auto_mark_paid_enabled():
+    """Whether transaction writes should mark budgets paid as soon as actuals reach them"""
+    return getattr(settings, 'RECONCILIATION_AUTO_MARK_PAID', False)
+
+
+def mark_paid_if_reached(category_id, transaction_date, actual):
+    """Mark the category's budget for that month paid once `actual` covers it"""
+    start_date, _ = month_bounds(transaction_date.year, transaction_date.month)
+    return Budget.objects.filter(
+        category_id=category_id,
+        start_date=start_date,
+        is_paid=False,
+        amount__gt=0,
+        amount__lte=actual,
+    ).update(is_paid=True)
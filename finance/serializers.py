@@ -1,16 +1,41 @@
 """
 Serializers for Finance Flow API
 """
+from decimal import Decimal
+from functools import lru_cache, partial
+
 from rest_framework import serializers
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
 from .models import (
     Household, Category, Budget, Transaction, 
-    CategoryNote, BudgetTemplate, TemplateCategory
+    CategoryNote, BudgetTemplate, TemplateCategory, CategorizationRule
 )
 
 User = get_user_model()
 
 
+class AnnotatedCountField(serializers.ReadOnlyField):
+    """
+    A count read from the queryset annotation of the same name, so list responses do not
+    run a COUNT per row; instances loaded without it (e.g. just created) count `relation`
+    """
+
+    def __init__(self, relation, **kwargs):
+        self.relation = relation
+        super().__init__(source='*', **kwargs)
+
+    def to_representation(self, instance):
+        count = getattr(instance, self.field_name, None)
+        if count is None:
+            count = getattr(instance, self.relation).count()
+        return count
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model"""
     class Meta:
@@ -32,25 +57,25 @@ class HouseholdSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Household
-        fields = ['id', 'name', 'members', 'member_ids', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'members', 'member_ids', 'data_version', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'data_version', 'created_at', 'updated_at']
 
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model"""
     household_name = serializers.CharField(source='household.name', read_only=True)
     parent_name = serializers.CharField(source='parent.name', read_only=True, allow_null=True)
-    children_count = serializers.IntegerField(source='children.count', read_only=True)
-    notes_count = serializers.IntegerField(source='notes.count', read_only=True)
+    children_count = AnnotatedCountField('children')
+    notes_count = AnnotatedCountField('notes')
     
     class Meta:
         model = Category
         fields = [
             'id', 'household', 'household_name', 'name', 'type', 
             'is_persistent', 'payment_type', 'is_essential', 
-            'parent', 'parent_name', 'children_count', 'notes_count'
+            'parent', 'parent_name', 'children_count', 'notes_count', 'updated_at'
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'updated_at']
 
 
 class CategoryListSerializer(serializers.ModelSerializer):
@@ -72,9 +97,9 @@ class BudgetSerializer(serializers.ModelSerializer):
         model = Budget
         fields = [
             'id', 'category', 'category_name', 'category_type',
-            'amount', 'start_date', 'end_date', 'is_paid'
+            'amount', 'start_date', 'end_date', 'is_paid', 'updated_at'
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'updated_at']
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -92,6 +117,36 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class CategorizationRuleSerializer(serializers.ModelSerializer):
+    """Serializer for CategorizationRule model"""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = CategorizationRule
+        fields = [
+            'id', 'category', 'category_name', 'match_type', 'pattern',
+            'min_amount', 'max_amount', 'transaction_type', 'priority',
+            'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        """Run the model's pattern and amount-range checks"""
+        from django.core.exceptions import ValidationError as DjangoValidationError
+        instance = CategorizationRule(**{**self._current_values(), **attrs})
+        try:
+            instance.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return attrs
+    
+    def _current_values(self):
+        if not self.instance:
+            return {}
+        return {field: getattr(self.instance, field) for field in
+                ('category', 'match_type', 'pattern', 'min_amount', 'max_amount', 'transaction_type')}
+
+
 class CategoryNoteSerializer(serializers.ModelSerializer):
     """Serializer for CategoryNote model"""
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -124,7 +179,7 @@ class TemplateCategorySerializer(serializers.ModelSerializer):
 class BudgetTemplateSerializer(serializers.ModelSerializer):
     """Serializer for BudgetTemplate model"""
     created_by_username = serializers.CharField(source='created_by.email', read_only=True, allow_null=True)
-    category_count = serializers.IntegerField(source='categories.count', read_only=True)
+    category_count = AnnotatedCountField('categories')
     categories = TemplateCategorySerializer(many=True, read_only=True)
     
     class Meta:
@@ -136,3 +191,97 @@ class BudgetTemplateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+
+
+def _decimal_converter(field):
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+    return lambda value: f'{value.quantize(exponent, rounding=field.rounding):f}'
+
+
+def _datetime_to_string(value, tz):
+    if tz is not None and value.tzinfo is not None:
+        value = value.astimezone(tz)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _date_to_string(value):
+    return value.isoformat()
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path producing exactly the JSON of `serializer_class` from values_list()
+    rows: no model instances and no per-field serializer calls. The field -> column mapping
+    and the few value conversions DRF would apply (decimals and dates to strings) are worked
+    out once from the serializer's declared fields (other formats fall back to the field's own
+    to_representation). Only flat fields are supported:
+    model columns, foreign keys (as ids) and dotted sources such as `category.name`.
+    With `fieldset` only those fields are output, and only their columns are selected.
+    """
+
+    def __init__(self, serializer_class, fieldset=None):
+        self.serializer_class = serializer_class
+        self.names = []
+        self.lookups = []
+        self.converters = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only or (fieldset is not None and name not in fieldset):
+                continue
+            if field.source == '*' or isinstance(field, (
+                serializers.BaseSerializer, serializers.ManyRelatedField, serializers.SerializerMethodField
+            )):
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name} cannot be read from values(); '
+                    'only flat fields are supported'
+                )
+            converter = self._converter(field)
+            if converter:
+                self.converters.append((len(self.names), converter))
+            self.names.append(name)
+            self.lookups.append(field.source.replace('.', '__'))
+
+    @staticmethod
+    def _converter(field):
+        """The conversion DRF applies to a value of `field`, or None when it returns it as is"""
+        if isinstance(field, serializers.DecimalField):
+            if getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) and not field.localize:
+                return _decimal_converter(field)
+            return field.to_representation
+        if isinstance(field, serializers.DateTimeField):
+            if getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601 and not hasattr(field, 'timezone'):
+                return _datetime_to_string
+            return field.to_representation
+        if isinstance(field, serializers.DateField):
+            if getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+                return _date_to_string
+            return field.to_representation
+        return None
+
+    def rows(self, queryset):
+        """`queryset` as values_list() tuples, in the serializer's field order"""
+        return queryset.values_list(*self.lookups)
+
+    def to_representation(self, rows):
+        names = self.names
+        # Looking the current timezone up once, not per value, is a large part of the savings
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        converters = [
+            (index, partial(_datetime_to_string, tz=tz) if convert is _datetime_to_string else convert)
+            for index, convert in self.converters
+        ]
+        data = []
+        for row in rows:
+            if converters:
+                row = list(row)
+                for index, convert in converters:
+                    if row[index] is not None:
+                        row[index] = convert(row[index])
+            data.append(dict(zip(names, row)))
+        return data
+
+
+@lru_cache(maxsize=256)
+def values_serializer(serializer_class, fieldset=None):
+    """The (shared) ValuesSerializer for a serializer class, optionally limited to `fieldset`"""
+    return ValuesSerializer(serializer_class, fieldset)
@@ -0,0 +1,164 @@
+"""
+Model signal handlers for Finance Flow
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Household, Category, Budget, Transaction, CategoryNote, BudgetTemplate, TemplateCategory
+from . import events, reconciliation, sync, versioning
+
+
+RECONCILIATION_FIELDS = ('category_id', 'date', 'type', 'amount')
+
+
+def _reconciliation_state(transaction):
+    """The fields of a transaction that affect reconciliation totals"""
+    return (transaction.category_id, transaction.date, transaction.type, transaction.amount)
+
+
+@receiver(post_init, sender=Transaction)
+def remember_transaction_state(sender, instance, **kwargs):
+    """Keep the loaded values, so saves that leave them unchanged don't invalidate the household's cached totals"""
+    # Reading a field deferred by only()/defer() would query (and re-enter this handler)
+    if instance.pk and not instance.get_deferred_fields().intersection(RECONCILIATION_FIELDS):
+        instance._reconciliation_state = _reconciliation_state(instance)
+    else:
+        instance._reconciliation_state = None
+
+
+@receiver(pre_save, sender=Transaction)
+def load_deferred_transaction_state(sender, instance, raw=False, **kwargs):
+    """Partially loaded transactions read their stored values before the save overwrites them"""
+    if raw or instance._state.adding or instance._reconciliation_state is not None:
+        return
+    instance._reconciliation_state = Transaction.objects.filter(pk=instance.pk).values_list(
+        *RECONCILIATION_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=Transaction)
+def update_reconciliation_on_save(sender, instance, created, raw=False, **kwargs):
+    """Invalidate the household's cached totals when a change affects them"""
+    if raw:
+        return
+    old_state = getattr(instance, '_reconciliation_state', None) if not created else None
+    new_state = _reconciliation_state(instance)
+    if old_state == new_state:
+        return
+    instance._reconciliation_state = new_state
+    category_id, new_date, _, _ = new_state
+    if category_id or (old_state and old_state[0]):
+        reconciliation.invalidate_household(instance.household_id)
+
+    if category_id and reconciliation.auto_mark_paid_enabled():
+        totals = reconciliation.category_month_totals(category_id, new_date.year, new_date.month)
+        category_type = Category.objects.filter(id=category_id).values_list('type', flat=True).first()
+        reconciliation.mark_paid_if_reached(category_id, new_date, reconciliation.actual_amount(category_type, *totals))
+
+
+@receiver(post_delete, sender=Transaction)
+def update_reconciliation_on_delete(sender, instance, **kwargs):
+    """Invalidate the household's cached totals when a categorized transaction is deleted"""
+    state = getattr(instance, '_reconciliation_state', None) or _reconciliation_state(instance)
+    if state[0]:
+        reconciliation.invalidate_household(instance.household_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=CategoryNote)
+def bump_data_version_on_save(sender, instance, raw=False, **kwargs):
+    """Any saved category, budget, transaction or note changes its household's data version"""
+    if not raw:
+        versioning.bump_for_instance(instance)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=CategoryNote)
+def bump_data_version_on_delete(sender, instance, origin=None, **kwargs):
+    """Bump the data version once per delete() call rather than once per cascaded row"""
+    if isinstance(origin, (QuerySet, Household)):
+        # Queryset deletes bump for themselves; a deleted household has no version left
+        return
+    if isinstance(origin, Category) and origin is not instance:
+        versioning.bump_data_version(household_ids=[origin.household_id])
+        return
+    versioning.bump_for_instance(instance)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=CategoryNote)
+def record_sync_tombstone(sender, instance, origin=None, **kwargs):
+    """Deleted rows leave a tombstone for delta sync, written in the deleting transaction"""
+    if not isinstance(origin, Household):
+        sync.record_deletion(instance, origin)
+
+
+@receiver(pre_delete, sender=Category)
+def touch_uncategorized_transactions(sender, instance, origin=None, **kwargs):
+    """Transactions of a deleted category lose it via SET_NULL, which leaves updated_at alone"""
+    if not isinstance(origin, Household):
+        Transaction.objects.filter(category_id=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_init, sender=Budget)
+def remember_budget_state(sender, instance, **kwargs):
+    """Keep the loaded amount and paid flag so a save can tell a payment toggle from an edit"""
+    if instance.pk and not instance.get_deferred_fields().intersection(('amount', 'is_paid')):
+        instance._live_state = (instance.amount, instance.is_paid)
+    else:
+        instance._live_state = None
+
+
+@receiver(post_save, sender=Budget)
+def publish_budget_change(sender, instance, created, raw=False, **kwargs):
+    """Live 'budget' event for a changed amount, 'payment' event when only is_paid changed"""
+    if raw or events.get_bus() is None:
+        return
+    old_state, new_state = instance._live_state, (instance.amount, instance.is_paid)
+    instance._live_state = new_state
+    if old_state == new_state and not created:
+        return
+    household_id = versioning.get_household_id(instance)
+    if household_id is None:
+        household_id = Category.objects.filter(pk=instance.category_id).values_list('household_id', flat=True).first()
+    paid_only = not created and old_state is not None and old_state[0] == new_state[0]
+    events.publish(household_id, events.budget_event(instance, paid_only=paid_only))
+
+
+@receiver(post_delete, sender=Budget)
+def publish_budget_deletion(sender, instance, origin=None, **kwargs):
+    """A budget deleted on its own empties its cell; cascades and querysets send their own events"""
+    if origin is instance and events.get_bus() is not None:
+        household_id = versioning.get_household_id(instance)
+        if household_id is None:
+            household_id = Category.objects.filter(pk=instance.category_id).values_list('household_id', flat=True).first()
+        events.publish(household_id, {**events.budget_event(instance), 'deleted': True})
+
+
+@receiver(post_save, sender=Category)
+def publish_category_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        events.publish(instance.household_id, events.category_event(instance))
+
+
+@receiver(post_delete, sender=Category)
+def publish_category_deletion(sender, instance, origin=None, **kwargs):
+    """Deleted categories (each sub-category too); queryset deletes send a single reload"""
+    if not isinstance(origin, (QuerySet, Household)):
+        events.publish(instance.household_id, events.category_event(instance, deleted=True))
+
+
+@receiver(post_save, sender=TemplateCategory)
+@receiver(post_delete, sender=TemplateCategory)
+def touch_template(sender, instance, raw=False, **kwargs):
+    """Editing a template's categories counts as editing the template (for its Last-Modified)"""
+    if not raw:
+        BudgetTemplate.objects.filter(pk=instance.template_id).update(updated_at=timezone.now())
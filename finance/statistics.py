@@ -0,0 +1,165 @@
+"""
+System Statistics for Finance Flow
+Row counts and growth figures for the admin dashboard, cheap enough to show on every load
+
+On PostgreSQL, large tables are counted from the planner's catalog estimate
+(pg_class.reltuples, kept current by autovacuum/ANALYZE) instead of a COUNT(*) that scans the
+whole table; SQLite and small tables get exact counts. Results are cached for
+STATISTICS_CACHE_TTL seconds and, once stale, served while a background thread refreshes them.
+Each refresh stores a StatisticsSnapshot at most every STATISTICS_SNAPSHOT_INTERVAL seconds,
+which gives the growth time series.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Household, Category, Budget, Transaction, User, StatisticsSnapshot
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'finance:statistics'
+# Below this many estimated rows an exact COUNT(*) is cheap and more useful
+EXACT_COUNT_THRESHOLD = 100_000
+
+COUNTED_MODELS = {
+    'users': User,
+    'households': Household,
+    'categories': Category,
+    'budgets': Budget,
+    'transactions': Transaction,
+}
+
+_refresh_lock = threading.Lock()
+
+
+def cache_ttl():
+    return getattr(settings, 'STATISTICS_CACHE_TTL', 300)
+
+
+def snapshot_interval():
+    return getattr(settings, 'STATISTICS_SNAPSHOT_INTERVAL', 24 * 60 * 60)
+
+
+def count_rows(model):
+    """(row count, estimated): a catalog estimate for large PostgreSQL tables, else COUNT(*)"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0 on older servers) until the table has been vacuumed/analyzed
+        if row and row[0] >= EXACT_COUNT_THRESHOLD:
+            return row[0], True
+    return model.objects.count(), False
+
+
+def collect():
+    """Compute the statistics now; returns a dict that is safe to cache"""
+    started = time.perf_counter()
+    counts = {}
+    estimated_tables = []
+    for name, model in COUNTED_MODELS.items():
+        counts[name], is_estimate = count_rows(model)
+        if is_estimate:
+            estimated_tables.append(name)
+
+    # Grouping the membership table alone avoids joining every household to its members
+    top = list(
+        Household.members.through.objects.values('household_id')
+        .annotate(member_count=Count('*'))
+        .order_by('-member_count', 'household_id')[:5]
+    )
+    names = dict(Household.objects.filter(id__in=[row['household_id'] for row in top]).values_list('id', 'name'))
+
+    return {
+        'counts': counts,
+        'estimated': bool(estimated_tables),
+        'estimated_tables': estimated_tables,
+        'recent_users': User.objects.filter(date_joined__gte=timezone.now() - timedelta(days=7)).count(),
+        'top_households': [
+            {'id': row['household_id'], 'name': names.get(row['household_id'], ''), 'member_count': row['member_count']}
+            for row in top
+        ],
+        'computed_at': timezone.now(),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def refresh():
+    """Recompute, cache and, when one is due, record a snapshot; returns the statistics"""
+    stats = collect()
+    # Keep stale values well past the TTL so they can be served while a refresh runs
+    cache.set(CACHE_KEY, stats, cache_ttl() * 10)
+    record_snapshot(stats)
+    return stats
+
+
+def record_snapshot(stats, force=False):
+    latest = StatisticsSnapshot.objects.order_by('-recorded_at').values_list('recorded_at', flat=True).first()
+    if not force and latest and stats['computed_at'] - latest < timedelta(seconds=snapshot_interval()):
+        return None
+    return StatisticsSnapshot.objects.create(estimated=stats['estimated'], **stats['counts'])
+
+
+def get_statistics():
+    """
+    Cached statistics: computed inline on a cold cache, otherwise returned as cached and
+    refreshed in a background thread when older than the TTL
+    """
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        return refresh()
+    if timezone.now() - stats['computed_at'] > timedelta(seconds=cache_ttl()):
+        _refresh_in_background()
+    return stats
+
+
+def _refresh_in_background():
+    if not _refresh_lock.acquire(blocking=False):
+        return  # a refresh is already running in this process
+
+    def run():
+        try:
+            refresh()
+        except Exception:
+            logger.exception('Refreshing statistics failed')
+        finally:
+            connections.close_all()
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name='finance-statistics', daemon=True).start()
+
+
+def growth(days=30):
+    """
+    Per counted table over the last `days`: the first and latest snapshot values, the change and
+    the average change per day, plus the snapshots themselves (oldest first) as a time series
+    """
+    since = timezone.now() - timedelta(days=days)
+    snapshots = list(StatisticsSnapshot.objects.filter(recorded_at__gte=since).order_by('recorded_at'))
+    if len(snapshots) < 2:
+        return {'snapshots': snapshots, 'rows': []}
+
+    first, last = snapshots[0], snapshots[-1]
+    span_days = max((last.recorded_at - first.recorded_at).total_seconds() / 86400, 1 / 24)
+    rows = []
+    for name in COUNTED_MODELS:
+        start, end = getattr(first, name), getattr(last, name)
+        rows.append({
+            'name': name,
+            'start': start,
+            'end': end,
+            'change': end - start,
+            'per_day': round((end - start) / span_days, 1),
+            'percent': round((end - start) * 100 / start, 1) if start else None,
+        })
+    return {'snapshots': snapshots, 'rows': rows, 'since': first.recorded_at}
@@ -0,0 +1,228 @@
+"""
+Budget Summaries for Finance Flow
+The data behind the dashboard, yearly budget and outstanding payments APIs
+
+Each response is split into parts that can be computed independently: a total, the unpaid
+count, the budget list or grid of one category type. `*_parts()` returns the parts a
+request needs as {name: (function, args)}, and `assemble_*()` builds the response from
+their results. The sync views in api_views.py run the parts one after the other, and
+the async views in async_api_views.py run them concurrently. The two therefore always return
+the same data. Every part loads its budgets with a single query instead of one per category
+and month, and serializes its categories with one serializer instance instead of one each.
+"""
+import calendar
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef, Sum
+
+from .models import Category, Budget
+from .serializers import CategoryListSerializer
+
+ZERO = Decimal(0)
+SECTION_TYPES = {'income': 'INCOME', 'expense': 'EXPENSE', 'savings': 'SAVINGS'}
+TOTALS = {'total_income': 'INCOME', 'total_expenses': 'EXPENSE', 'total_savings': 'SAVINGS'}
+
+
+def first_budgets(fields, **filters):
+    """
+    {category_id: values of `fields`} for each category's first (lowest id) budget matching
+    `filters`, as Budget.objects.filter(category=..., **filters).first() would find it
+    """
+    rows = Budget.objects.filter(**filters).order_by('-id').values_list(
+        'category_id', *fields
+    )
+    # Descending ids: the lowest id per category is written last and wins
+    return {category_id: values for category_id, *values in rows}
+
+
+def budget_total(household, category_type, start_date):
+    return Budget.objects.filter(
+        category__household=household,
+        category__type=category_type,
+        start_date=start_date
+    ).aggregate(Sum('amount'))['amount__sum'] or ZERO
+
+
+def unpaid_count(household, start_date):
+    return Budget.objects.filter(
+        category__household=household,
+        category__type='EXPENSE',
+        category__payment_type='MANUAL',
+        start_date=start_date,
+        is_paid=False,
+        amount__gt=0
+    ).count()
+
+
+def budget_list(household, category_type, start_date):
+    """Top-level categories of a type with their budget for the month (summed over sub-categories)"""
+    categories = list(Category.objects.filter(
+        household=household, type=category_type, parent__isnull=True
+    ).prefetch_related('children'))
+    category_ids = [category.id for category in categories]
+    category_ids += [child.id for category in categories for child in category.children.all()]
+    amounts = first_budgets(['amount'], category_id__in=category_ids, start_date=start_date)
+
+    category_data = CategoryListSerializer().to_representation
+    result = []
+    for category in categories:
+        children = list(category.children.all())
+        if children:
+            total = sum((amounts[child.id][0] if child.id in amounts else ZERO for child in children), ZERO)
+        else:
+            total = amounts[category.id][0] if category.id in amounts else ZERO
+        result.append({
+            'category': category_data(category),
+            'amount': total
+        })
+    return result
+
+
+def dashboard_parts(household, active_date, fieldset):
+    start_date = active_date.replace(day=1)
+    if 'balance' in fieldset:
+        totals = list(TOTALS)
+    else:
+        totals = [name for name in TOTALS if name in fieldset]
+    parts = {name: (budget_total, (household, TOTALS[name], start_date)) for name in totals}
+    if 'unpaid_count' in fieldset:
+        parts['unpaid_count'] = (unpaid_count, (household, start_date))
+    for section, category_type in SECTION_TYPES.items():
+        name = f'{section}_budgets'
+        if name in fieldset:
+            parts[name] = (budget_list, (household, category_type, start_date))
+    return parts
+
+
+def assemble_dashboard(active_date, fieldset, results):
+    data = {
+        'active_date': active_date.isoformat(),
+        'year': active_date.year,
+        'month': active_date.month,
+        **results,
+    }
+    if 'balance' in fieldset:
+        data['balance'] = data['total_income'] - data['total_expenses'] - data['total_savings']
+    return {name: data[name] for name in fieldset}
+
+
+def budget_grid(household, category_type, year):
+    """Every category of a type (by name) with its budget for each month of the year"""
+    categories = list(Category.objects.filter(household=household, type=category_type).order_by('name').select_related(
+        'parent'
+    ).annotate(has_children=Exists(Category.objects.filter(parent=OuterRef('pk')))))
+    budgets = {}
+    rows = Budget.objects.filter(
+        category_id__in=[category.id for category in categories], start_date__year=year
+    ).order_by('-id').values_list('category_id', 'start_date', 'amount', 'id', 'is_paid')
+    for category_id, start_date, *budget in rows:
+        budgets[category_id, start_date.month] = budget
+
+    category_data = CategoryListSerializer().to_representation
+    result = []
+    for category in categories:
+        months_data = {}
+        for month in range(1, 13):
+            amount, budget_id, is_paid = budgets.get((category.id, month), (ZERO, None, False))
+            months_data[month] = {
+                'amount': amount,
+                'budget_id': budget_id,
+                'is_paid': is_paid
+            }
+        result.append({
+            'category': category_data(category),
+            'months': months_data,
+            'is_parent': category.parent_id is None,
+            'has_children': category.has_children
+        })
+    return result
+
+
+def yearly_parts(household, year, fieldset):
+    return {
+        f'{section}_budget_data': (budget_grid, (household, category_type, year))
+        for section, category_type in SECTION_TYPES.items()
+        if f'{section}_budget_data' in fieldset
+    }
+
+
+def assemble_yearly(year, active_month, fieldset, results):
+    months = list(range(1, 13))
+    data = {
+        'year': year,
+        'active_month': active_month,
+        'months': months,
+        'month_names': [calendar.month_abbr[i] for i in months],
+        **results,
+    }
+    return {name: data[name] for name in fieldset}
+
+
+def outstanding_parents(household):
+    """Top-level manual expense categories with their sub-categories"""
+    return list(Category.objects.filter(
+        household=household,
+        type='EXPENSE',
+        payment_type='MANUAL',
+        parent__isnull=True
+    ).prefetch_related('children'))
+
+
+def outstanding_budgets(household, year, month):
+    """The month's first budget of every sub-category of a top-level manual expense category"""
+    return first_budgets(
+        ['id', 'amount', 'is_paid'],
+        category__parent__household=household,
+        category__parent__type='EXPENSE',
+        category__parent__payment_type='MANUAL',
+        category__parent__parent__isnull=True,
+        start_date__year=year,
+        start_date__month=month,
+    )
+
+
+def outstanding_parts(household, year, month):
+    return {
+        'parents': (outstanding_parents, (household,)),
+        'budgets': (outstanding_budgets, (household, year, month)),
+    }
+
+
+def assemble_outstanding(year, month, results):
+    """Unpaid manual expense budgets of a month, grouped by parent category, and their total"""
+    budgets = results['budgets']
+    category_data = CategoryListSerializer().to_representation
+    grouped_budgets = []
+    total = 0
+    for parent in results['parents']:
+        items = []
+        subtotal = 0
+        for child in parent.children.all():
+            budget_id, amount, is_paid = budgets.get(child.id, (None, None, None))
+            if budget_id and amount > 0 and not is_paid:
+                items.append({
+                    'id': budget_id,
+                    'category': category_data(child),
+                    'amount': float(amount),
+                    'is_paid': is_paid
+                })
+                subtotal += float(amount)
+        if items:
+            grouped_budgets.append({
+                'parent': category_data(parent),
+                'items': items,
+                'subtotal': float(subtotal)
+            })
+            total += subtotal
+    return {
+        'year': year,
+        'month': month,
+        'month_name': calendar.month_name[int(month)],
+        'grouped_budgets': grouped_budgets,
+        'total': float(total)
+    }
+
+
+def run_parts(parts):
+    """Compute `parts` one after the other; returns {name: result}"""
+    return {name: function(*args) for name, (function, args) in parts.items()}
@@ -0,0 +1,185 @@
+"""
+Delta Sync for Finance Flow
+Changes to a household's categories, budgets, transactions and notes since a cursor
+
+Rows are found by their updated_at column (auto_now on save, set by
+HouseholdDataQuerySet.update() for bulk updates) and deletions by Tombstone rows written when
+a row is deleted. A sync pass covers the window (since, until], where `until` is the time
+the pass started, walking the models in a fixed order with (updated_at, id) keyset paging so
+a page costs the same however large the household is. The cursor is signed and opaque to clients:
+mid-pass it resumes the walk, at the end of a pass it starts the next window at `until`.
+
+Windows reach back SYNC_CURSOR_OVERLAP seconds before `since`, so a row saved by a
+transaction that committed just after a pass read past it is still picked up; clients may
+therefore see a row twice and must apply changes as upserts by id. Tombstones older than
+SYNC_TOMBSTONE_RETENTION_DAYS are pruned, and older cursors get CursorExpired (a full
+re-sync). Deleting a category also deletes its sub-categories, budgets and notes, each of
+which gets its own tombstone; transactions lose the category and show up as updated.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .fieldsets import readable_fields
+from .models import Category, Budget, Transaction, CategoryNote, Tombstone
+from .serializers import (
+    CategorySerializer, BudgetSerializer, TransactionSerializer, CategoryNoteSerializer, values_serializer
+)
+from .versioning import get_household_id
+
+CURSOR_SALT = 'finance.sync.cursor'
+
+# name -> (model, household lookup, serializer, fields left out of sync rows)
+STREAMS = {
+    'categories': (Category, 'household', CategorySerializer, ('children_count', 'notes_count')),
+    'budgets': (Budget, 'category__household', BudgetSerializer, ()),
+    'transactions': (Transaction, 'household', TransactionSerializer, ()),
+    'notes': (CategoryNote, 'category__household', CategoryNoteSerializer, ()),
+}
+MODEL_NAMES = {model: name for name, (model, *_) in STREAMS.items()}
+# Tombstones are walked last, so a row changed and then deleted in one window ends up deleted
+DELETED = 'deleted'
+STREAM_ORDER = (*STREAMS, DELETED)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorExpired(Exception):
+    """The cursor is older than the tombstones kept; the client has to sync from scratch"""
+
+
+def page_size(requested=None):
+    default = getattr(settings, 'SYNC_PAGE_SIZE', 500)
+    maximum = getattr(settings, 'SYNC_MAX_PAGE_SIZE', 5000)
+    try:
+        return max(1, min(int(requested), maximum)) if requested else default
+    except (TypeError, ValueError):
+        raise InvalidCursor('limit must be a number')
+
+
+def overlap():
+    return timedelta(seconds=getattr(settings, 'SYNC_CURSOR_OVERLAP', 30))
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+def encode_cursor(state):
+    return signing.dumps(state, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, household):
+    try:
+        state = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise InvalidCursor('Invalid sync cursor')
+    if state.get('household') != household.id:
+        raise InvalidCursor('The sync cursor belongs to another household')
+    return state
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def changes_since(household, cursor=None, limit=None):
+    """
+    Up to `limit` changed rows of `household` after `cursor` (None: every row).
+    Returns {'cursor', 'has_more', 'full', 'changes': {name: {'updated': [...], 'deleted': [ids]}}}.
+    """
+    limit = page_size(limit)
+    now = timezone.now()
+    state = decode_cursor(cursor, household) if cursor else {'household': household.id, 'since': None}
+    if 'until' not in state:
+        # A new pass over everything changed since the end of the previous one
+        state = {**state, 'until': now.isoformat(), 'stream': 0, 'after': None}
+    since, until = _timestamp(state['since']), _timestamp(state['until'])
+    if since is not None and since < now - tombstone_retention():
+        raise CursorExpired('The sync cursor has expired; sync again without one')
+    lower = since - overlap() if since is not None else None
+
+    changes = {name: {'updated': [], 'deleted': []} for name in STREAMS}
+    remaining = limit
+    for index in range(state['stream'], len(STREAM_ORDER)):
+        name = STREAM_ORDER[index]
+        if name == DELETED and since is None:
+            break  # a full sync has nothing to delete
+        after = state['after'] if index == state['stream'] else None
+        if remaining == 0:
+            return _page(changes, state, index, after, has_more=True)
+
+        if name == DELETED:
+            queryset, timestamp = Tombstone.objects.filter(household=household), 'deleted_at'
+            columns = ('model', 'object_id')
+        else:
+            model, household_lookup, serializer_class, left_out = STREAMS[name]
+            queryset, timestamp = model.objects.filter(**{household_lookup: household}), 'updated_at'
+            fieldset = tuple(field for field in readable_fields(serializer_class) if field not in left_out)
+            serializer = values_serializer(serializer_class, fieldset)
+            columns = serializer.lookups
+
+        queryset = queryset.filter(**{f'{timestamp}__lte': until})
+        if lower is not None:
+            queryset = queryset.filter(**{f'{timestamp}__gt': lower})
+        if after is not None:
+            after_time, after_id = _timestamp(after[0]), after[1]
+            queryset = queryset.filter(Q(**{f'{timestamp}__gt': after_time}) | Q(**{timestamp: after_time, 'id__gt': after_id}))
+        rows = list(queryset.order_by(timestamp, 'id').values_list(timestamp, 'id', *columns)[:remaining + 1])
+
+        more = len(rows) > remaining
+        rows = rows[:remaining]
+        remaining -= len(rows)
+        if name == DELETED:
+            for _, _, model_name, object_id in rows:
+                changes[model_name]['deleted'].append(object_id)
+        else:
+            changes[name]['updated'] = serializer.to_representation(row[2:] for row in rows)
+        if more:
+            last_time, last_id = rows[-1][:2]
+            return _page(changes, state, index, (last_time.isoformat(), last_id), has_more=True)
+
+    # Pass complete: the next one starts where this one ended
+    return {
+        'cursor': encode_cursor({'household': household.id, 'since': state['until']}),
+        'has_more': False,
+        'full': since is None,
+        'changes': changes,
+    }
+
+
+def _page(changes, state, stream, after, has_more):
+    return {
+        'cursor': encode_cursor({**state, 'stream': stream, 'after': after}),
+        'has_more': has_more,
+        'full': state['since'] is None,
+        'changes': changes,
+    }
+
+
+def record_deletion(instance, origin=None):
+    """Write the tombstone of a deleted category, budget, transaction or note"""
+    household_id = get_household_id(instance)
+    if household_id is None and isinstance(origin, Category):
+        household_id = origin.household_id
+    if household_id is None:
+        # A budget or note deleted without its category loaded: look the category up once per delete() call
+        memo = origin.__dict__.setdefault('_sync_category_households', {}) if origin is not None else {}
+        if instance.category_id not in memo:
+            memo[instance.category_id] = Category.objects.filter(
+                pk=instance.category_id
+            ).values_list('household_id', flat=True).first()
+        household_id = memo[instance.category_id]
+    if household_id is not None:
+        Tombstone.objects.create(household_id=household_id, model=MODEL_NAMES[type(instance)], object_id=instance.pk)
+
+
+def prune_tombstones():
+    """Delete tombstones no cursor can still need; returns how many"""
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - tombstone_retention()).delete()
+    return deleted
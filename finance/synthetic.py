@@ -0,0 +1,301 @@
+"""
+Synthetic data generation for Finance Flow
+Builds realistic households of a chosen size for benchmarks and load tests
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction as db_transaction
+
+from .models import Household, Category, Budget, Transaction, CategoryNote, BudgetTemplate
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 5000
+
+CATEGORY_TYPES = ('INCOME', 'EXPENSE', 'SAVINGS')
+# Roughly how a household's categories split across types
+CATEGORY_TYPE_WEIGHTS = (1, 8, 1)
+MERCHANTS = (
+    'Woolworths', 'Checkers', 'Pick n Pay', 'Shell', 'Engen', 'Takealot', 'Netflix',
+    'Vodacom', 'Eskom', 'Discovery', 'Uber', 'Mr Price', 'Dis-Chem', 'Spar', 'Salary',
+)
+NOTE_TEXTS = (
+    'Debit order moved to the 25th.',
+    'Check whether this can be cancelled.',
+    'Increase expected after the annual review.',
+    'Shared with the other household members.',
+    'Paid from the savings account this year.',
+    'Compare quotes before renewing.',
+)
+
+
+def month_starts(first_year, years):
+    """Yield (start_date, end_date) for every month of `years` years starting at `first_year`"""
+    for year in range(first_year, first_year + years):
+        for month in range(1, 13):
+            start = date(year, month, 1)
+            end = (date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1))
+            yield start, end
+
+
+def create_member(household, email):
+    """Create a user with password 'password' and add them to the household"""
+    user = User(email=email)
+    user.set_password('password')
+    user.save()
+    household.members.add(user)
+    return user
+
+
+def create_categories(household, count, rng, children_per_parent=4):
+    """
+    Create `count` categories: parents with up to `children_per_parent` children each,
+    spread over income, expense and savings. Returns the saved categories.
+    """
+    parents = []
+    parent_count = max(1, count // (children_per_parent + 1))
+    for i in range(parent_count):
+        category_type = rng.choices(CATEGORY_TYPES, weights=CATEGORY_TYPE_WEIGHTS)[0] if i >= len(CATEGORY_TYPES) else CATEGORY_TYPES[i]
+        parents.append(Category(
+            household=household,
+            name=f'{category_type.title()} Group {i + 1}',
+            type=category_type,
+            payment_type='INCOME' if category_type == 'INCOME' else rng.choice(['AUTO', 'MANUAL']),
+            is_persistent=False,
+        ))
+    parents = Category.objects.bulk_create(parents)
+
+    children = []
+    for i in range(count - len(parents)):
+        parent = parents[i % len(parents)]
+        children.append(Category(
+            household=household,
+            name=f'{parent.name} Item {i // len(parents) + 1}',
+            type=parent.type,
+            parent=parent,
+            payment_type=parent.payment_type,
+            is_persistent=rng.random() < 0.8,
+            is_essential=rng.random() < 0.6,
+        ))
+    children = Category.objects.bulk_create(children)
+    return parents + children
+
+
+def create_categories_from_template(household, template, rng, extra=0):
+    """
+    Copy a BudgetTemplate's category tree into the household with two bulk inserts,
+    then add `extra` generated sub-categories under randomly chosen template parents.
+    Returns the saved categories.
+    """
+    template_categories = list(template.categories.order_by('display_order', 'name'))
+
+    def copy(template_category, parent=None):
+        return Category(
+            household=household,
+            name=template_category.name,
+            type=template_category.type,
+            is_persistent=template_category.is_persistent,
+            payment_type=template_category.payment_type,
+            is_essential=template_category.is_essential,
+            parent=parent,
+        )
+
+    top_level = [tc for tc in template_categories if tc.parent_id is None]
+    parents = Category.objects.bulk_create([copy(tc) for tc in top_level])
+    parent_map = {tc.id: category for tc, category in zip(top_level, parents)}
+
+    children = [
+        copy(tc, parent_map[tc.parent_id])
+        for tc in template_categories
+        if tc.parent_id is not None and tc.parent_id in parent_map
+    ]
+    for i in range(extra):
+        parent = rng.choice(parents)
+        children.append(Category(
+            household=household,
+            name=f'{parent.name} Extra {i + 1}',
+            type=parent.type,
+            parent=parent,
+            payment_type=parent.payment_type,
+            is_persistent=rng.random() < 0.7,
+            is_essential=rng.random() < 0.5,
+        ))
+    children = Category.objects.bulk_create(children)
+    return parents + children
+
+
+def budget_amounts(category, months, rng):
+    """
+    Yield a realistic monthly budget amount for each of `months` months, mimicking rollover:
+    persistent categories carry the previous amount forward with an annual increase each
+    January and the odd manual adjustment; non-persistent ones start at 0 each month and
+    are only sometimes filled in.
+    """
+    amount = Decimal(rng.randint(5, 500) * 10)
+    for index in range(months):
+        if category.is_persistent:
+            if index and index % 12 == 0:
+                amount = (amount * Decimal('1.06')).quantize(Decimal('1'))
+            elif rng.random() < 0.05:
+                amount = Decimal(max(10, int(amount) + rng.randint(-20, 20) * 10))
+            yield amount
+        else:
+            yield Decimal(rng.randint(1, 100) * 10) if rng.random() < 0.4 else Decimal('0')
+
+
+def create_budgets(categories, first_year, years, rng, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Create a budget row for every category for every month, as open_budget_month would:
+    parents with children stay at 0, leaves follow `budget_amounts`. AUTO and INCOME budgets
+    are paid; MANUAL ones are mostly paid in the past and mostly unpaid from this month on.
+    Returns the number created.
+    """
+    months = list(month_starts(first_year, years))
+    this_month = date.today().replace(day=1)
+    parent_ids = {c.parent_id for c in categories if c.parent_id}
+
+    batch = []
+    created = 0
+    for category in categories:
+        if category.id in parent_ids:
+            amounts = [Decimal('0')] * len(months)
+        else:
+            amounts = budget_amounts(category, len(months), rng)
+        for (start, end), amount in zip(months, amounts):
+            if category.payment_type in ('AUTO', 'INCOME'):
+                is_paid = True
+            else:
+                is_paid = rng.random() < (0.95 if start < this_month else 0.2)
+            batch.append(Budget(
+                category=category,
+                amount=amount,
+                start_date=start,
+                end_date=end,
+                is_paid=is_paid,
+            ))
+            if len(batch) >= batch_size:
+                Budget.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+    if batch:
+        Budget.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def create_transactions(household, categories, count, first_year, years, rng, batch_size=DEFAULT_BATCH_SIZE):
+    """Create `count` transactions spread evenly over the period. Returns the number created."""
+    if count <= 0:
+        return 0
+    first_day = date(first_year, 1, 1)
+    span_days = (date(first_year + years, 1, 1) - first_day).days
+    leaf_categories = [c for c in categories if c.parent_id] or categories
+
+    batch = []
+    for i in range(count):
+        category = rng.choice(leaf_categories) if rng.random() < 0.85 else None
+        transaction_type = 'INCOME' if category is not None and category.type == 'INCOME' else 'EXPENSE'
+        batch.append(Transaction(
+            household=household,
+            amount=Decimal(rng.randint(100, 500000)) / 100,
+            date=first_day + timedelta(days=i * span_days // count),
+            description=f'{rng.choice(MERCHANTS)} {rng.randint(1000, 9999)}',
+            category=category,
+            type=transaction_type,
+        ))
+        if len(batch) >= batch_size:
+            Transaction.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Transaction.objects.bulk_create(batch)
+    return count
+
+
+def create_notes(categories, author, count, rng, batch_size=DEFAULT_BATCH_SIZE):
+    """Attach `count` notes to randomly chosen categories. Returns the number created."""
+    notes = [
+        CategoryNote(category=rng.choice(categories), author=author, note=rng.choice(NOTE_TEXTS))
+        for _ in range(count)
+    ]
+    CategoryNote.objects.bulk_create(notes, batch_size=batch_size)
+    return len(notes)
+
+
+def seed_household(name, categories=10, years=1, transactions=0, first_year=None, seed=0,
+                   batch_size=DEFAULT_BATCH_SIZE, template=None, notes=0, email=None):
+    """
+    Create a household with one member, its categories, `years` of monthly budgets ending
+    in the current year, `transactions` transactions and `notes` category notes.
+    With a `template` the category tree is copied from it and padded with generated
+    sub-categories up to `categories`; otherwise `categories` are generated.
+    Deterministic for a given `seed`. Returns (household, user).
+    """
+    rng = random.Random(seed)
+    if first_year is None:
+        first_year = date.today().year - years + 1
+    household = Household.objects.create(name=name)
+    user = create_member(household, email or f'{name.lower().replace(" ", "-")}@example.com')
+    if template is not None:
+        extra = max(0, categories - template.categories.count())
+        created_categories = create_categories_from_template(household, template, rng, extra=extra)
+    else:
+        created_categories = create_categories(household, categories, rng)
+    create_budgets(created_categories, first_year, years, rng, batch_size=batch_size)
+    create_transactions(household, created_categories, transactions, first_year, years, rng, batch_size=batch_size)
+    if notes and created_categories:
+        create_notes(created_categories, user, notes, rng, batch_size=batch_size)
+    return household, user
+
+
+def generate_households(indexes, seed=0, prefix='Synthetic', templates=None, **options):
+    """
+    Create one household per index in `indexes`, each in its own transaction.
+    Household `i` is seeded with `seed + i` and uses `templates[i % len(templates)]`,
+    so the result doesn't depend on how indexes are split across workers.
+    `options` are passed through to `seed_household`. Returns the number of households created.
+    """
+    if templates is None:
+        templates = list(BudgetTemplate.objects.filter(is_active=True).order_by('id'))
+    created = 0
+    for i in indexes:
+        with db_transaction.atomic():
+            seed_household(
+                f'{prefix} {seed}-{i}',
+                seed=seed + i,
+                template=templates[i % len(templates)] if templates else None,
+                email=f'{prefix.lower()}-{seed}-{i}@example.com',
+                **options,
+            )
+        created += 1
+    return created
+
+
+def _worker(args):
+    indexes, seed, prefix, options = args
+    # Each process needs its own connection
+    connections.close_all()
+    try:
+        return generate_households(indexes, seed=seed, prefix=prefix, **options)
+    finally:
+        connections.close_all()
+
+
+def generate_households_parallel(count, workers, seed=0, prefix='Synthetic', **options):
+    """
+    Spread `count` households over `workers` processes (round-robin by index).
+    Meant for PostgreSQL; SQLite serialises writers so extra workers only add lock waits.
+    Returns the number of households created.
+    """
+    import multiprocessing
+
+    if workers <= 1:
+        return generate_households(range(count), seed=seed, prefix=prefix, **options)
+
+    # Connections must not be shared with forked children
+    connections.close_all()
+    chunks = [(range(w, count, workers), seed, prefix, options) for w in range(workers)]
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        return sum(pool.map(_worker, chunks))
@@ -1,19 +1,97 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+
 from django import template
+from django.conf import settings
+from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+CENTS = Decimal('0.01')
+
+
 @register.filter
 def get_item(dictionary, key):
     return dictionary.get(key)
 
+
+@lru_cache(maxsize=8192)
+def _format_currency(value, thousand_separator, decimal_separator):
+    text = f'{value.quantize(CENTS, rounding=ROUND_HALF_UP):,.2f}'
+    if (thousand_separator, decimal_separator) != (',', '.'):
+        text = text.translate(str.maketrans({',': thousand_separator, '.': decimal_separator}))
+    return text
+
+
+def format_currency(value):
+    """
+    Thousand separators and 2 decimal places, rounded half up. Decimals are formatted exactly
+    (never through float); separators come from CURRENCY_THOUSAND_SEPARATOR and
+    CURRENCY_DECIMAL_SEPARATOR. Grids repeat the same few amounts, so results are memoized.
+    """
+    if not isinstance(value, Decimal):
+        try:
+            value = Decimal(value if isinstance(value, (int, str)) else str(value))
+        except (InvalidOperation, ValueError, TypeError):
+            value = Decimal(0)
+    if not value.is_finite():
+        value = Decimal(0)
+    return _format_currency(
+        value,
+        getattr(settings, 'CURRENCY_THOUSAND_SEPARATOR', ','),
+        getattr(settings, 'CURRENCY_DECIMAL_SEPARATOR', '.'),
+    )
+
+
 @register.filter
 def currency(value):
     """Format number with thousand separators and 2 decimal places"""
     if value is None:
-        return "0.00"
-    try:
-        # Convert to float, format with thousand separators and 2 decimal places
-        num = float(value)
-        return f"{num:,.2f}"
-    except (ValueError, TypeError):
-        return "0.00"
+        value = 0
+    return format_currency(value)
+
+
+@register.simple_tag
+def budget_row_cells(item, year, active_month, income=False):
+    """
+    The twelve month cells of a yearly grid row in one call, instead of a template loop
+    doing a get_item lookup, a currency format and a dozen comparisons per cell.
+    Income rows are always editable and have no payment checkbox.
+    """
+    category = item['category']
+    has_children = item['has_children']
+    editable = income or not has_children
+    cells = []
+    for month in range(1, 13):
+        info = item['months'][month]
+        amount = info['amount']
+
+        classes = 'editable-cell' if editable else 'parent-cell'
+        if active_month == month:
+            classes += ' table-info'
+        elif editable and not category.is_persistent and amount == 0:
+            classes += ' table-warning'
+
+        if editable:
+            attributes = (
+                f'data-category-id="{category.id}" data-month="{month}" data-year="{year}" '
+                f'data-amount="{amount}" style="cursor: pointer;"'
+            )
+        else:
+            background = '' if active_month == month else ' background-color: #f8f9fa;'
+            attributes = f'data-month="{month}" style="font-weight: bold;{background}"'
+
+        extra = ''
+        if not income and not has_children:
+            if category.payment_type == 'MANUAL':
+                checked = 'checked ' if info['is_paid'] else ''
+                extra = (
+                    f'<input type="checkbox" class="form-check-input payment-checkbox float-end" '
+                    f'data-budget-id="{info["budget_id"]}" {checked}style="margin-top: 0.2rem;">'
+                )
+            elif info['is_paid']:
+                extra = '<small class="text-muted float-end">✓</small>'
+
+        cells.append(f'<td class="{classes}" {attributes}>{format_currency(amount)}{extra}</td>')
+    # Every interpolated value is a number, an id or a fixed string, so nothing needs escaping
+    return mark_safe('\n'.join(cells))
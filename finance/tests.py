@@ -1,3 +1,1120 @@
-from django.test import TestCase
+import asyncio
+import gc
+import itertools
+import json
+import os
+import re
+import runpy
+import tempfile
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+
+from . import async_api_views, categorization, events, reconciliation, statistics, sync
+from .instrumentation import query_stats
+from . import profiling
+from .metrics import Counter, Registry
+from .transaction_filters import TransactionFilterError, filter_transactions, keyset_page
+from .categorization import CompiledRuleSet, get_ruleset
+from .importers import ImportResult, import_transactions, parse_amount, parse_csv, parse_ofx
+from .middleware import ExportConcurrencyMiddleware
+from .models import (
+    User, Household, Category, Budget, Transaction, CategoryNote,
+    CategorizationRule, BudgetTemplate, TemplateCategory, StatisticsSnapshot
+)
+
+
+class HouseholdAPITestCase(TestCase):
+    """A logged-in owner with an active household"""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.household = Household.objects.create(name='Owner household')
+        self.household.members.add(self.user)
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['active_household_id'] = self.household.id
+        session.save()
+
+
+class StatementImportTests(HouseholdAPITestCase):
+    """Amount parsing and duplicate handling of bank statement imports"""
+
+    def test_parse_amount(self):
+        cases = {
+            '12.50': '12.50', '12,5': '12.5', '12,50': '12.50', '1.234,56': '1234.56', '1,234': '1234',
+            '1,234.56': '1234.56', '$ 1,234.50': '1234.50', '(12.00)': '-12.00', '12.00-': '-12.00',
+            '40,00 DR': '-40.00', '40.00CR': '40.00', '-7': '-7',
+        }
+        for text, expected in cases.items():
+            self.assertEqual(parse_amount(text), Decimal(expected), text)
+
+    def test_duplicates(self):
+        statement = [
+            'Date,Description,Amount\n',
+            '2024-03-01,Coffee,-3.50\n',
+            '2024-03-01,Coffee,-3.50\n',  # bought twice that day: both are kept
+            '2024-03-02,Salary,"2.500,00"\n',
+        ]
+        first = import_transactions(self.household, parse_csv(statement))
+        self.assertEqual(first, ImportResult(3, 0, 0, 0, []))
+        self.assertEqual(Transaction.objects.filter(household=self.household).count(), 3)
+        again = import_transactions(self.household, parse_csv(statement))
+        self.assertEqual((again.created, again.duplicates), (0, 3))
+
+    def test_repeated_reference(self):
+        block = '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240301<TRNAMT>-9.99<FITID>A1<NAME>Music</STMTTRN>\n'
+        result = import_transactions(self.household, parse_ofx([block, block]))
+        self.assertEqual((result.created, result.duplicates), (1, 1))
+
+    def test_skipped_conflicts(self):
+        """Rows bulk_create skipped as conflicts are reported as duplicates, not as created"""
+        statement = ['Date,Description,Amount\n', '2024-03-01,Rent,-900\n', '2024-03-03,Gym,-30\n']
+        bulk_create = Transaction.objects.bulk_create
+
+        def conflicting_bulk_create(objs, **kwargs):
+            return bulk_create(objs[1:], **kwargs)
+
+        with mock.patch.object(Transaction.objects, 'bulk_create', conflicting_bulk_create):
+            result = import_transactions(self.household, parse_csv(statement))
+        self.assertEqual((result.created, result.duplicates), (1, 1))
+
+
+    def test_unreadable_csv(self):
+        statement = 'Date,Description,Amount\n2024-03-01,"%s",-1\n2024-03-02,Bread,-2\n' % ('x' * 200_000)
+        response = self.client.post('/api/transactions/import/', {
+            'file': SimpleUploadedFile('statement.csv', statement.encode()),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['created'], response.json()['skipped']), (1, 1))
+        self.assertIn('Line 2: field larger than field limit', response.json()['errors'][0])
+
+        response = self.client.post('/api/transactions/import/', {
+            'file': SimpleUploadedFile('statement.csv', ('Date,"%s",Amount\n' % ('x' * 200_000)).encode()),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unreadable CSV header', response.json()['error'])
+
+class CategorizationTests(HouseholdAPITestCase):
+    """The compiled matcher picks the same rule as checking every rule in priority order"""
+
+    def setUp(self):
+        super().setUp()
+        self.rules = [
+            ('CONTAINS', 'shop', None, None, '', 50),
+            ('CONTAINS', 'shopping', None, None, '', 40),
+            ('CONTAINS', 'hop', None, 20, '', 60),
+            ('CONTAINS', 'coffee shop', None, None, 'EXPENSE', 10),
+            ('CONTAINS', 'pp', 100, None, '', 30),
+            ('REGEX', r'^amzn\b', None, None, '', 20),
+            ('REGEX', r'\d{4}', None, None, 'INCOME', 5),
+            ('AMOUNT', '', 1000, None, 'INCOME', 70),
+            ('CONTAINS', 'shop', None, None, '', 50),  # same priority: the lower id wins
+        ]
+        for index, (match_type, pattern, min_amount, max_amount, transaction_type, priority) in enumerate(self.rules):
+            category = Category.objects.create(household=self.household, name=f'Rule {index}')
+            CategorizationRule.objects.create(
+                household=self.household, category=category, match_type=match_type, pattern=pattern,
+                min_amount=min_amount, max_amount=max_amount, transaction_type=transaction_type, priority=priority,
+            )
+
+    def naive_match(self, rules, description, amount, transaction_type):
+        for rule in rules:
+            if rule.transaction_type and rule.transaction_type != transaction_type:
+                continue
+            if rule.min_amount is not None and amount < rule.min_amount:
+                continue
+            if rule.max_amount is not None and amount > rule.max_amount:
+                continue
+            if rule.match_type == 'CONTAINS' and rule.pattern.lower() not in description.lower():
+                continue
+            if rule.match_type == 'REGEX' and not re.search(rule.pattern, description, re.IGNORECASE):
+                continue
+            return rule.category_id
+        return None
+
+    def test_matches_naive_evaluation(self):
+        rules = list(CategorizationRule.objects.filter(household=self.household).order_by('priority', 'id'))
+        ruleset = CompiledRuleSet(rules)
+        words = ['', 'Shop', 'shopping', 'COFFEE SHOP', 'hop', 'chopper', 'AMZN Mktp', 'amznfresh', 'ref 2024', 'apple']
+        descriptions = {' '.join(pair).strip() for pair in itertools.product(words, repeat=2)}
+        for description in sorted(descriptions):
+            for amount in (Decimal('5'), Decimal('20'), Decimal('150'), Decimal('1500')):
+                for transaction_type in ('INCOME', 'EXPENSE'):
+                    self.assertEqual(
+                        ruleset.match(description, amount, transaction_type),
+                        self.naive_match(rules, description, amount, transaction_type),
+                        (description, amount, transaction_type),
+                    )
+
+    def test_rejects_backtracking_patterns(self):
+        category = Category.objects.create(household=self.household, name='Groceries')
+        for pattern in (r'(a+)+b', r'(\w+\s?)*$', r'(foo|bar)+', r'(a)\1', 'x' * 101, '('):
+            response = self.client.post('/api/categorization-rules/', {
+                'category': category.id, 'match_type': 'REGEX', 'pattern': pattern,
+            })
+            self.assertEqual(response.status_code, 400, pattern)
+            self.assertIn('pattern', response.json())
+        response = self.client.post('/api/categorization-rules/', {
+            'category': category.id, 'match_type': 'REGEX', 'pattern': r'^card \d{4} .*market',
+        })
+        self.assertEqual(response.status_code, 201)
+
+        # A pattern stored before validation existed is left out of the compiled rules
+        CategorizationRule.objects.create(household=self.household, category=category, match_type='REGEX',
+                                          pattern=r'(a+)+b', priority=1)
+        self.assertNotEqual(get_ruleset(self.household).match('a' * 40, Decimal('5'), 'EXPENSE'), category.id)
+
+    def test_recompiles_after_rule_change(self):
+        ruleset = get_ruleset(self.household)
+        self.assertIs(get_ruleset(self.household), ruleset)
+        CategorizationRule.objects.filter(household=self.household, pattern='shopping').update(is_active=False)
+        self.assertIsNot(get_ruleset(self.household), ruleset)
+        self.assertEqual(len(get_ruleset(self.household)), len(self.rules) - 1)
+
+
+    def test_ruleset_cache_is_bounded(self):
+        others = [Household.objects.create(name=f'Other {number}') for number in range(3)]
+        with mock.patch('finance.categorization.RULESET_CACHE_SIZE', 2), \
+                mock.patch.dict('finance.categorization._ruleset_cache', clear=True):
+            ruleset = get_ruleset(self.household)
+            for household in others[:1]:
+                get_ruleset(household)
+            self.assertIs(get_ruleset(self.household), ruleset)  # now the most recently used
+            for household in others[1:]:
+                get_ruleset(household)
+            self.assertEqual(list(categorization._ruleset_cache), [others[1].id, others[2].id])
+            self.assertIsNot(get_ruleset(self.household), ruleset)
+
+class ReconciliationCacheTests(HouseholdAPITestCase):
+    """Cached month totals always match the transactions that were committed"""
+
+    def setUp(self):
+        super().setUp()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragments'},
+                'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+            },
+            RECONCILIATION_CACHE='shared',
+        ))
+        self.groceries = Category.objects.create(household=self.household, name='Groceries')
+        self.shop = Transaction.objects.create(
+            household=self.household, category=self.groceries, amount=50, date=date(2024, 3, 5)
+        )
+
+    def actual(self):
+        """Groceries' actual for March 2024 from the reconciliation, checked against a fresh aggregate"""
+        report = reconciliation.reconcile_month(self.household, 2024, 3)
+        fresh = Transaction.objects.filter(
+            category=self.groceries, date__year=2024, date__month=3
+        ).aggregate(
+            expenses=Sum('amount', filter=Q(type='EXPENSE')), income=Sum('amount', filter=Q(type='INCOME'))
+        )
+        actual = next(row['actual'] for row in report['rows'] if row['category_id'] == self.groceries.id)
+        self.assertEqual(actual, (fresh['expenses'] or 0) - (fresh['income'] or 0))
+        return actual
+
+    def test_edit(self):
+        self.assertEqual(self.actual(), 50)
+        self.assertIsNotNone(reconciliation.get_cache())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.amount = 80
+            self.shop.save()
+        self.assertEqual(self.actual(), 80)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.date = date(2024, 4, 1)
+            self.shop.save()
+        self.assertEqual(self.actual(), 0)
+
+    def test_delete(self):
+        self.assertEqual(self.actual(), 50)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.delete()
+        self.assertEqual(self.actual(), 0)
+
+    def test_rollback(self):
+        self.assertEqual(self.actual(), 50)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                Transaction.objects.create(household=self.household, category=self.groceries, amount=30,
+                                           date=date(2024, 3, 9))
+                self.shop.amount = 5
+                self.shop.save()
+                raise ValueError('import failed')
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.actual(), 50)
+
+    def test_local_memory_cache_is_not_used(self):
+        with override_settings(RECONCILIATION_CACHE='default'):
+            self.assertIsNone(reconciliation.get_cache())
+            self.assertEqual(self.actual(), 50)
+            self.shop.amount = 20
+            self.shop.save()
+            self.assertEqual(self.actual(), 20)
+
+
+class TransactionFilterTests(HouseholdAPITestCase):
+    """Search, filters and keyset pages of the transaction list page and API"""
+
+    def setUp(self):
+        super().setUp()
+        food = Category.objects.create(household=self.household, name='Food')
+        self.cafe = Category.objects.create(household=self.household, name='Cafe', parent=food)
+        self.food = food
+        rows = [
+            ('Coffee Bean Roasters', 4, date(2024, 1, 3), 'EXPENSE', self.cafe),
+            ('Bean counter coffee', 12, date(2024, 1, 9), 'EXPENSE', food),
+            ('Salary ACME', 3000, date(2024, 1, 25), 'INCOME', None),
+            ('Groceries', 85, date(2024, 2, 2), 'EXPENSE', food),
+            ('Coffee refund', 4, date(2024, 2, 2), 'INCOME', self.cafe),
+        ]
+        self.transactions = {
+            description: Transaction.objects.create(
+                household=self.household, description=description, amount=amount, date=day, type=kind, category=category
+            )
+            for description, amount, day, kind, category in rows
+        }
+
+    def matching(self, **params):
+        queryset = filter_transactions(Transaction.objects.filter(household=self.household), params)
+        return set(queryset.values_list('description', flat=True))
+
+    def test_filters(self):
+        self.assertEqual(self.matching(q='bean COFFEE'), {'Coffee Bean Roasters', 'Bean counter coffee'})
+        self.assertEqual(self.matching(type='income'), {'Salary ACME', 'Coffee refund'})
+        self.assertEqual(self.matching(start_date='2024-01-09', end_date='2024-01-25'),
+                         {'Bean counter coffee', 'Salary ACME'})
+        self.assertEqual(self.matching(min_amount='5', max_amount='100'), {'Bean counter coffee', 'Groceries'})
+        self.assertEqual(self.matching(category=str(self.food.id)), {'Bean counter coffee', 'Groceries'})
+        self.assertEqual(self.matching(category=str(self.food.id), include_children='true'),
+                         {'Coffee Bean Roasters', 'Bean counter coffee', 'Groceries', 'Coffee refund'})
+        self.assertEqual(self.matching(q='coffee', type='EXPENSE', category=str(self.cafe.id)), {'Coffee Bean Roasters'})
+        for params in ({'start_date': '2024-13-01'}, {'type': 'TRANSFER'}, {'min_amount': 'ten'}, {'category': 'x'}):
+            with self.assertRaises(TransactionFilterError):
+                self.matching(**params)
+
+    def test_keyset_pages(self):
+        queryset = Transaction.objects.filter(household=self.household)
+        expected = list(queryset.order_by('-date', '-id').values_list('id', flat=True))
+        seen, cursors, after = [], [], None
+        while True:
+            rows, prev_cursor, next_cursor = keyset_page(queryset, after=after, page_size=2)
+            seen += [row.id for row in rows]
+            cursors.append(prev_cursor)
+            if next_cursor is None:
+                break
+            after = next_cursor
+        self.assertEqual(seen, expected)
+        # Walking back from the last page returns the one before it
+        rows, _, _ = keyset_page(queryset, before=cursors[-1], page_size=2)
+        self.assertEqual([row.id for row in rows], expected[2:4])
+
+    def test_page_and_api(self):
+        response = self.client.get('/transactions/', {'q': 'coffee', 'type': 'EXPENSE'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({t.description for t in response.context['transactions']},
+                         {'Coffee Bean Roasters', 'Bean counter coffee'})
+        response = self.client.get('/transactions/', {'min_amount': 'ten'})
+        self.assertEqual(response.context['transactions'], [])
+        self.assertIn('Invalid value', response.context['error_message'])
+
+        response = self.client.get('/api/transactions/', {'category': self.food.id, 'include_children': 'true',
+                                                          'type': 'INCOME'})
+        self.assertEqual([row['description'] for row in response.json()['results']], ['Coffee refund'])
+        response = self.client.get('/api/transactions/', {'end_date': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_date', response.json())
+
+
+class QueryInstrumentationTests(HouseholdAPITestCase):
+    """Per-request query counts, the Server-Timing header and per-view budgets"""
+
+    def setUp(self):
+        super().setUp()
+        Category.objects.create(household=self.household, name='Rent')
+        query_stats.reset()
+        self.addCleanup(query_stats.reset)
+
+    def test_records_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/categories/')
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        [row] = [row for row in query_stats.snapshot() if row['view_name'] == 'category-list']
+        self.assertEqual((row['requests'], row['max_queries'], row['over_budget']), (1, len(queries), 0))
+        self.assertTrue(row['slowest'])
+        self.assertLessEqual(len(row['slowest']), 5)
+
+    def test_over_budget(self):
+        with override_settings(QUERY_BUDGETS={'category-list': 1}):
+            with self.assertLogs('finance.queries', 'WARNING') as logs:
+                self.client.get('/api/categories/')
+            [row] = [row for row in query_stats.snapshot() if row['view_name'] == 'category-list']
+        self.assertIn('category-list issued', logs.output[0])
+        self.assertEqual((row['budget'], row['over_budget']), (1, 1))
+
+
+class MetricsForkTests(SimpleTestCase):
+    """A forked worker reports what it recorded itself, from its first observation on"""
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_fork(self):
+        registry = Registry()
+        requests = Counter('test_requests_total', 'Requests', ['status'], registry=registry)
+        requests.inc(7, status=200)  # the parent's traffic, e.g. before gunicorn forks a preloaded app
+
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_end)
+                for _ in range(50):
+                    requests.inc(status=200)
+                os.write(write_end, registry.render().encode())
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as pipe:
+            output = pipe.read()
+        os.waitpid(pid, 0)
+
+        self.assertIn('test_requests_total{status="200"} 50\n', output)
+        self.assertEqual(registry.snapshot(), {'test_requests_total': {('200',): 7}})
+
+
+class MetricsFlushTests(SimpleTestCase):
+    """Values held back by the flush interval still reach the worker's file without more traffic"""
+
+    def test_throttled_changes_are_written(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(METRICS_MULTIPROC_DIR=directory, METRICS_FLUSH_INTERVAL=0.05))
+        registry = Registry()
+        requests = Counter('test_requests_total', 'Requests', ['status'], registry=registry)
+
+        def written():
+            with open(registry._file) as f:
+                return json.load(f)['test_requests_total']
+
+        requests.inc(status=200)
+        registry.flush()
+        requests.inc(status=200)
+        registry.flush()  # within the interval: only schedules a write
+        self.assertEqual(written(), [[['200'], 1]])
+        registry._flush_timer.join(5)
+        self.assertEqual(written(), [[['200'], 2]])
+
+        registry.flush()
+        requests.inc(status=500)
+        registry._flush_timer.cancel()  # the worker exits before its timer fires
+        registry._flush_at_exit()
+        self.assertEqual(written(), [[['200'], 2], [['500'], 1]])
+
+
+class ProfilingTests(HouseholdAPITestCase):
+    """Requests with a superuser's token, or slower than the threshold, leave a profile with their SQL"""
+
+    def setUp(self):
+        super().setUp()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(PROFILING_DIR=directory, PROFILING_SLOW_REQUEST_MS=None))
+        self.admin = User.objects.create(email='admin@example.com', is_superuser=True, is_staff=True)
+        Category.objects.create(household=self.household, name='Rent')
+
+    def test_token(self):
+        token = profiling.make_token(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/categories/', {'_profile': token})
+        profile = profiling.load_profile(response['X-Profile-Id'])
+        self.assertEqual((profile['trigger'], profile['view_name'], profile['path']), ('token', 'category-list', '/api/categories/'))
+        # Everything after the token check (one query) is recorded, without parameters
+        self.assertEqual(profile['query_count'], len(queries) - 1)
+        self.assertEqual(len(profile['queries']), profile['query_count'])
+        self.assertNotIn(self.user.email, json.dumps(profile['queries']))
+        self.assertTrue(profiling.profile_summary(profile))
+        self.assertEqual([p['name'] for p in profiling.list_profiles()], [profile['name']])
+
+    def test_invalid_tokens(self):
+        for token in ('forged', profiling.make_token(self.user)):  # only superusers may profile
+            response = self.client.get('/api/categories/', HTTP_X_PROFILE=token)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_slow_request(self):
+        # Every request counts as slow
+        with mock.patch('finance.profiling.slow_request_threshold', return_value=0.0):
+            response = self.client.get('/api/categories/')
+        profile = profiling.load_profile(response['X-Profile-Id'])
+        self.assertEqual((profile['trigger'], profile['mode']), ('slow', 'sampling'))
+        self.assertGreater(profile['query_count'], 0)
+
+
+class DataVersionTests(HouseholdAPITestCase):
+    """Every kind of write bumps the household's data version once per transaction"""
+
+    def setUp(self):
+        super().setUp()
+        self.rent = Category.objects.create(household=self.household, name='Rent')
+        self.budget = Budget.objects.create(category=self.rent, amount=900, start_date=date(2024, 3, 1),
+                                            end_date=date(2024, 3, 31))
+
+    def version(self):
+        self.household.refresh_from_db(fields=['data_version'])
+        return self.household.data_version
+
+    def assertBumps(self, write):
+        before = self.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertEqual(self.version(), before + 1)
+
+    def test_writes(self):
+        def save():
+            self.rent.name = 'Housing'
+            self.rent.save()
+
+        self.assertBumps(save)
+        self.assertBumps(lambda: Budget.objects.filter(category=self.rent).update(amount=950))
+        self.assertBumps(lambda: Transaction.objects.bulk_create([
+            Transaction(household=self.household, amount=5, date=date(2024, 3, 2)) for _ in range(3)
+        ]))
+        self.assertBumps(lambda: Transaction.objects.filter(household=self.household).delete())
+        self.assertBumps(self.budget.delete)
+
+    def test_one_bump_per_transaction(self):
+        def several():
+            with transaction.atomic():
+                Category.objects.create(household=self.household, name='Water')
+                Budget.objects.filter(pk=self.budget.pk).update(is_paid=True)
+                CategoryNote.objects.create(category=self.rent, note='Due on the 1st')
+
+        self.assertBumps(several)
+
+    def test_sliced_querysets(self):
+        # Django's own error, not one from looking up the affected households
+        with self.assertRaisesMessage(TypeError, 'Cannot update a query once a slice has been taken.'):
+            Category.objects.all()[:1].update(name='x')
+        with self.assertRaisesMessage(TypeError, "Cannot use 'limit' or 'offset' with delete()."):
+            Category.objects.all()[:1].delete()
+
+    def test_not_modified_without_budget_queries(self):
+        url = '/api/dashboard/?year=2024&month=3'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(4), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries if 'finance_budget' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.budget.amount = 1000
+            self.budget.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FragmentCacheTests(HouseholdAPITestCase):
+    """Cached dashboard and yearly grid fragments are served until the data version changes"""
+
+    def setUp(self):
+        super().setUp()
+        caches['fragments'].clear()
+        self.rent = Category.objects.create(household=self.household, name='Rent')
+        self.budget = Budget.objects.create(category=self.rent, amount=Decimal('912.34'),
+                                            start_date=date(2024, 3, 1), end_date=date(2024, 3, 31))
+        session = self.client.session
+        session['active_date'] = '2024-03-01'
+        session.save()
+
+    def assertFollowsDataVersion(self, url, shown):
+        self.assertContains(self.client.get(url), shown.format('912.34'))
+
+        # Same data version: the cached fragment is served, even though the budget changed underneath
+        Budget.objects.filter(pk=self.budget.pk).update(amount=Decimal('987.65'))
+        response = self.client.get(url)
+        self.assertContains(response, shown.format('912.34'))
+        self.assertNotContains(response, shown.format('987.65'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.budget.amount = Decimal('876.54')
+            self.budget.save()
+        response = self.client.get(url)
+        self.assertContains(response, shown.format('876.54'))
+        self.assertNotContains(response, shown.format('912.34'))
+
+    def test_yearly_grid(self):
+        self.assertFollowsDataVersion(reverse('yearly_budget_year', args=[2024]) + '?month=3', 'data-amount="{}"')
+
+    def test_dashboard(self):
+        self.assertFollowsDataVersion(reverse('dashboard'), 'R {}')
+
+    def test_cached_dashboard_skips_summary_queries(self):
+        url = reverse('dashboard')
+        with CaptureQueriesContext(connection) as uncached:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as cached:
+            self.assertContains(self.client.get(url), 'R 912.34')
+        self.assertTrue([query for query in uncached if 'finance_budget' in query['sql']])
+        self.assertFalse([query for query in cached if 'finance_budget' in query['sql']])
+
+
+class AdminListingTests(HouseholdAPITestCase):
+    """Admin user and household listings: subquery counts match the per-row counts they replaced"""
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_superuser = True
+        self.user.save()
+        for number in range(1, 4):
+            household = Household.objects.create(name=f'Tenant {number}')
+            for member in range(number):
+                household.members.add(User.objects.create(email=f'member{number}-{member}@example.com'))
+            household.members.add(self.user)
+            for name in range(number + 1):
+                category = Category.objects.create(household=household, name=f'Category {name}')
+                for month in range(1, number + 2):
+                    Budget.objects.create(category=category, amount=10, start_date=date(2024, month, 1),
+                                          end_date=date(2024, month, 28))
+
+    def listing(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['page_obj'])
+
+    def test_household_counts(self):
+        households = self.listing('admin_households')
+        self.assertEqual(len(households), Household.objects.count())
+        old = Household.objects.annotate(
+            member_count=Count('members', distinct=True),
+            category_count=Count('categories', distinct=True),
+        )
+        for household in old:
+            household.budget_count = Budget.objects.filter(category__household=household).count()
+        expected = {h.pk: (h.member_count, h.category_count, h.budget_count) for h in old}
+        self.assertEqual({h.pk: (h.member_count, h.category_count, h.budget_count) for h in households}, expected)
+
+    def test_user_counts(self):
+        users = self.listing('admin_users')
+        self.assertEqual({user.pk: user.household_count for user in users},
+                         {user.pk: user.households.count() for user in User.objects.all()})
+
+    def test_search_and_sort(self):
+        self.assertEqual([h.name for h in self.listing('admin_households', q='member2-1')], ['Tenant 2'])
+        self.assertEqual([h.name for h in self.listing('admin_households', sort='-budgets')][:3],
+                         ['Tenant 3', 'Tenant 2', 'Tenant 1'])
+        self.assertEqual({u.email for u in self.listing('admin_users', q='tenant 1')},
+                         {'owner@example.com', 'member1-0@example.com'})
+        # Unknown sort keys fall back to the default instead of reaching order_by()
+        self.assertEqual(len(self.listing('admin_users', sort='password')), User.objects.count())
+
+    def test_queries_do_not_grow_with_rows(self):
+        url = reverse('admin_households')
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for number in range(10):
+            household = Household.objects.create(name=f'Extra {number}')
+            household.members.add(self.user)
+            Category.objects.create(household=household, name='Extra')
+        with self.assertNumQueries(len(before)):
+            self.client.get(url)
+
+
+class StatisticsTests(HouseholdAPITestCase):
+    """Admin dashboard statistics: same figures as the direct COUNT(*) queries, cached and snapshotted"""
+
+    def setUp(self):
+        super().setUp()
+        cache.delete(statistics.CACHE_KEY)
+        self.user.is_superuser = True
+        self.user.save()
+        User.objects.create(email='old@example.com', date_joined=timezone.now() - timedelta(days=30))
+        for number in range(1, 7):
+            household = Household.objects.create(name=f'Tenant {number}')
+            for member in range(number):
+                household.members.add(User.objects.create(email=f'member{number}-{member}@example.com'))
+            category = Category.objects.create(household=household, name='Rent')
+            Budget.objects.create(category=category, amount=10, start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        Transaction.objects.create(household=self.household, amount=5, date=date(2024, 1, 2))
+
+    def test_matches_direct_counts(self):
+        stats = statistics.collect()
+        self.assertEqual(stats['counts'], {
+            'users': User.objects.count(),
+            'households': Household.objects.count(),
+            'categories': Category.objects.count(),
+            'budgets': Budget.objects.count(),
+            'transactions': Transaction.objects.count(),
+        })
+        self.assertFalse(stats['estimated'])
+        self.assertEqual(stats['recent_users'],
+                         User.objects.filter(date_joined__gte=timezone.now() - timedelta(days=7)).count())
+        old_top = Household.objects.annotate(member_count=Count('members')).order_by('-member_count')[:5]
+        self.assertEqual([(h['id'], h['name'], h['member_count']) for h in stats['top_households']],
+                         [(h.id, h.name, h.member_count) for h in old_top])
+
+    def test_dashboard(self):
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_users'], User.objects.count())
+        self.assertEqual(response.context['total_budgets'], Budget.objects.count())
+        self.assertEqual(response.context['households_with_members'][0]['name'], 'Tenant 6')
+
+    def test_cached_until_stale(self):
+        first = statistics.get_statistics()
+        Category.objects.create(household=self.household, name='Water')
+        with mock.patch.object(statistics, '_refresh_in_background') as refresh:
+            self.assertEqual(statistics.get_statistics(), first)
+            refresh.assert_not_called()
+            with override_settings(STATISTICS_CACHE_TTL=0):
+                self.assertEqual(statistics.get_statistics()['counts'], first['counts'])
+            refresh.assert_called_once()
+        self.assertEqual(statistics.refresh()['counts']['categories'], first['counts']['categories'] + 1)
+
+    def test_snapshots_and_growth(self):
+        statistics.refresh()
+        statistics.refresh()
+        self.assertEqual(StatisticsSnapshot.objects.count(), 1)
+        StatisticsSnapshot.objects.update(recorded_at=timezone.now() - timedelta(days=2))
+
+        Category.objects.create(household=self.household, name='Water')
+        Category.objects.create(household=self.household, name='Power')
+        statistics.refresh()
+        self.assertEqual(StatisticsSnapshot.objects.count(), 2)
+
+        rows = {row['name']: row for row in statistics.growth(days=30)['rows']}
+        self.assertEqual(rows['categories']['change'], 2)
+        self.assertEqual(rows['categories']['per_day'], 1.0)
+        self.assertEqual(rows['users']['change'], 0)
+
+
+class ListEndpointQueryCountTests(HouseholdAPITestCase):
+    """
+    Every API list endpoint must run a fixed number of queries however many rows it returns:
+    counts come from annotations and related rows from select_related/prefetch_related.
+    """
+
+    # Upper bound per list request: session, user, household lookup and membership check,
+    # pagination COUNT, the page itself and a couple of prefetches
+    MAX_QUERIES = 8
+
+    def add_rows(self, count):
+        """`count` more rows of every listed model, each with its related rows"""
+        start = Category.objects.count()
+        parents = Category.objects.bulk_create(
+            Category(household=self.household, name=f'Parent {start + i}') for i in range(count)
+        )
+        children = Category.objects.bulk_create(
+            Category(household=self.household, name=f'Child {start + i}', parent=parent)
+            for i, parent in enumerate(parents)
+        )
+        Budget.objects.bulk_create(
+            Budget(category=child, amount=10, start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+            for child in children
+        )
+        Transaction.objects.bulk_create(
+            Transaction(household=self.household, category=child, amount=5, date=date(2024, 1, 15))
+            for child in children
+        )
+        CategoryNote.objects.bulk_create(
+            CategoryNote(category=child, author=self.user, note='note') for child in children
+        )
+        CategorizationRule.objects.bulk_create(
+            CategorizationRule(household=self.household, category=child, pattern=f'shop {i}')
+            for i, child in enumerate(children)
+        )
+        for i in range(count):
+            template = BudgetTemplate.objects.create(name=f'Template {start + i}', created_by=self.user)
+            parent = TemplateCategory.objects.create(template=template, name='Housing')
+            TemplateCategory.objects.create(template=template, name='Rent', parent=parent)
+        for i in range(count):
+            household = Household.objects.create(name=f'Shared {start + i}')
+            household.members.add(self.user, User.objects.create(email=f'member{start + i}@example.com'))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries), response.json()
+
+    def assert_constant_queries(self, url):
+        self.add_rows(3)
+        few, _ = self.count_queries(url)
+        self.add_rows(30)
+        many, data = self.count_queries(url)
+        self.assertGreater(len(data['results']), 30, url)
+        self.assertEqual(few, many, f'{url} runs queries per row ({few} for 3 rows, {many} for 33)')
+        self.assertLessEqual(many, self.MAX_QUERIES, url)
+
+    def test_households(self):
+        self.assert_constant_queries('/api/households/')
+
+    def test_categories(self):
+        self.assert_constant_queries('/api/categories/')
+
+    def test_budgets(self):
+        self.assert_constant_queries('/api/budgets/?year=2024')
+
+    def test_transactions(self):
+        self.assert_constant_queries('/api/transactions/')
+
+    def test_categorization_rules(self):
+        self.assert_constant_queries('/api/categorization-rules/')
+
+    def test_category_notes(self):
+        self.assert_constant_queries('/api/category-notes/')
+
+    def test_templates(self):
+        self.assert_constant_queries('/api/templates/')
+
+    def test_category_detail_uses_annotated_counts(self):
+        self.add_rows(1)
+        parent = Category.objects.get(name='Parent 0')
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(f'/api/categories/{parent.id}/').json()
+        self.assertEqual(data['children_count'], 1)
+        self.assertEqual(data['notes_count'], 0)
+        self.assertLessEqual(len(queries), self.MAX_QUERIES)
+
+    def test_500_categories(self):
+        Category.objects.bulk_create(
+            Category(household=self.household, name=f'Category {i}') for i in range(500)
+        )
+        queries, data = self.count_queries('/api/categories/')
+        self.assertEqual(data['count'], 500)
+        self.assertLessEqual(queries, self.MAX_QUERIES)
+
+
+class ValuesSerializerTests(HouseholdAPITestCase):
+    """The values() fast path must return exactly what the model serializers return"""
+
+    def setUp(self):
+        super().setUp()
+        parent = Category.objects.create(household=self.household, name='Housing')
+        rent = Category.objects.create(
+            household=self.household, name='Rent', parent=parent, payment_type='MANUAL', is_essential=True
+        )
+        salary = Category.objects.create(household=self.household, name='Salary', type='INCOME')
+        Budget.objects.create(category=rent, amount='1234.5', start_date=date(2024, 1, 1),
+                              end_date=date(2024, 1, 31), is_paid=True)
+        Budget.objects.create(category=salary, amount=3000, start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        Transaction.objects.create(household=self.household, category=rent, amount='-0.10',
+                                   date=date(2024, 1, 3), description='Rent January')
+        Transaction.objects.create(household=self.household, amount=99, date=date(2024, 1, 4), type='INCOME')
+
+    def assert_same_json(self, url):
+        fast = self.client.get(url).json()
+        with override_settings(API_VALUES_SERIALIZERS=False):
+            slow = self.client.get(url).json()
+        self.assertTrue(slow['results'], url)
+        self.assertEqual(fast, slow, url)
+
+    def test_categories(self):
+        self.assert_same_json('/api/categories/')
+
+    def test_budgets(self):
+        self.assert_same_json('/api/budgets/?year=2024')
+
+    def test_transactions(self):
+        self.assert_same_json('/api/transactions/')
+
+
+class SparseFieldsetTests(HouseholdAPITestCase):
+    """fields=/exclude= narrow both the response and the SQL"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(household=self.household, name='Rent')
+        Budget.objects.create(category=category, amount=500, start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        Transaction.objects.create(household=self.household, category=category, amount=5, date=date(2024, 1, 2))
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_select_columns_and_skip_joins(self):
+        for fast in (True, False):
+            with override_settings(API_VALUES_SERIALIZERS=fast):
+                response, sql = self.get('/api/budgets/?year=2024&fields=id,amount,is_paid')
+            budget = Budget.objects.get()
+            self.assertEqual(response.json()['results'], [{'id': budget.id, 'amount': '500.00', 'is_paid': False}])
+            selected_columns = sql[-1].split(' FROM ')[0]
+            self.assertNotIn('start_date', selected_columns)
+            self.assertNotIn('finance_category', selected_columns)
+
+    def test_exclude_on_detail(self):
+        transaction = Transaction.objects.get()
+        response, _ = self.get(f'/api/transactions/{transaction.id}/?exclude=created_at,updated_at,household_name')
+        self.assertEqual(set(response.json()), {'id', 'household', 'amount', 'date', 'description', 'category', 'category_name', 'type'})
+
+    def test_unknown_field_is_rejected(self):
+        response, _ = self.get('/api/categories/?fields=id,colour')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('colour', response.json()['fields'])
+
+    def test_dashboard_only_computes_selected_fields(self):
+        response, narrow = self.get('/api/dashboard/?year=2024&month=1&fields=total_expenses')
+        self.assertEqual(response.json(), {'total_expenses': 500.0})
+        _, full = self.get('/api/dashboard/?year=2024&month=1')
+        self.assertLess(len(narrow), len(full))
+
+
+class SyncTests(HouseholdAPITestCase):
+    """/api/sync/ returns every row once, then only what changed or was deleted"""
+
+    def setUp(self):
+        super().setUp()
+        self.rent = Category.objects.create(household=self.household, name='Rent')
+        self.budget = Budget.objects.create(category=self.rent, amount=500, start_date=date(2024, 1, 1),
+                                            end_date=date(2024, 1, 31))
+        self.transaction = Transaction.objects.create(household=self.household, category=self.rent, amount=5,
+                                                      date=date(2024, 1, 2))
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def updated_ids(self, data, name):
+        return [row['id'] for row in data['changes'][name]['updated']]
+
+    def test_full_then_incremental(self):
+        first = self.sync()
+        self.assertTrue(first['full'])
+        self.assertFalse(first['has_more'])
+        self.assertEqual(self.updated_ids(first, 'budgets'), [self.budget.id])
+        self.assertEqual(first['changes']['categories']['updated'][0]['name'], 'Rent')
+
+        Budget.objects.filter(pk=self.budget.pk).update(is_paid=True)
+        second = self.sync(first['cursor'])
+        self.assertFalse(second['full'])
+        self.assertEqual(second['changes']['budgets']['updated'][0]['is_paid'], True)
+
+    def test_deletions_leave_tombstones(self):
+        cursor = self.sync()['cursor']
+        rent_id, budget_id = self.rent.id, self.budget.id
+        self.rent.delete()
+        data = self.sync(cursor)
+        self.assertEqual(data['changes']['categories']['deleted'], [rent_id])
+        self.assertEqual(data['changes']['budgets']['deleted'], [budget_id])
+        # The transaction outlives its category and comes back uncategorized
+        self.assertEqual(data['changes']['transactions']['updated'][0]['category'], None)
+
+    def test_pages_resume_where_they_stopped(self):
+        Transaction.objects.bulk_create(
+            Transaction(household=self.household, amount=i, date=date(2024, 2, 1)) for i in range(6)
+        )
+        seen, cursor = [], None
+        while True:
+            data = self.sync(cursor, limit=3)
+            rows = sum(len(change['updated']) for change in data['changes'].values())
+            self.assertLessEqual(rows, 3)
+            seen += self.updated_ids(data, 'transactions')
+            cursor = data['cursor']
+            if not data['has_more']:
+                break
+        self.assertCountEqual(seen, Transaction.objects.values_list('id', flat=True))
+
+    def test_other_households_cursor_is_rejected(self):
+        other = Household.objects.create(name='Other')
+        cursor = sync.encode_cursor({'household': other.id, 'since': None})
+        response = self.client.get('/api/sync/', {'since': cursor})
+        self.assertEqual(response.status_code, 400)
+
+
+class LiveEventsTests(HouseholdAPITestCase):
+    """Budget and category saves reach the household's /api/events/ streams"""
+
+    def setUp(self):
+        super().setUp()
+        self.rent = Category.objects.create(household=self.household, name='Rent', payment_type='MANUAL')
+        self.budget = Budget.objects.create(category=self.rent, amount=500, start_date=date(2024, 3, 1),
+                                            end_date=date(2024, 3, 31))
+
+    def test_unknown_bus_fails_at_startup(self):
+        for name in ('local', 'postgres', ''):
+            with override_settings(LIVE_EVENTS_BUS=name):
+                events.check_bus_setting()
+        with override_settings(LIVE_EVENTS_BUS='postgresql'):
+            with self.assertRaisesMessage(ImproperlyConfigured, "Unknown LIVE_EVENTS_BUS 'postgresql'"):
+                events.check_bus_setting()
+
+    def save_committed(self, instance, **changes):
+        for name, value in changes.items():
+            setattr(instance, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+
+    async def next_event(self, stream):
+        message = await asyncio.wait_for(anext(stream), 5)
+        name, data = message.decode().strip().split('\n')[-2:]
+        return name.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+    async def test_stream_relays_cell_and_payment_changes(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        name, ready = await self.next_event(stream)
+        self.assertEqual((name, ready['household']), ('ready', self.household.id))
+
+        budget = await Budget.objects.aget(pk=self.budget.pk)
+        await sync_to_async(self.save_committed)(budget, amount=Decimal('650.00'))
+        name, event = await self.next_event(stream)
+        self.assertEqual(name, 'budget')
+        self.assertEqual((event['budget'], event['month'], event['amount']), (budget.id, 3, '650.00'))
+
+        await sync_to_async(self.save_committed)(budget, is_paid=True)
+        name, event = await self.next_event(stream)
+        self.assertEqual((name, event['is_paid']), ('payment', True))
+        self.assertNotIn('amount', event)
+        # The server drops the response when the client leaves, which closes the subscription
+        await stream.aclose()
+        del stream, response
+        gc.collect()
+        await asyncio.sleep(0.01)
+        self.assertEqual(events.get_bus().subscriber_count(), 0)
+
+    async def test_other_households_changes_are_not_sent(self):
+        other = await Household.objects.acreate(name='Other')
+        bus = events.get_bus()
+        subscription = bus.subscribe(self.household.id)
+        try:
+            await sync_to_async(bus.publish)(other.id, {'type': 'reload'})
+            await sync_to_async(bus.publish)(self.household.id, {'type': 'category', 'category': 1})
+            self.assertEqual(await subscription.get(timeout=5), {'type': 'category', 'category': 1})
+            self.assertIsNone(await subscription.get(timeout=0.05))
+        finally:
+            subscription.close()
+
+    def test_bulk_changes_send_a_reload(self):
+        published = []
+        with mock.patch.object(events, 'publish', side_effect=lambda *args: published.append(args)):
+            Budget.objects.filter(category=self.rent).update(is_paid=True)
+        self.assertEqual(published, [(self.household.id, {'type': 'reload'})])
+
+
+# The API as API_ASYNC_VIEWS=True routes it, for AsyncSummaryViewTests
+urlpatterns = [
+    path('api/dashboard/', async_api_views.dashboard_data),
+    path('api/yearly-budget/<int:year>/', async_api_views.yearly_budget_data),
+    path('api/outstanding-payments/<int:year>/<int:month>/', async_api_views.outstanding_payments_data),
+]
+
+
+@override_settings(API_ASYNC_PARALLEL_QUERIES=False)  # pool threads can't see the test's transaction
+class AsyncSummaryViewTests(HouseholdAPITestCase):
+    """The async dashboard, yearly budget and outstanding payments views answer like the DRF ones"""
+
+    def setUp(self):
+        super().setUp()
+        housing = Category.objects.create(household=self.household, name='Housing')
+        for name, amount in (('Rent', 900), ('Water', 40)):
+            child = Category.objects.create(household=self.household, name=name, parent=housing)
+            Budget.objects.create(category=child, amount=amount, start_date=date(2024, 3, 1), end_date=date(2024, 3, 31))
+        salary = Category.objects.create(household=self.household, name='Salary', type='INCOME')
+        Budget.objects.create(category=salary, amount=3000, start_date=date(2024, 3, 1), end_date=date(2024, 3, 31),
+                              is_paid=True)
+
+    def get_async(self, url, **headers):
+        with override_settings(ROOT_URLCONF=__name__):
+            return self.client.get(url, **headers)
+
+    def test_same_json(self):
+        for url in ('/api/dashboard/?year=2024&month=3', '/api/dashboard/?year=2024&month=3&fields=balance',
+                    '/api/yearly-budget/2024/?month=3', '/api/outstanding-payments/2024/3/'):
+            expected = self.client.get(url)
+            response = self.get_async(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.content, expected.content, url)
+            self.assertEqual(response['ETag'], expected['ETag'], url)
+
+    def test_not_modified(self):
+        etag = self.get_async('/api/yearly-budget/2024/')['ETag']
+        response = self.get_async('/api/yearly-budget/2024/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_errors(self):
+        response = self.get_async('/api/dashboard/?fields=colour')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('colour', response.json()['fields'])
+        self.client.logout()
+        self.assertEqual(self.get_async('/api/dashboard/').status_code, 403)
+
+
+@override_settings(EXPORT_MAX_CONCURRENCY=1, EXPORT_QUEUE_TIMEOUT=0)
+class ExportConcurrencyTests(SimpleTestCase):
+    """Exports beyond EXPORT_MAX_CONCURRENCY are turned away; other requests never wait"""
+
+    def test_limit(self):
+        factory = RequestFactory()
+        responses = {}
+
+        def view(request):
+            if request.path == '/export/yearly/2024/':
+                # Requests arriving while this export holds the only slot
+                for url in ('/api/export/transactions/', '/export/category-setup/', '/api/dashboard/'):
+                    responses[url] = middleware(factory.get(url))
+            return HttpResponse('ok')
+
+        middleware = ExportConcurrencyMiddleware(view)
+        self.assertEqual(middleware(factory.get('/export/yearly/2024/')).status_code, 200)
+        self.assertEqual(responses['/api/export/transactions/'].status_code, 503)
+        self.assertIn('detail', json.loads(responses['/api/export/transactions/'].content))
+        self.assertEqual(responses['/export/category-setup/'].status_code, 503)
+        self.assertEqual(responses['/export/category-setup/']['Retry-After'], '1')
+        self.assertEqual(responses['/api/dashboard/'].status_code, 200)
+        # The slot is free again
+        self.assertEqual(middleware(factory.get('/api/export/transactions/')).status_code, 200)
+
+
+class GunicornConfigTests(SimpleTestCase):
+    """The asgi profile never spreads live event streams over workers that cannot reach each other"""
+
+    def load(self, **environ):
+        environ.setdefault('GUNICORN_PROFILE', 'asgi')
+        with mock.patch.dict(os.environ, environ):
+            for name in ('DATABASE_URL', 'LIVE_EVENTS_BUS', 'API_ASYNC_VIEWS'):
+                if name not in environ:
+                    os.environ.pop(name, None)
+            config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+            return config, os.environ.get('LIVE_EVENTS_BUS')
+
+    def start(self, config, workers, bus):
+        server = mock.Mock()
+        server.cfg.workers = workers
+        with mock.patch.dict(os.environ, {'LIVE_EVENTS_BUS': bus}):
+            config['on_starting'](server)
+        return server.log.warning
+
+    def test_postgres_bus_by_default(self):
+        _, bus = self.load(DATABASE_URL='postgres://app@db/finance')
+        self.assertEqual(bus, 'postgres')
+        _, bus = self.load(DATABASE_URL='postgres://app@db/finance', LIVE_EVENTS_BUS='')
+        self.assertEqual(bus, '')
+        _, bus = self.load(GUNICORN_PROFILE='gthread', DATABASE_URL='postgres://app@db/finance')
+        self.assertIsNone(bus)
+
+    def test_warns_about_local_bus_with_several_workers(self):
+        config, _ = self.load()
+        self.start(config, workers=2, bus='local').assert_called_once()
+        self.start(config, workers=1, bus='local').assert_not_called()
+        self.start(config, workers=2, bus='postgres').assert_not_called()
+        config, _ = self.load(GUNICORN_PROFILE='gthread')
+        self.start(config, workers=2, bus='local').assert_not_called()
@@ -0,0 +1,143 @@
+"""
+Transaction Filtering, Search and Keyset Pagination for Finance Flow
+Shared by the transaction list page and the Transaction API
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Transaction
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Must match the expression of the GIN index created in migration 0005
+POSTGRES_SEARCH_SQL = (
+    f"to_tsvector('english', \"{Transaction._meta.db_table}\".\"description\") "
+    "@@ websearch_to_tsquery('english', %s)"
+)
+
+
+class TransactionFilterError(ValueError):
+    """A malformed filter value; `field` names the offending query param"""
+
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+
+def _parse(params, name, parser):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return parser(value)
+    except (ValueError, ArithmeticError):
+        raise TransactionFilterError(name, f'Invalid value "{value}"')
+
+
+def filter_transactions(queryset, params):
+    """
+    Apply server-side filters from a query dict:
+    - start_date / end_date: inclusive ISO date range
+    - type: INCOME or EXPENSE
+    - category: category id; with include_children=true also matches its sub-categories
+    - min_amount / max_amount: inclusive amount range
+    - q: full-text search on description
+    """
+    start_date = _parse(params, 'start_date', date.fromisoformat)
+    end_date = _parse(params, 'end_date', date.fromisoformat)
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+
+    transaction_type = params.get('type')
+    if transaction_type:
+        transaction_type = transaction_type.upper()
+        if transaction_type not in dict(Transaction.TYPE_CHOICES):
+            raise TransactionFilterError('type', f'Invalid transaction type "{transaction_type}"')
+        queryset = queryset.filter(type=transaction_type)
+
+    category_id = _parse(params, 'category', int)
+    if category_id:
+        if str(params.get('include_children', '')).lower() in ('1', 'true', 'yes', 'on'):
+            queryset = queryset.filter(Q(category_id=category_id) | Q(category__parent_id=category_id))
+        else:
+            queryset = queryset.filter(category_id=category_id)
+
+    min_amount = _parse(params, 'min_amount', Decimal)
+    max_amount = _parse(params, 'max_amount', Decimal)
+    if min_amount is not None:
+        queryset = queryset.filter(amount__gte=min_amount)
+    if max_amount is not None:
+        queryset = queryset.filter(amount__lte=max_amount)
+
+    search = (params.get('q') or '').strip()
+    if search:
+        queryset = search_transactions(queryset, search)
+
+    return queryset
+
+
+def search_transactions(queryset, search):
+    """
+    Search descriptions.
+    On PostgreSQL this is full-text search served by the GIN index on to_tsvector(description).
+    Elsewhere (SQLite in development) every word must appear as a case-insensitive substring;
+    the household/date indexes bound the scan to one household.
+    """
+    if connection.vendor == 'postgresql':
+        return queryset.filter(RawSQL(POSTGRES_SEARCH_SQL, [search], output_field=BooleanField()))
+    for term in search.split():
+        queryset = queryset.filter(description__icontains=term)
+    return queryset
+
+
+def encode_cursor(transaction):
+    """Opaque position of a row in (date DESC, id DESC) order"""
+    return f'{transaction.date.isoformat()}_{transaction.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        date_str, id_str = cursor.split('_', 1)
+        return date.fromisoformat(date_str), int(id_str)
+    except ValueError:
+        raise TransactionFilterError('cursor', f'Invalid cursor "{cursor}"')
+
+
+def keyset_page(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of transactions, newest first, using keyset (seek) pagination.
+    Cost is independent of how deep the page is, unlike OFFSET.
+    Pass the `next_cursor` of a page as `after`, or its `prev_cursor` as `before`.
+    Returns (rows, prev_cursor, next_cursor); a cursor is None when there is no such page.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    if before:
+        before_date, before_id = decode_cursor(before)
+        rows = list(
+            queryset.filter(Q(date__gt=before_date) | Q(date=before_date, id__gt=before_id))
+            .order_by('date', 'id')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = list(reversed(rows[:page_size]))
+        prev_cursor = encode_cursor(rows[0]) if has_more else None
+        next_cursor = encode_cursor(rows[-1]) if rows else None
+        return rows, prev_cursor, next_cursor
+
+    ordered = queryset.order_by('-date', '-id')
+    if after:
+        after_date, after_id = decode_cursor(after)
+        ordered = ordered.filter(Q(date__lt=after_date) | Q(date=after_date, id__lt=after_id))
+    rows = list(ordered[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    prev_cursor = encode_cursor(rows[0]) if (after and rows) else None
+    next_cursor = encode_cursor(rows[-1]) if has_more else None
+    return rows, prev_cursor, next_cursor
@@ -29,11 +29,18 @@ urlpatterns = [
     path('budget/toggle-payment/', views.toggle_payment, name='toggle_payment'),
     path('budget/outstanding/', views.outstanding_payments, name='outstanding_payments'),
     path('budget/outstanding/<int:year>/<int:month>/', views.outstanding_payments, name='outstanding_payments_month'),
+    path('transactions/', views.transaction_list, name='transaction_list'),
     
     # Admin views (superuser only)
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/users/', views.admin_users, name='admin_users'),
     path('admin/households/', views.admin_households, name='admin_households'),
+    path('admin/query-stats/', views.admin_query_stats, name='admin_query_stats'),
+    path('admin/profiles/', views.admin_profiles, name='admin_profiles'),
+    path('admin/profiles/<str:name>/', views.admin_profile_detail, name='admin_profile_detail'),
+    
+    # Monitoring
+    path('metrics', views.metrics, name='metrics'),
     
     # Category Notes
     path('categories/<int:category_id>/notes/', views.category_notes, name='category_notes'),
@@ -1,7 +1,9 @@
 from .models import Category, Budget, Household
+from .metrics import OPEN_BUDGET_MONTH_DURATION
 import datetime
 import calendar
 
+@OPEN_BUDGET_MONTH_DURATION.time()
 def open_budget_month(year, month, household, force_update=False):
     """
     Ensures budget entries exist for all categories for the given month.
@@ -59,3 +61,22 @@ def open_budget_month(year, month, household, force_update=False):
                 if prev_budget:
                     budget.amount = prev_budget.amount
                     budget.save()
+
+
+def count_subquery(queryset, field):
+    """
+    Correlated COUNT(*) of `queryset` rows whose `field` equals the outer row's pk, for use
+    in annotate(). Unlike Count() over joins, several of these can be combined without
+    multiplying each other's rows.
+    """
+    from django.db.models import Count, IntegerField, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
@@ -0,0 +1,139 @@
+"""
+Household Data Versions for Finance Flow
+A per-household counter that goes up on every write to the household's budget data
+
+Household.data_version is bumped with an F() update whenever a category, budget, transaction
+or category note of the household is saved, deleted, bulk-created or changed through a
+queryset update, so "same version" means "same data" and can validate caches and ETags
+without reading any budget rows; data_changed_at records when that last happened. Inside a transaction the bumps are collected and applied
+once per household when it commits.
+"""
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import events
+
+
+def bump_data_version(household_ids=(), category_ids=()):
+    """
+    Bump the data version of the given households and of the households owning the given
+    categories: immediately in autocommit mode, or once at commit inside a transaction
+    """
+    household_ids = {pk for pk in household_ids if pk is not None}
+    category_ids = {pk for pk in category_ids if pk is not None}
+    if not household_ids and not category_ids:
+        return
+
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'finance_pending_versions', None)
+    if pending is None:
+        pending = connection.finance_pending_versions = (set(), set())
+    pending[0].update(household_ids)
+    pending[1].update(category_ids)
+    # Runs right away outside a transaction. A flush that finds nothing pending is free, and
+    # ids left behind by a rolled-back transaction at worst cost one extra bump later.
+    transaction.on_commit(lambda: _flush(connection))
+
+
+def _flush(connection):
+    household_ids, category_ids = getattr(connection, 'finance_pending_versions', (set(), set()))
+    if not household_ids and not category_ids:
+        return
+    connection.finance_pending_versions = (set(), set())
+    Household = apps.get_model('finance', 'Household')
+    condition = Q(id__in=household_ids)
+    if category_ids:
+        condition |= Q(id__in=apps.get_model('finance', 'Category').objects.filter(
+            id__in=category_ids).values('household_id'))
+    Household.objects.filter(condition).update(
+        data_version=F('data_version') + 1, data_changed_at=timezone.now()
+    )
+
+
+def get_household_id(instance):
+    """The household of a Category/Transaction (household_id) or Budget/CategoryNote (category)"""
+    if hasattr(instance, 'household_id'):
+        return instance.household_id
+    if type(instance).category.is_cached(instance):
+        return instance.category.household_id
+    return None
+
+
+def bump_for_instance(instance):
+    household_id = get_household_id(instance)
+    if household_id is not None:
+        bump_data_version(household_ids=[household_id])
+    elif getattr(instance, 'category_id', None) is not None:
+        bump_data_version(category_ids=[instance.category_id])
+
+
+class HouseholdDataQuerySet(models.QuerySet):
+    """
+    QuerySet for models whose rows belong to a household's budget data. Bulk writes skip the
+    model signals, so update(), delete() and bulk_create() bump the data version themselves
+    (bulk_update() goes through update()). update() also sets updated_at, which auto_now only
+    does on save(), so delta sync sees the changed rows, and bulk changes to categories and
+    budgets send live 'reload' events.
+    """
+
+    def _household_lookup(self):
+        return 'household_id' if hasattr(self.model, 'household_id') else 'category__household_id'
+
+    def _affected_households(self):
+        if self.query.is_sliced:
+            return set()  # update() and delete() refuse sliced querysets anyway
+        return set(self.order_by().values_list(self._household_lookup(), flat=True).distinct())
+
+    def update(self, **kwargs):
+        household_ids = self._affected_households()
+        if 'updated_at' not in kwargs and any(field.name == 'updated_at' for field in self.model._meta.concrete_fields):
+            kwargs['updated_at'] = timezone.now()
+        rows = super().update(**kwargs)
+        # Rows moved to another household (or another household's category) change it too
+        field = 'household' if hasattr(self.model, 'household_id') else 'category'
+        moved_to = set()
+        for key in (field, f'{field}_id'):
+            value = kwargs.get(key)
+            if isinstance(value, models.Model):
+                moved_to.add(value.pk)
+            elif isinstance(value, int):
+                moved_to.add(value)
+        if field == 'household':
+            bump_data_version(household_ids | moved_to)
+            events.publish_bulk_change(self.model, household_ids | moved_to)
+        else:
+            bump_data_version(household_ids, moved_to)
+            events.publish_bulk_change(self.model, household_ids, moved_to)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        household_ids = self._affected_households()
+        result = super().delete()
+        bump_data_version(household_ids)
+        events.publish_bulk_change(self.model, household_ids)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        household_ids, category_ids = set(), set()
+        for obj in objs:
+            household_id = get_household_id(obj)
+            if household_id is not None:
+                household_ids.add(household_id)
+            else:
+                category_ids.add(obj.category_id)
+        bump_data_version(household_ids, category_ids)
+        events.publish_bulk_change(self.model, household_ids, category_ids)
+        return objs
+
+
+def household_etag(household, *parts):
+    """ETag value for a response built only from `household`'s data and `parts`"""
+    return '-'.join(str(part) for part in (household.pk, household.data_version, *parts))
@@ -1,11 +1,14 @@
 from django.shortcuts import render, redirect
-from django.db.models import Sum
+from django.db.models import Sum, Count, Prefetch
+from django.core.paginator import Paginator
+from django.conf import settings
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth import login, authenticate, get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
+from django.utils.functional import cached_property
 from decimal import Decimal
 from .models import Transaction, Category, Budget, Household, CategoryNote, BudgetTemplate, TemplateCategory
 
@@ -14,6 +17,7 @@ from .forms import TransactionForm, CategoryForm, BulkCategoryForm, BulkMainCate
 from .utils import open_budget_month
 from .templates import create_base_starter_template, apply_barebones_template
 from .excel_reports import export_yearly_budget, export_monthly_detail, export_category_summary, export_transactions, export_category_setup
+from .transaction_filters import filter_transactions, keyset_page, TransactionFilterError, DEFAULT_PAGE_SIZE
 import datetime
 import calendar
 
@@ -69,6 +73,80 @@ def check_and_apply_base_template(household):
     # For now, we'll skip auto-application and let users choose during registration
     return False
 
+class DashboardSummary:
+    """
+    The dashboard's month summary. Each figure is computed on first use, so a page whose
+    fragments are all cached runs none of these queries.
+    """
+
+    def __init__(self, household, start_date):
+        self.household = household
+        self.start_date = start_date
+
+    def _summary(self, category_type):
+        # Main categories only
+        start_date = self.start_date
+        categories = Category.objects.filter(
+            household=self.household, type=category_type, parent__isnull=True
+        ).prefetch_related('children').order_by('name')
+        summary = []
+        for category in categories:
+            children = list(category.children.all())
+            if children:
+                # Sum child budgets
+                total = sum(
+                    Budget.objects.filter(category=child, start_date=start_date).first().amount
+                    if Budget.objects.filter(category=child, start_date=start_date).first() else 0
+                    for child in children
+                )
+            else:
+                # Use own budget
+                budget = Budget.objects.filter(category=category, start_date=start_date).first()
+                total = budget.amount if budget else 0
+            summary.append({'category': category, 'amount': total})
+        return summary
+
+    @cached_property
+    def income_budgets(self):
+        return self._summary('INCOME')
+
+    @cached_property
+    def expense_budgets(self):
+        return self._summary('EXPENSE')
+
+    @cached_property
+    def savings_budgets(self):
+        return self._summary('SAVINGS')
+
+    @cached_property
+    def total_income(self):
+        return sum(item['amount'] for item in self.income_budgets)
+
+    @cached_property
+    def total_expenses(self):
+        return sum(item['amount'] for item in self.expense_budgets)
+
+    @cached_property
+    def total_savings(self):
+        return sum(item['amount'] for item in self.savings_budgets)
+
+    @cached_property
+    def balance(self):
+        return self.total_income - self.total_expenses - self.total_savings
+
+    @cached_property
+    def unpaid_count(self):
+        # Outstanding payments count (manual expenses only, excluding parents with children)
+        # Only count sub-categories and standalone parent categories
+        unpaid_budgets = Budget.objects.filter(
+            category__household=self.household,
+            start_date=self.start_date,
+            is_paid=False,
+            category__payment_type='MANUAL',
+            category__type='EXPENSE'
+        ).select_related('category')
+        return sum(1 for budget in unpaid_budgets if budget.category.parent or not budget.category.children.exists())
+
 @login_required
 def dashboard(request):
     """Show budget summary for active month"""
@@ -110,83 +188,8 @@ def dashboard(request):
     # This check is kept for backward compatibility but won't auto-apply
     check_and_apply_base_template(household)
 
-    # Get parent categories only for this household
-    income_categories = Category.objects.filter(household=household, type='INCOME', parent__isnull=True).prefetch_related('children').order_by('name')
-    expense_categories = Category.objects.filter(household=household, type='EXPENSE', parent__isnull=True).prefetch_related('children').order_by('name')
-    savings_categories = Category.objects.filter(household=household, type='SAVINGS', parent__isnull=True).prefetch_related('children').order_by('name')
-
-    # Build income summary (main categories only)
-    income_summary = []
-    for category in income_categories:
-        children = list(category.children.all())
-        if children:
-            # Sum child budgets
-            total = sum(
-                Budget.objects.filter(category=child, start_date=start_date).first().amount 
-                if Budget.objects.filter(category=child, start_date=start_date).first() else 0
-                for child in children
-            )
-        else:
-            # Use own budget
-            budget = Budget.objects.filter(category=category, start_date=start_date).first()
-            total = budget.amount if budget else 0
-        
-        income_summary.append({'category': category, 'amount': total})
-
-    # Build expense summary (main categories only)
-    expense_summary = []
-    for category in expense_categories:
-        children = list(category.children.all())
-        if children:
-            # Sum child budgets
-            total = sum(
-                Budget.objects.filter(category=child, start_date=start_date).first().amount 
-                if Budget.objects.filter(category=child, start_date=start_date).first() else 0
-                for child in children
-            )
-        else:
-            # Use own budget
-            budget = Budget.objects.filter(category=category, start_date=start_date).first()
-            total = budget.amount if budget else 0
-        
-        expense_summary.append({'category': category, 'amount': total})
-
-    # Build savings summary (main categories only)
-    savings_summary = []
-    for category in savings_categories:
-        children = list(category.children.all())
-        if children:
-            # Sum child budgets
-            total = sum(
-                Budget.objects.filter(category=child, start_date=start_date).first().amount 
-                if Budget.objects.filter(category=child, start_date=start_date).first() else 0
-                for child in children
-            )
-        else:
-            # Use own budget
-            budget = Budget.objects.filter(category=category, start_date=start_date).first()
-            total = budget.amount if budget else 0
-        
-        savings_summary.append({'category': category, 'amount': total})
-
-    # Calculate totals
-    total_income = sum(item['amount'] for item in income_summary)
-    total_expenses = sum(item['amount'] for item in expense_summary)
-    total_savings = sum(item['amount'] for item in savings_summary)
-    balance = total_income - total_expenses - total_savings
-
-    # Outstanding payments count (manual expenses only, excluding parents with children)
-    # Only count sub-categories and standalone parent categories
-    unpaid_budgets = Budget.objects.filter(
-        category__household=household,
-        start_date=start_date,
-        is_paid=False,
-        category__payment_type='MANUAL',
-        category__type='EXPENSE'
-    ).select_related('category')
-    
-    # Filter out parent categories that have children
-    unpaid_count = sum(1 for budget in unpaid_budgets if budget.category.parent or not budget.category.children.exists())
+    # Computed only if the template renders a fragment that isn't cached yet
+    summary = DashboardSummary(household, start_date)
 
     # Calculate previous and next month for navigation
     prev_month_date = start_date - datetime.timedelta(days=1)
@@ -196,18 +199,12 @@ def dashboard(request):
         'active_date': active_date,
         'household': household,
         'all_households': all_households,
-        'income_budgets': income_summary,
-        'expense_budgets': expense_summary,
-        'savings_budgets': savings_summary,
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'total_savings': total_savings,
-        'balance': balance,
-        'unpaid_count': unpaid_count,
+        'summary': summary,
         'prev_month_year': prev_month_date.year,
         'prev_month_month': prev_month_date.month,
         'next_month_year': next_month_date.year,
         'next_month_month': next_month_date.month,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, 'finance/dashboard.html', context)
 
@@ -616,6 +613,21 @@ def move_category(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
+def _yearly_row_fragment_key(item, year, active_month):
+    """
+    Everything a yearly grid row renders: its cached fragment is reused while these are unchanged,
+    so after an edit only the rows that changed are rendered again
+    """
+    category = item['category']
+    months = tuple(
+        (month, str(info['amount']), info['is_paid'], info['budget_id'])
+        for month, info in sorted(item['months'].items())
+    )
+    return (
+        category.id, category.name, category.is_persistent, category.payment_type, category.parent_id,
+        category.notes_count, item['is_parent'], item['has_children'], year, active_month, months,
+    )
+
 @login_required
 def yearly_budget_view(request, year=None):
     household = get_user_household(request.user, request)
@@ -642,10 +654,12 @@ def yearly_budget_view(request, year=None):
     household_categories = Category.objects.filter(household=household)
     budgets = Budget.objects.filter(category__household=household, start_date__gte=start_date, start_date__lte=end_date)
     
-    # Fetch categories
-    income_categories = Category.objects.filter(household=household, type='INCOME', parent__isnull=True).prefetch_related('children').order_by('name')
-    expense_categories = Category.objects.filter(household=household, type='EXPENSE', parent__isnull=True).prefetch_related('children').order_by('name')
-    savings_categories = Category.objects.filter(household=household, type='SAVINGS', parent__isnull=True).prefetch_related('children').order_by('name')
+    # Fetch categories (with note counts, which the grid shows on every row)
+    children = Prefetch('children', queryset=Category.objects.annotate(notes_count=Count('notes')).order_by('name'))
+    parents = Category.objects.filter(household=household, parent__isnull=True).annotate(notes_count=Count('notes')).prefetch_related(children).order_by('name')
+    income_categories = parents.filter(type='INCOME')
+    expense_categories = parents.filter(type='EXPENSE')
+    savings_categories = parents.filter(type='SAVINGS')
     
     # Helper to build budget data structure
     def build_budget_data(categories):
@@ -660,7 +674,7 @@ def yearly_budget_view(request, year=None):
             }
             flat_data.append(parent_item)
             
-            for child in category.children.all().order_by('name'): # Ensure children are ordered
+            for child in category.children.all(): # Prefetched in name order
                 child_item = {
                     'category': child,
                     'is_parent': False,
@@ -755,8 +769,13 @@ def yearly_budget_view(request, year=None):
     if not active_month and year == datetime.date.today().year:
         active_month = datetime.date.today().month
 
+    for item in income_budget_data + expense_budget_data + savings_budget_data:
+        item['fragment_key'] = _yearly_row_fragment_key(item, year, active_month)
+
     context = {
         'year': year,
+        'household': household,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
         'income_budget_data': income_budget_data,
         'expense_budget_data': expense_budget_data,
         'savings_budget_data': savings_budget_data,
@@ -930,6 +949,45 @@ def outstanding_payments(request, year=None, month=None):
     }
     return render(request, 'finance/outstanding_payments.html', context)
 
+@login_required
+def transaction_list(request):
+    """Browse transactions newest first with server-side filters, search and keyset pagination"""
+    household = get_user_household(request.user, request)
+    if not household:
+        return redirect('register')
+    
+    queryset = Transaction.objects.filter(household=household).select_related('category')
+    error_message = None
+    try:
+        queryset = filter_transactions(queryset, request.GET)
+        page_size = int(request.GET.get('page_size') or DEFAULT_PAGE_SIZE)
+        transactions, prev_cursor, next_cursor = keyset_page(
+            queryset,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size,
+        )
+    except (TransactionFilterError, ValueError) as e:
+        error_message = str(e)
+        transactions, prev_cursor, next_cursor = [], None, None
+    
+    # Carry the active filters over to the pagination links
+    filter_params = request.GET.copy()
+    for key in ('after', 'before'):
+        filter_params.pop(key, None)
+    
+    context = {
+        'transactions': transactions,
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor,
+        'filter_query': filter_params.urlencode(),
+        'filters': request.GET,
+        'categories': Category.objects.filter(household=household).select_related('parent').order_by('type', 'name'),
+        'type_choices': Transaction.TYPE_CHOICES,
+        'error_message': error_message,
+    }
+    return render(request, 'finance/transaction_list.html', context)
+
 # Authentication Views
 
 def register_view(request):
@@ -1083,33 +1141,153 @@ def admin_dashboard(request):
         messages.error(request, 'Access denied. Admin access required.')
         return redirect('dashboard')
     
-    from .models import User
-    from django.db.models import Count, Sum
-    
-    total_users = User.objects.count()
-    total_households = Household.objects.count()
-    total_categories = Category.objects.count()
-    total_budgets = Budget.objects.count()
+    from . import statistics
     
-    # Recent users (last 7 days)
-    from datetime import timedelta
-    from django.utils import timezone
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    recent_users = User.objects.filter(date_joined__gte=seven_days_ago).count()
+    if request.method == 'POST' and request.POST.get('action') == 'refresh':
+        statistics.refresh()
+        messages.success(request, 'Statistics refreshed.')
+        return redirect('admin_dashboard')
     
-    # Households with most members
-    households_with_members = Household.objects.annotate(member_count=Count('members')).order_by('-member_count')[:5]
+    stats = statistics.get_statistics()
+    counts = stats['counts']
     
     context = {
-        'total_users': total_users,
-        'total_households': total_households,
-        'total_categories': total_categories,
-        'total_budgets': total_budgets,
-        'recent_users': recent_users,
-        'households_with_members': households_with_members,
+        'total_users': counts['users'],
+        'total_households': counts['households'],
+        'total_categories': counts['categories'],
+        'total_budgets': counts['budgets'],
+        'total_transactions': counts['transactions'],
+        'recent_users': stats['recent_users'],
+        'households_with_members': stats['top_households'],
+        'stats': stats,
+        'growth': statistics.growth(days=30),
     }
     return render(request, 'finance/admin_dashboard.html', context)
 
+@login_required
+def admin_query_stats(request):
+    """Admin view of per-view SQL query counts, database time and slowest statements"""
+    if not request.user.is_superuser:
+        messages.error(request, 'Access denied. Admin access required.')
+        return redirect('dashboard')
+    
+    from .instrumentation import query_stats
+    
+    if request.method == 'POST':
+        query_stats.reset()
+        messages.success(request, 'Query statistics reset.')
+        return redirect('admin_query_stats')
+    
+    context = {
+        'view_stats': query_stats.snapshot(),
+        'since': datetime.datetime.fromtimestamp(query_stats.since),
+        'enabled': getattr(settings, 'QUERY_INSTRUMENTATION_ENABLED', True),
+        'default_budget': getattr(settings, 'QUERY_BUDGET_DEFAULT', None),
+    }
+    return render(request, 'finance/admin_query_stats.html', context)
+
+@login_required
+def admin_profiles(request):
+    """Admin view listing saved request profiles, and issuing profiling tokens"""
+    if not request.user.is_superuser:
+        messages.error(request, 'Access denied. Admin access required.')
+        return redirect('dashboard')
+    
+    from . import profiling
+    
+    token = None
+    if request.method == 'POST':
+        if request.POST.get('action') == 'token':
+            token = profiling.make_token(request.user)
+        elif request.POST.get('action') == 'delete':
+            profiling.delete_profile(request.POST.get('name', ''))
+            messages.success(request, 'Profile deleted.')
+            return redirect('admin_profiles')
+    
+    context = {
+        'profiles': profiling.list_profiles(),
+        'token': token,
+        'token_hours': profiling.TOKEN_MAX_AGE // 3600,
+        'slow_request_ms': getattr(settings, 'PROFILING_SLOW_REQUEST_MS', None),
+    }
+    return render(request, 'finance/admin_profiles.html', context)
+
+@login_required
+def admin_profile_detail(request, name):
+    """Admin view of one profile: hot spots and SQL log"""
+    if not request.user.is_superuser:
+        messages.error(request, 'Access denied. Admin access required.')
+        return redirect('dashboard')
+    
+    from django.http import Http404, FileResponse
+    from . import profiling
+    
+    profile = profiling.load_profile(name)
+    if profile is None:
+        raise Http404('Profile not found')
+    
+    if request.GET.get('download'):
+        path = profiling.get_profile_dir() / profile['dump']
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=profile['dump'])
+    
+    context = {
+        'profile': profile,
+        'summary': profiling.profile_summary(profile),
+    }
+    return render(request, 'finance/admin_profile_detail.html', context)
+
+def metrics(request):
+    """Prometheus text exposition of request, database, export and budget-month timings"""
+    from django.utils.crypto import constant_time_compare
+    from .metrics import REGISTRY
+    
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = settings.DEBUG or request.user.is_superuser
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+ADMIN_PAGE_SIZE = 50
+
+
+def _admin_listing(request, queryset, sorts, default_sort, search=None):
+    """
+    One page of an admin listing with ?q= search, ?sort= (a key of `sorts`, '-' for descending)
+    and ?page=. `search(queryset, q)` applies the search. Costs one COUNT and one page query.
+    """
+    q = request.GET.get('q', '').strip()
+    if q and search:
+        queryset = search(queryset, q)
+
+    sort = request.GET.get('sort') or default_sort
+    if sort.lstrip('-') not in sorts:
+        sort = default_sort
+    descending = sort.startswith('-')
+    order = sorts[sort.lstrip('-')]
+    queryset = queryset.order_by(f'-{order}' if descending else order, '-pk' if descending else 'pk')
+
+    page = Paginator(queryset, ADMIN_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    params = request.GET.copy()
+    params.pop('page', None)
+    params.pop('sort', None)
+    sort_links = {}
+    for key in sorts:
+        params['sort'] = f'-{key}' if sort == key else key
+        sort_links[key] = params.urlencode()
+    params['sort'] = sort
+    return {
+        'page_obj': page,
+        'q': q,
+        'sort': sort,
+        'sort_links': sort_links,
+        'page_query': params.urlencode(),
+    }
+
 @login_required
 def admin_users(request):
     """Admin view to manage users"""
@@ -1117,23 +1295,30 @@ def admin_users(request):
         messages.error(request, 'Access denied. Admin access required.')
         return redirect('dashboard')
     
+    from django.db.models import Exists, OuterRef, Q
     from .models import User
+    from .utils import count_subquery
     
-    users = User.objects.all().order_by('-date_joined')
+    users = User.objects.annotate(
+        household_count=count_subquery(Household.members.through.objects.all(), 'user_id'),
+    ).prefetch_related(
+        Prefetch('households', queryset=Household.objects.only('id', 'name').order_by('name'))
+    )
     
-    # Add household info for each user
-    users_with_households = []
-    for user in users:
-        households = user.households.all()
-        users_with_households.append({
-            'user': user,
-            'households': households,
-            'household_count': households.count(),
-        })
+    def search(queryset, q):
+        household_match = Household.members.through.objects.filter(
+            user_id=OuterRef('pk'), household__name__icontains=q
+        )
+        return queryset.filter(
+            Q(email__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q) | Exists(household_match)
+        )
     
-    context = {
-        'users_with_households': users_with_households,
-    }
+    context = _admin_listing(
+        request, users,
+        sorts={'email': 'email', 'joined': 'date_joined', 'superuser': 'is_superuser', 'households': 'household_count'},
+        default_sort='-joined',
+        search=search,
+    )
     return render(request, 'finance/admin_users.html', context)
 
 @login_required
@@ -1143,22 +1328,35 @@ def admin_households(request):
         messages.error(request, 'Access denied. Admin access required.')
         return redirect('dashboard')
     
-    from django.db.models import Count, Q
+    from django.db.models import Exists, OuterRef, Q
+    from .models import User
+    from .utils import count_subquery
     
-    # Get households with counts
+    # Subquery counts rather than Count() over joins: members x categories x budgets would
+    # multiply into millions of joined rows for large households
     households = Household.objects.annotate(
-        member_count=Count('members', distinct=True),
-        category_count=Count('categories', distinct=True)
-    ).order_by('-created_at')
-    
-    # Add budget count separately (can't use double underscore through reverse relation easily)
-    for household in households:
-        # Count budgets through categories
-        household.budget_count = Budget.objects.filter(category__household=household).count()
-    
-    context = {
-        'households': households,
-    }
+        member_count=count_subquery(Household.members.through.objects.all(), 'household_id'),
+        category_count=count_subquery(Category.objects.all(), 'household_id'),
+        budget_count=count_subquery(Budget.objects.all(), 'category__household_id'),
+    ).prefetch_related(
+        Prefetch('members', queryset=User.objects.only('id', 'email').order_by('email'))
+    )
+    
+    def search(queryset, q):
+        member_match = Household.members.through.objects.filter(
+            household_id=OuterRef('pk'), user__email__icontains=q
+        )
+        return queryset.filter(Q(name__icontains=q) | Exists(member_match))
+    
+    context = _admin_listing(
+        request, households,
+        sorts={
+            'name': 'name', 'members': 'member_count', 'categories': 'category_count',
+            'budgets': 'budget_count', 'created': 'created_at',
+        },
+        default_sort='-created',
+        search=search,
+    )
     return render(request, 'finance/admin_households.html', context)
 
 # Category Notes Views
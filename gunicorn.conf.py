@@ -0,0 +1,75 @@
+"""
+Gunicorn Configuration for Finance Flow
+Worker model, concurrency and timeouts, selected by GUNICORN_PROFILE
+
+Gunicorn reads this file from the working directory, so `gunicorn` alone (as the Dockerfile
+and Procfile run it) serves the app with the chosen profile:
+
+    gthread  threaded sync workers, 2 x CPUs + 1 threads each (default). Requests mostly wait
+             on the database, so threads keep a worker busy while one of them waits, and a
+             slow Excel export occupies a thread instead of a whole worker.
+    asgi     uvicorn workers serving budget_app.asgi with the async summary views
+             (API_ASYNC_VIEWS); needed for the /api/events/ live updates stream. With a
+             PostgreSQL DATABASE_URL, live events go through LISTEN/NOTIFY so they reach the
+             streams of every worker (LIVE_EVENTS_BUS=postgres).
+    sync     one request per worker, the previous setup.
+    export   a pool for the /export/ and /api/export/ routes alone, with a long timeout.
+             Put it behind the same proxy as the interactive pool and route those prefixes
+             to it (see DEPLOYMENT_GUIDE.md).
+
+In the interactive profiles at most EXPORT_MAX_CONCURRENCY exports run at once per worker
+(half its threads), so exports never take every thread (see ExportConcurrencyMiddleware).
+The app is loaded before forking (GUNICORN_PRELOAD), so workers share its memory pages
+copy-on-write and a broken deploy fails at startup instead of in every worker.
+Command-line options override everything here.
+"""
+import multiprocessing
+import os
+
+PROFILES = {
+    'gthread': {'worker_class': 'gthread', 'timeout': 30},
+    'asgi': {
+        'worker_class': 'uvicorn_worker.UvicornWorker',
+        'wsgi_app': 'budget_app.asgi:application',
+        'timeout': 30,
+        'env': {'API_ASYNC_VIEWS': 'True'},
+    },
+    'sync': {'worker_class': 'sync', 'timeout': 120},
+    'export': {'worker_class': 'gthread', 'timeout': 300, 'env': {'EXPORT_MAX_CONCURRENCY': '0'}},
+}
+
+profile_name = os.environ.get('GUNICORN_PROFILE', 'gthread')
+if profile_name not in PROFILES:
+    raise RuntimeError(f'Unknown GUNICORN_PROFILE {profile_name!r}; choose from {", ".join(PROFILES)}')
+profile = PROFILES[profile_name]
+
+wsgi_app = profile.get('wsgi_app', 'budget_app.wsgi:application')
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = profile['worker_class']
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+if worker_class == 'gthread':
+    threads = int(os.environ.get('GUNICORN_THREADS', 2 * multiprocessing.cpu_count() + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', profile['timeout']))
+# Behind a proxy that reuses connections; keep-alive only applies to threaded and async workers
+keepalive = 5
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+for name, value in profile.get('env', {}).items():
+    os.environ.setdefault(name, value)
+if worker_class == 'gthread':
+    os.environ.setdefault('EXPORT_MAX_CONCURRENCY', str(max(1, threads // 2)))
+if profile_name == 'asgi' and os.environ.get('DATABASE_URL', '').startswith(('postgres', 'pgsql')):
+    # Event streams are spread over the workers; the local bus only reaches its own worker's
+    os.environ.setdefault('LIVE_EVENTS_BUS', 'postgres')
+
+
+def on_starting(server):
+    # Metrics files of the previous run would otherwise be summed into this one's
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from finance.metrics import clear_multiproc_dir
+        clear_multiproc_dir(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+    if profile_name == 'asgi' and server.cfg.workers > 1 and os.environ.get('LIVE_EVENTS_BUS', 'local') == 'local':
+        server.log.warning(
+            'LIVE_EVENTS_BUS is local with %s workers: live events only reach streams on the worker '
+            'that handled the write. Set LIVE_EVENTS_BUS=postgres or run one worker.', server.cfg.workers,
+        )